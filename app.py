@@ -1,11 +1,27 @@
-from flask import Flask, render_template, jsonify, request, session, redirect
+from flask import Flask, render_template, jsonify, request, session, redirect, Response, stream_with_context, g
 from flask_cors import CORS
+from datetime import datetime
+import base64
+import cProfile
+import io
+import json
+import logging
 import sys
 import os
+import time
 
 # Ensure Python looks in the scripts folder
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-from scripts.inventory_agent import InventoryAgent
+from scripts.inventory_agent import InsufficientStockError, InventoryAgent, inventory_records
+from scripts.db_connection import get_pool_stats
+from scripts.cache import INVENTORY, SALES, get_cache
+from scripts.changes import get_change_feed
+from scripts.http_cache import compress_response, conditional_get
+from scripts.log_config import configure_logging
+from scripts.bulk import EXPORT_COLUMNS, SALES_HISTORY_COLUMNS, detect_format, encode_chunks
+from scripts.columnar import ARROW_MIMETYPE, FORMATS as FRAME_FORMATS, encode_arrow, encode_columnar, log_encoder
+from scripts.reports import REPORT_KINDS
+from scripts.metrics import REQUEST_LATENCY, SLOW_REQUESTS, render_metrics
 
 # Import auth blueprint
 from auth import auth_bp
@@ -17,11 +33,75 @@ CORS(app)
 # Register auth blueprint
 app.register_blueprint(auth_bp)
 
+configure_logging()
+logger = logging.getLogger('app')
+log_encoder()
+
+# --------------------------
+# Request instrumentation
+# --------------------------
+
+# Requests slower than this are logged; with SLOW_REQUEST_PROFILE_DIR set,
+# every request runs under cProfile and slow ones dump a .prof file there.
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 1000))
+SLOW_REQUEST_PROFILE_DIR = os.getenv('SLOW_REQUEST_PROFILE_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = None
+    if SLOW_REQUEST_PROFILE_DIR:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+        except ValueError:
+            # Another profiler is already active on this thread
+            pass
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(elapsed, request.method, route, response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(route)
+        fields = {'route': route, 'method': request.method, 'status': response.status_code,
+                  'duration_ms': round(elapsed * 1000, 1), 'user_id': session.get('user_id')}
+        if profiler is not None:
+            os.makedirs(SLOW_REQUEST_PROFILE_DIR, exist_ok=True)
+            path = os.path.join(SLOW_REQUEST_PROFILE_DIR,
+                                f"{int(time.time() * 1000)}_{os.getpid()}_{route.strip('/').replace('/', '_') or 'root'}.prof")
+            profiler.dump_stats(path)
+            fields['profile'] = path
+        logger.warning("slow request", extra=fields)
+    return response
+
+# Large JSON bodies are sent brotli/gzip compressed when the client accepts it
+app.after_request(compress_response)
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint; set METRICS_TOKEN to require a bearer token
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 # --------------------------
 # Helper to get agent
 # --------------------------
 
 def get_agent():
+    # Cheap to build: the agent borrows connections from the shared pool
     user_id = session.get('user_id')
     if not user_id:
         return None
@@ -38,7 +118,20 @@ def home():
         return redirect('/login')
     return render_template('index.html')
 
+@app.route('/api/pool-stats')
+def pool_stats():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(get_pool_stats())
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(get_cache().stats())
+
 @app.route('/api/inventory')
+@conditional_get(INVENTORY)
 def get_inventory():
     try:
         agent = get_agent()
@@ -46,46 +139,56 @@ def get_inventory():
             return jsonify({"error": "Unauthorized"}), 401
 
         df = agent.fetch_compressed_data()
-        return jsonify(df.to_dict(orient='records'))
+        # ?format=columnar (column arrays) or arrow (Arrow IPC stream) for large tenants
+        fmt = request.args.get('format')
+        if fmt in FRAME_FORMATS:
+            try:
+                return _frame_response(df, fmt)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify(inventory_records(df))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _stored_report(agent, kind):
+    """The scheduler's fresh copy of a report as the response, or None to compute it now"""
+    payload = agent.fresh_reports((kind,)).get(kind)
+    return None if payload is None else app.response_class(payload, mimetype='application/json')
+
 @app.route('/api/advise')
+# Forecast demand comes from the sales history and decays day by day
+@conditional_get(INVENTORY, SALES, daily=True)
 def get_advice():
     try:
         agent = get_agent()
-        df = agent.fetch_compressed_data()
-        recommendations = []
-        for _, row in df.iterrows():
-            if row['current_stock'] <= row['safety_stock_level']:
-                # Running your EOQ logic
-                status = "❌ CRITICAL LOW"
-                reorder_qty = row['forecasted_demand'] - row['current_stock']
-                min_req=row['safety_stock_level']-row['current_stock']
-                action = f"ORDER {reorder_qty} units IMMEDIATELY._______MINIMUM ORDER:{min_req}"
-                eoq = agent.calculate_eoq(row['annual_demand'], row['order_cost_fixed'], row['holding_cost_per_unit'])
-                recommendations.append({
-                    "product": row['product_name'],
-                    "current": int(row['current_stock']),
-                    "recommendation": f"   {status}:   {action}:________ideal EOQ:{eoq}"
-                })
-            
-            elif row['current_stock'] < row['forecasted_demand']:
-                status = "🟡 WARNING"
-                reorder_qty = row['forecasted_demand'] - row['current_stock']
-                action = f"ORDER {reorder_qty} units for Prepare purchase order for next week."
-                eoq = agent.calculate_eoq(row['annual_demand'], row['order_cost_fixed'], row['holding_cost_per_unit'])
-                recommendations.append({
-                    "product": row['product_name'],
-                    "current": int(row['current_stock']),
-                    "recommendation": f"   {status}:   {action}:_________ideal EOQ:{eoq}"
-                })
-
-        return jsonify(recommendations)
+        stored = _stored_report(agent, 'advice')
+        if stored is not None:
+            return stored
+        return jsonify(agent.get_advice())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/dashboard')
+@conditional_get(INVENTORY, SALES, daily=True)
+def get_dashboard():
+    try:
+        agent = get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # e.g. /api/dashboard?sections=inventory,advice,expiry_alerts
+        sections = request.args.get('sections')
+        if sections:
+            sections = [name.strip() for name in sections.split(',') if name.strip()]
+
+        return jsonify(agent.serve_dashboard(sections))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/sales-summary/<period>')
+@conditional_get(SALES)
 def get_sales_summary(period):
     try:
         agent = get_agent()
@@ -94,40 +197,124 @@ def get_sales_summary(period):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/products/lookup')
+def products_lookup():
+    try:
+        agent = get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # e.g. /api/products/lookup?id=12 or /api/products/lookup?q=ste&limit=10
+        try:
+            items = agent.lookup_products(
+                product_id=request.args.get('id', type=int),
+                prefix=request.args.get('q', '').strip(),
+                limit=request.args.get('limit', 10, type=int)
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"items": items})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/fast-moving')
+@conditional_get(SALES, daily=True)
 def get_fast_moving():
     try:
         agent = get_agent()
-        items = agent.get_fast_moving_items()
+        # e.g. /api/fast-moving?top_n=10&days=30 (days omitted = all time)
+        items = agent.get_fast_moving_items(
+            top_n=request.args.get('top_n', 5, type=int),
+            days=request.args.get('days', type=int)
+        )
         return jsonify(items)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/slow-moving')
+@conditional_get(SALES, daily=True)
 def get_slow_moving():
     try:
         agent = get_agent()
-        items = agent.get_slow_moving_items()
+        # e.g. /api/slow-moving?threshold=5&days=90&limit=20
+        items = agent.get_slow_moving_items(
+            threshold=request.args.get('threshold', 10, type=int),
+            days=request.args.get('days', type=int),
+            limit=request.args.get('limit', type=int)
+        )
         return jsonify(items)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/expiry-alerts')
+@conditional_get(INVENTORY, daily=True)
 def get_expiry_alerts():
     try:
         agent = get_agent()
         if not agent:
             return jsonify({"error": "Unauthorized"}), 401
 
-        alerts = agent.get_expiry_alerts()
-        return jsonify(alerts)
+        # e.g. /api/expiry-alerts?days_ahead=60 (already expired items included)
+        days_ahead = request.args.get('days_ahead', 30, type=int)
+        # The stored report covers the default window
+        stored = _stored_report(agent, 'expiry_alerts') if days_ahead == 30 else None
+        if stored is not None:
+            return stored
+        return jsonify(agent.get_expiry_alerts(days_ahead=days_ahead))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/expiry-alerts/tiers')
+@conditional_get(INVENTORY, daily=True)
+def get_expiry_tiers():
+    try:
+        agent = get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # e.g. /api/expiry-alerts/tiers?tiers=7,30,90 (default: EXPIRY_TIER_DAYS)
+        return jsonify(agent.get_expiry_tiers(request.args.get('tiers')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/forecasts')
+@conditional_get(INVENTORY, SALES, daily=True)
+def get_forecasts():
+    try:
+        agent = get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        return jsonify(agent.get_forecasts())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reports/<kind>')
+def get_report(kind):
+    try:
+        agent = get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+        if kind not in REPORT_KINDS:
+            return jsonify({"error": f"Unknown report: {kind}"}), 404
+
+        # The stored JSON is spliced in verbatim rather than parsed and re-encoded
+        payload, computed_at, pending = agent.get_report(kind)
+        head = json.dumps({"kind": kind, "computed_at": computed_at.isoformat(), "pending": pending})
+        return app.response_class(head[:-1] + ', "data": ' + payload + '}', mimetype='application/json')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/purchase-order')
+@conditional_get(INVENTORY, SALES, daily=True)
 def get_purchase_order():
     try:
         agent=get_agent()
+        stored = _stored_report(agent, 'purchase_order')
+        if stored is not None:
+            return stored
         order = agent.generate_purchase_order()
         return jsonify(order)
     except Exception as e:
@@ -140,27 +327,60 @@ def record_sale():
         data = request.json
         product_id = data['product_id']
         quantity = data['quantity']
-        
-        # Get product details for calculation
-        df = agent.fetch_compressed_data()
-        product = df[df['product_id'] == product_id]
-        if product.empty:
-            return jsonify({"error": f"Product {product_id} not found"}), 404
-        
-        mrp = product['mrp'].iloc[0]
-        cost_per_unit = product['order_cost_fixed'].iloc[0]
-        revenue = quantity * mrp
-        profit = quantity * (mrp - cost_per_unit)
-        
-        agent.record_sale(product_id, quantity)
+
+        try:
+            result = agent.record_sale(product_id, quantity)
+        except InsufficientStockError as e:
+            return jsonify({"error": str(e)}), 409
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 404
+
         return jsonify({
             "message": "Sale recorded successfully",
-            "revenue": round(revenue, 2),
-            "profit": round(profit, 2)
+            "revenue": result['revenue'],
+            "profit": result['profit']
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/record-sales', methods=['POST'])
+def record_sales():
+    try:
+        agent=get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # {"items": [{"product_id": 1, "quantity": 2}, ...]}
+        try:
+            results = agent.record_sales((request.json or {}).get('items'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(_bulk_response(results))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/update-stock/bulk', methods=['POST'])
+def update_stock_bulk():
+    try:
+        agent=get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # {"items": [{"product_id": 1, "quantity_change": 50, "total_cost": 2400}, ...]}
+        try:
+            results = agent.update_stock_bulk((request.json or {}).get('items'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(_bulk_response(results))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _bulk_response(results):
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
 @app.route('/api/update-stock', methods=['POST'])
 def update_stock():
     try:
@@ -169,33 +389,156 @@ def update_stock():
         product_id = data['product_id']
         quantity_change = data['quantity_change']
         total_cost = data.get('total_cost', 0)
-        agent.update_stock(product_id, quantity_change, total_cost)
+        try:
+            agent.update_stock(product_id, quantity_change, total_cost)
+        except InsufficientStockError as e:
+            return jsonify({"error": str(e)}), 409
         return jsonify({"message": "Stock updated successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _encode_cursor(cursor):
+    if cursor is None:
+        return None
+    sale_date, row_id = cursor
+    return base64.urlsafe_b64encode(f"{sale_date.isoformat()}|{row_id}".encode()).decode()
+
+def _decode_cursor(token):
+    sale_date, row_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+    return datetime.strptime(sale_date, '%Y-%m-%d').date(), int(row_id)
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _stream_sales_history(agent, fmt, filters):
+    if fmt == 'csv':
+        header = True
+        for chunk in agent.iter_sales_history(**filters):
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+        if header:
+            yield ','.join(SALES_HISTORY_COLUMNS) + '\n'
+    else:
+        for chunk in agent.iter_sales_history(**filters):
+            if chunk.empty:
+                continue
+            lines = chunk.to_json(orient='records', lines=True)
+            yield lines if lines.endswith('\n') else lines + '\n'
+
 @app.route('/api/sales-history')
 def get_sales_history():
     try:
         agent=get_agent()
-        sales_df = agent.fetch_sales_data()
-        inventory_df = agent.fetch_compressed_data()
-        
-        # Merge with inventory to get product names
-        sales_df = sales_df.merge(inventory_df[['product_id', 'product_name']], on='product_id', how='left')
-        
-        # Sort by date descending, then by id descending (newest first)
-        sales_df = sales_df.sort_values(['sale_date'], ascending=False)
-        
-        # Convert to dict and format dates
-        sales_history = sales_df.to_dict('records')
-        for sale in sales_history:
-            sale['sale_date'] = sale['sale_date'].strftime('%Y-%m-%d') if hasattr(sale['sale_date'], 'strftime') else str(sale['sale_date'])
-        
-        return jsonify(sales_history)
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # Filters: ?product_id=3&type=sale&start=2026-01-01&end=2026-03-31
+        try:
+            filters = {
+                'product_id': request.args.get('product_id', type=int),
+                'txn_type': request.args.get('type') or None,
+                'start_date': _parse_date(request.args.get('start')),
+                'end_date': _parse_date(request.args.get('end')),
+            }
+            cursor = request.args.get('cursor')
+            cursor = _decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({"error": "Invalid date or cursor"}), 400
+
+        # Export mode streams every matching row: ?format=ndjson, csv or parquet;
+        # columnar and arrow send the usual page in a compact layout
+        fmt = request.args.get('format')
+        if fmt == 'parquet':
+            chunks = agent.iter_sales_history(**filters)
+            try:
+                return _export_response(encode_chunks(chunks, fmt, 'sales_history', SALES_HISTORY_COLUMNS),
+                                        fmt, 'sales_history')
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        if fmt in ('ndjson', 'csv'):
+            mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+            response = Response(stream_with_context(_stream_sales_history(agent, fmt, filters)), mimetype=mimetype)
+            if fmt == 'csv':
+                response.headers['Content-Disposition'] = 'attachment; filename=sales_history.csv'
+            return response
+
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        if fmt in FRAME_FORMATS:
+            df, next_cursor = agent.get_sales_history_frame(limit=limit, cursor=cursor, **filters)
+            try:
+                return _frame_response(df, fmt, {"next_cursor": _encode_cursor(next_cursor)})
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        items, next_cursor = agent.get_sales_history_page(limit=limit, cursor=cursor, **filters)
+        return jsonify({"items": items, "next_cursor": _encode_cursor(next_cursor)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def _frame_response(df, fmt, extra=None):
+    if fmt == 'arrow':
+        response = Response(encode_arrow(df), mimetype=ARROW_MIMETYPE)
+        # An IPC stream has no room for extra keys, so they travel as headers
+        for name, value in (extra or {}).items():
+            if value is not None:
+                response.headers['X-' + name.replace('_', '-').title()] = str(value)
+        return response
+    return Response(encode_columnar(df, extra), mimetype='application/json')
+
+def _export_response(pieces, fmt, name):
+    # The first piece is produced up front, so a missing pyarrow raises
+    # ValueError here instead of breaking the stream
+    first = next(pieces, None)
+
+    def stream():
+        if first is not None:
+            yield first
+        yield from pieces
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/vnd.apache.parquet'
+    response = Response(stream_with_context(stream()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+    return response
+
+@app.route('/api/products/import', methods=['POST'])
+def import_products():
+    try:
+        agent=get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # multipart upload (field "file") or the raw file as the body; ?format=csv|parquet
+        # overrides the file extension
+        upload = request.files.get('file')
+        try:
+            fmt = detect_format(request.args.get('format'), upload.filename if upload else None)
+            stream = upload.stream if upload else request.stream
+            if fmt == 'parquet' and not upload:
+                # Parquet is read from the footer, so the body must be seekable
+                stream = io.BytesIO(request.get_data())
+            summary = agent.import_products(stream, fmt)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/products/export')
+def export_products():
+    try:
+        agent=get_agent()
+        if not agent:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        try:
+            fmt = detect_format(request.args.get('format'))
+            return _export_response(encode_chunks(agent.iter_inventory(), fmt, 'inventory', EXPORT_COLUMNS),
+                                    fmt, 'inventory')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/add-product', methods=['POST'])
 def add_product():
     try:
@@ -235,6 +578,76 @@ def delete_product():
         return jsonify({"error": str(e)}), 500
 
 
+# --------------------------
+# Live updates
+# --------------------------
+
+# Streams are closed after this long so held workers are recycled; the
+# browser's EventSource reconnects on its own and resumes via Last-Event-ID.
+CHANGE_STREAM_SECONDS = float(os.getenv('CHANGE_STREAM_SECONDS', 300))
+CHANGE_KEEPALIVE_SECONDS = 15
+
+def _last_seen_seq():
+    header = request.headers.get('Last-Event-ID')
+    if header and header.isdigit():
+        return int(header)
+    return request.args.get('since', type=int)
+
+def _sse_events(feed, user_id, after):
+    # The first event tells the client where it stands; resync asks it to reload
+    yield f"retry: 3000\nid: {after}\nevent: ready\ndata: {{\"last_seq\": {after}}}\n\n"
+    deadline = time.monotonic() + CHANGE_STREAM_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        result = feed.wait(user_id, after, min(CHANGE_KEEPALIVE_SECONDS, remaining))
+        if result['resync']:
+            after = result['last_seq']
+            yield f"id: {after}\nevent: resync\ndata: {{}}\n\n"
+        elif result['events']:
+            for seq, payload in result['events']:
+                after = seq
+                yield f"id: {seq}\nevent: inventory\ndata: {payload}\n\n"
+        else:
+            yield ": keepalive\n\n"
+
+@app.route('/api/stream')
+def stream_changes():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    feed = get_change_feed()
+    since = _last_seen_seq()
+    if since is None:
+        since = feed.latest(user_id)
+    response = Response(stream_with_context(_sse_events(feed, user_id, since)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/changes')
+def get_changes():
+    # Long-poll fallback: /api/changes?since=42&timeout=25
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        feed = get_change_feed()
+        since = request.args.get('since', type=int)
+        if since is None:
+            return jsonify({"events": [], "last_seq": feed.latest(user_id), "resync": False})
+
+        timeout = max(0.0, min(request.args.get('timeout', 25, type=float), 60.0))
+        result = feed.wait(user_id, since, timeout)
+        events = [dict(json.loads(payload), seq=seq) for seq, payload in result['events']]
+        return jsonify({"events": events, "last_seq": result['last_seq'], "resync": result['resync']})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
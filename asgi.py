@@ -0,0 +1,200 @@
+import logging
+import time
+from collections import namedtuple
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags
+from app import app as flask_app
+from scripts.async_agent import AsyncInventoryAgent, shutdown_executor
+from scripts.cache import INVENTORY, SALES
+from scripts.columnar import ARROW_MIMETYPE, FORMATS as FRAME_FORMATS
+from scripts.db_connection import dispose_async_engine
+from scripts.http_cache import COMPRESS_MIN_BYTES, compress_body, data_etag, etags_enabled
+from scripts.metrics import REQUEST_LATENCY
+
+# Async serving mode:
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read endpoints the dashboard polls are served natively on the event
+# loop by AsyncInventoryAgent (aiomysql + a bounded pandas executor), so a
+# request waiting on MySQL no longer holds a worker.  Everything else (auth,
+# writes, exports, the change stream) falls through to the unchanged Flask
+# app, which asgiref runs on its thread pool.
+
+logger = logging.getLogger('asgi')
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+# A handler result that is already encoded (not a JSON document)
+Encoded = namedtuple('Encoded', 'payload mimetype')
+
+
+def _int_arg(query, name, default=None):
+    # Same leniency as Flask's request.args.get(name, default, type=int)
+    try:
+        return int(query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+async def _stored(agent, kind):
+    """The scheduler's fresh copy of a report, or None to compute it now"""
+    payload = (await agent.fresh_reports((kind,))).get(kind)
+    return None if payload is None else Encoded(payload.encode(), 'application/json')
+
+
+async def inventory(agent, query):
+    # ?format=columnar or arrow, as in the Flask route; other values get the row list
+    fmt = query.get('format')
+    if fmt not in FRAME_FORMATS:
+        return await agent.get_inventory()
+    return Encoded(await agent.get_inventory(fmt), ARROW_MIMETYPE if fmt == 'arrow' else 'application/json')
+
+
+async def advise(agent, query):
+    return await _stored(agent, 'advice') or await agent.get_advice()
+
+
+async def dashboard(agent, query):
+    sections = query.get('sections')
+    if sections:
+        sections = [name.strip() for name in sections.split(',') if name.strip()]
+    return await agent.serve_dashboard(sections)
+
+
+async def sales_summary(agent, query, period):
+    return await agent.get_sales_summary(period)
+
+
+async def fast_moving(agent, query):
+    return await agent.get_fast_moving_items(top_n=_int_arg(query, 'top_n', 5), days=_int_arg(query, 'days'))
+
+
+async def slow_moving(agent, query):
+    return await agent.get_slow_moving_items(threshold=_int_arg(query, 'threshold', 10),
+                                             days=_int_arg(query, 'days'), limit=_int_arg(query, 'limit'))
+
+
+async def expiry_alerts(agent, query):
+    days_ahead = _int_arg(query, 'days_ahead', 30)
+    # The stored report covers the default window
+    stored = await _stored(agent, 'expiry_alerts') if days_ahead == 30 else None
+    return stored or await agent.get_expiry_alerts(days_ahead=days_ahead)
+
+
+async def purchase_order(agent, query):
+    return await _stored(agent, 'purchase_order') or await agent.generate_purchase_order()
+
+
+# path -> (handler, route label for metrics, data kinds for the ETag, depends on today's date)
+ASYNC_ROUTES = {
+    '/api/inventory': (inventory, '/api/inventory', (INVENTORY,), False),
+    '/api/advise': (advise, '/api/advise', (INVENTORY, SALES), True),
+    '/api/dashboard': (dashboard, '/api/dashboard', (INVENTORY, SALES), True),
+    '/api/fast-moving': (fast_moving, '/api/fast-moving', (SALES,), True),
+    '/api/slow-moving': (slow_moving, '/api/slow-moving', (SALES,), True),
+    '/api/expiry-alerts': (expiry_alerts, '/api/expiry-alerts', (INVENTORY,), True),
+    '/api/purchase-order': (purchase_order, '/api/purchase-order', (INVENTORY, SALES), True),
+}
+SALES_SUMMARY_PREFIX = '/api/sales-summary/'
+
+
+def _match(path):
+    """(handler, route label, kinds, daily, path args) or None to fall through to Flask"""
+    if path in ASYNC_ROUTES:
+        return ASYNC_ROUTES[path] + ((),)
+    if path.startswith(SALES_SUMMARY_PREFIX) and '/' not in path[len(SALES_SUMMARY_PREFIX):]:
+        return sales_summary, '/api/sales-summary/<period>', (SALES,), False, (path[len(SALES_SUMMARY_PREFIX):],)
+    return None
+
+
+def _session_user_id(headers):
+    """user_id from the Flask session cookie, verified with the app's secret key"""
+    value = parse_cookie(headers.get('cookie', '')).get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get('user_id')
+
+
+async def _send(send, status, body=b'', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode(), value.encode()) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _serve(scope, send, handler, route, kinds, daily, path_args):
+    started = time.perf_counter()
+    headers = {name.decode().lower(): value.decode() for name, value in scope['headers']}
+    query_string = scope.get('query_string', b'').decode()
+    query = {key: values[0] for key, values in parse_qs(query_string).items()}
+
+    status, body, extra = 200, None, [('Vary', 'Cookie')]
+    user_id = _session_user_id(headers)
+    if not user_id:
+        status, body = 401, {"error": "Unauthorized"}
+    else:
+        etag = None
+        if etags_enabled():
+            etag = data_etag(user_id, kinds, daily, full_path=f"{scope['path']}?{query_string}")
+            extra += [('ETag', f'W/"{etag}"'), ('Cache-Control', 'private, no-cache')]
+        if etag and parse_etags(headers.get('if-none-match')).contains_weak(etag):
+            status = 304
+        else:
+            try:
+                body = await handler(AsyncInventoryAgent(user_id), query, *path_args)
+            except ValueError as e:
+                status, body = 400, {"error": str(e)}
+            except Exception as e:
+                logger.exception("async request failed", extra={'route': route})
+                status, body = 500, {"error": str(e)}
+            if status != 200:
+                extra = [('Vary', 'Cookie')]
+
+    payload = b''
+    if status != 304:
+        if isinstance(body, Encoded):
+            payload = body.payload
+            extra.append(('Content-Type', body.mimetype))
+        else:
+            payload = flask_app.json.dumps(body).encode()
+            extra.append(('Content-Type', 'application/json'))
+        if status == 200 and len(payload) >= COMPRESS_MIN_BYTES:
+            extra[0] = ('Vary', 'Cookie, Accept-Encoding')
+            payload, encoding = compress_body(payload, parse_accept_header(headers.get('accept-encoding')))
+            if encoding:
+                extra.append(('Content-Encoding', encoding))
+        extra.append(('Content-Length', str(len(payload))))
+
+    await _send(send, status, payload, extra)
+    REQUEST_LATENCY.observe(time.perf_counter() - started, 'GET', route, status)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await dispose_async_engine()
+            shutdown_executor()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        matched = _match(scope['path'])
+        if matched is not None:
+            await _serve(scope, send, *matched)
+            return
+    await flask_asgi(scope, receive, send)
@@ -1,25 +1,15 @@
 from flask import Blueprint, request, jsonify, session, render_template, redirect
-from sqlalchemy import create_engine, text
-import random
-import os
-from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from scripts.db_connection import get_engine
+from scripts.ids import get_allocator
+from scripts.passwords import hash_password_pooled, needs_rehash, verify_password_pooled
 
-# Load the variables from the .env file
-load_dotenv()
 auth_bp = Blueprint('auth', __name__)
 
-# Fetch DB credentials from .env
-db_host = os.getenv('DB_HOST')
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
-db_name = os.getenv('DB_NAME')
-
-# Create SQLAlchemy Engine (The bridge to your AWS RDS)
-connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}"
-engine = create_engine(connection_string)
-
 def generate_user_id():
-    return random.randint(1000, 9999)
+    # Next ID from this worker's reserved block of the users sequence
+    return get_allocator('users').allocate()
 
 @auth_bp.route('/login')
 def login_page():
@@ -35,29 +25,31 @@ def signup():
     username = data['username']
     password = data['password']
 
-    # engine.begin() handles the connection and auto-commits the transaction
-    with engine.begin() as conn:
-        # --- CHECK IF USERNAME EXISTS ---
+    # --- CHECK IF USERNAME EXISTS ---
+    with get_engine().connect() as conn:
         check_user_sql = text("SELECT username FROM users WHERE username = :username")
         existing_user = conn.execute(check_user_sql, {"username": username}).fetchone()
-        
-        if existing_user:
-            return jsonify({"message": "Username already exists"}), 409
 
-        # Generate unique 4-digit ID
-        user_id = generate_user_id()
-        check_id_sql = text("SELECT user_id FROM users WHERE user_id = :user_id")
-        
-        while conn.execute(check_id_sql, {"user_id": user_id}).fetchone():
-            user_id = generate_user_id()
+    if existing_user:
+        return jsonify({"message": "Username already exists"}), 409
+
+    # Slow on purpose, so hashed on the password pool and outside any transaction
+    password_hash = hash_password_pooled(password)
+    user_id = generate_user_id()
 
-        # Insert new user securely using named parameters
-        insert_sql = text("INSERT INTO users (user_id, username, password) VALUES (:user_id, :username, :password)")
-        conn.execute(insert_sql, {
-            "user_id": user_id, 
-            "username": username, 
-            "password": password
-        })
+    try:
+        # engine.begin() handles the connection and auto-commits the transaction
+        with get_engine().begin() as conn:
+            # Insert new user securely using named parameters
+            insert_sql = text("INSERT INTO users (user_id, username, password) VALUES (:user_id, :username, :password)")
+            conn.execute(insert_sql, {
+                "user_id": user_id,
+                "username": username,
+                "password": password_hash
+            })
+    except IntegrityError:
+        # Same username signed up concurrently (unique index on username)
+        return jsonify({"message": "Username already exists"}), 409
 
     return jsonify({"message": "User created", "user_id": user_id})
 
@@ -68,14 +60,17 @@ def login():
     password = data['password']
 
     # Using engine.connect() for read-only operations
-    with engine.connect() as conn:
-        login_sql = text("SELECT user_id FROM users WHERE username = :username AND password = :password")
-        result = conn.execute(login_sql, {
-            "username": username, 
-            "password": password
-        }).fetchone()
+    with get_engine().connect() as conn:
+        login_sql = text("SELECT user_id, password FROM users WHERE username = :username")
+        result = conn.execute(login_sql, {"username": username}).fetchone()
 
-    if result:
+    if result and verify_password_pooled(password, result[1]):
+        if needs_rehash(result[1]):
+            # Plain-text (pre-hashing) or weaker password: store it hashed now that we know it
+            password_hash = hash_password_pooled(password)
+            with get_engine().begin() as conn:
+                conn.execute(text("UPDATE users SET password = :password WHERE user_id = :user_id"),
+                             {"password": password_hash, "user_id": result[0]})
         # result[0] gets the first column (user_id) from the returned row
         session['user_id'] = result[0]
         return jsonify({"success": True})
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from scripts import forecasting, migrate, rollups
+from scripts.cache import TenantCache
+from scripts.inventory_agent import InventoryAgent
+from benchmarks.datagen import generate
+
+# Micro-benchmarks of every InventoryAgent entry point on one generated
+# tenant (among --tenants, so tenant scoping is exercised), with regression
+# thresholds.  Each case runs once to warm up and then --repeat times; the
+# read cache is off (zero TTL) unless --warm, so a case measures its SQL and
+# pandas work rather than a cache hit.
+#
+#   python -m benchmarks.bench_agent                                 # check benchmarks/thresholds.json
+#   python -m benchmarks.bench_agent --update-thresholds             # record new limits
+#   python -m benchmarks.bench_agent --db-url mysql+pymysql://user:pw@localhost/bench_db --no-check
+#
+# Exits with status 1 when a case's p50 is above its threshold.
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+
+MIN_THRESHOLD_MS = 1.0
+
+# Stock high enough that the write cases never run out
+BENCH_STOCK = 10 ** 9
+
+
+def _consume(rows):
+    return sum(1 for _ in rows)
+
+
+def _add_and_delete(agent, product_ids):
+    agent.add_product("Benchmark product", 10, 5, 20, 7, 1000, 12.5, 0.8, None)
+    with agent.engine.connect() as conn:
+        product_id = conn.execute(text("SELECT MAX(product_id) FROM inventory WHERE user_id = :uid"),
+                                  {"uid": agent.user_id}).scalar()
+    agent.delete_product(product_id)
+
+
+# name: (callable(agent, product_ids), writes)
+CASES = {
+    'fetch_compressed_data': (lambda agent, ids: agent.fetch_compressed_data(), False),
+    'fetch_sales_data': (lambda agent, ids: agent.fetch_sales_data(), False),
+    'fetch_forecasts': (lambda agent, ids: agent.fetch_forecasts(), False),
+    'get_recommendations': (lambda agent, ids: agent.get_recommendations(), False),
+    'get_advice': (lambda agent, ids: agent.get_advice(), False),
+    'generate_purchase_order': (lambda agent, ids: agent.generate_purchase_order(), False),
+    'get_forecasts': (lambda agent, ids: agent.get_forecasts(), False),
+    'get_sales_summary_monthly': (lambda agent, ids: agent.get_sales_summary('monthly'), False),
+    'get_sales_summary_daily': (lambda agent, ids: agent.get_sales_summary('daily'), False),
+    'get_fast_moving_items': (lambda agent, ids: agent.get_fast_moving_items(), False),
+    'get_slow_moving_items': (lambda agent, ids: agent.get_slow_moving_items(), False),
+    'get_expiry_alerts': (lambda agent, ids: agent.get_expiry_alerts(), False),
+    'get_expiry_tiers': (lambda agent, ids: agent.get_expiry_tiers(), False),
+    'get_dashboard': (lambda agent, ids: agent.get_dashboard(), False),
+    'get_sales_history_page': (lambda agent, ids: agent.get_sales_history_page(limit=100), False),
+    'iter_sales_history': (lambda agent, ids: _consume(agent.iter_sales_history()), False),
+    'record_sale': (lambda agent, ids: agent.record_sale(ids[0], 1), True),
+    'record_sales_10': (lambda agent, ids: agent.record_sales(
+        [{"product_id": product_id, "quantity": 1} for product_id in ids[:10]]), True),
+    'update_stock': (lambda agent, ids: agent.update_stock(ids[1], 5), True),
+    'update_stock_bulk_10': (lambda agent, ids: agent.update_stock_bulk(
+        [{"product_id": product_id, "quantity_change": 5} for product_id in ids[:10]]), True),
+    'add_and_delete_product': (_add_and_delete, True),
+}
+
+
+def time_case(func, agent, product_ids, repeat):
+    """Milliseconds of `repeat` calls after one warm-up call"""
+    func(agent, product_ids)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(agent, product_ids)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def load_thresholds(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_thresholds(path, results, headroom, scale):
+    # A floor, so sub-millisecond cases do not fail on timer noise
+    limits = {name: max(round(statistics.median(samples) * headroom, 1), MIN_THRESHOLD_MS)
+              for name, samples in results.items()}
+    with open(path, 'w') as f:
+        json.dump({'scale': scale, 'headroom': headroom, 'p50_ms': limits}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every InventoryAgent method and check regression thresholds")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--tenants', type=int, default=10)
+    parser.add_argument('--products', type=int, default=1000, help="Products per tenant")
+    parser.add_argument('--sales', type=int, default=20000, help="sales_history rows per tenant")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=20, help="Timed calls per case")
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help="Only this case (repeatable)")
+    parser.add_argument('--warm', action='store_true', help="Keep the read cache on")
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help="JSON file of p50 limits in ms")
+    parser.add_argument('--no-check', action='store_true', help="Report only, e.g. on a different scale or machine")
+    parser.add_argument('--update-thresholds', action='store_true', help="Write p50 x --headroom as the new limits")
+    parser.add_argument('--headroom', type=float, default=2.0)
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_agent.db')}"
+    engine = create_engine(db_url)
+    migrate.upgrade(engine)
+    print(f"Generating {args.tenants} tenants x {args.products} products x {args.sales} sales...")
+    user_id = generate(engine, tenants=args.tenants, products=args.products, sales=args.sales, days=args.days)[0]
+    rollups.rebuild(engine, user_id=user_id)
+    forecasting.rebuild(engine, user_id=user_id)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = :stock WHERE user_id = :uid"),
+                     {"stock": BENCH_STOCK, "uid": user_id})
+        product_ids = [row[0] for row in conn.execute(
+            text("SELECT product_id FROM inventory WHERE user_id = :uid ORDER BY product_id LIMIT 10"),
+            {"uid": user_id})]
+
+    agent = InventoryAgent(user_id, engine=engine, cache=TenantCache() if args.warm else TenantCache(ttl=0))
+    if not args.warm:
+        agent.expiry_index = None
+
+    # Reads first, so the write cases do not change what the reads see between runs
+    names = [name for name in CASES if not args.case or name in args.case]
+    names.sort(key=lambda name: CASES[name][1])
+    results = {}
+    print(f"\n{'case':28} {'p50':>9} {'p95':>9} {'mean':>9}")
+    for name in names:
+        samples = time_case(CASES[name][0], agent, product_ids, args.repeat)
+        results[name] = samples
+        ordered = sorted(samples)
+        print(f"{name:28} {statistics.median(samples):7.2f}ms {ordered[int(len(ordered) * 0.95)]:7.2f}ms "
+              f"{statistics.fmean(samples):7.2f}ms")
+
+    scale = {'tenants': args.tenants, 'products': args.products, 'sales': args.sales, 'days': args.days,
+             'dialect': engine.dialect.name}
+    if args.update_thresholds:
+        save_thresholds(args.thresholds, results, args.headroom, scale)
+        print(f"\n--- Thresholds written to {args.thresholds} ---")
+        return
+    if args.no_check:
+        return
+
+    recorded = load_thresholds(args.thresholds)
+    if recorded.get('scale') != scale:
+        # Limits only mean something at the scale and on the database they were recorded with
+        print(f"\n--- Thresholds were recorded at {recorded.get('scale')}; not checked ---")
+        return
+    limits = recorded['p50_ms']
+    regressions = [(name, statistics.median(results[name]), limits[name])
+                   for name in names if name in limits and statistics.median(results[name]) > limits[name]]
+    unchecked = [name for name in names if name not in limits]
+    if unchecked:
+        print(f"\n  no threshold for: {', '.join(unchecked)}")
+    if regressions:
+        print("\n  REGRESSIONS (p50 above threshold):")
+        for name, p50, limit in regressions:
+            print(f"    {name}: {p50:.2f}ms > {limit:.2f}ms")
+        raise SystemExit(1)
+    print(f"\n--- {len(names) - len(unchecked)} cases within thresholds ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from scripts import migrate
+from benchmarks.datagen import FIRST_USER_ID, generate
+
+# Signup and login throughput with a large users table, in process through
+# Flask's test client (no HTTP server needed).
+#
+#  1. allocate: user IDs straight from the allocator (no HTTP, no hashing).
+#  2. signup:   --signups new accounts from --threads concurrent clients.
+#  3. login:    --logins logins of generated accounts while a probe thread
+#               keeps calling a cheap route, to show that a login burst does
+#               not stall the rest of the app (hashing runs on the bounded
+#               PASSWORD_HASH_WORKERS pool and releases the GIL).
+#
+#   python -m benchmarks.bench_auth --users 100000
+#   python -m benchmarks.bench_auth --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def timed_calls(count, threads, call):
+    """Runs call(n) for n in range(count) on `threads` threads; (seconds, latencies in ms, failures)"""
+    def one(n):
+        started = time.perf_counter()
+        ok = call(n)
+        return (time.perf_counter() - started) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(count)))
+    return time.perf_counter() - started, [ms for ms, _ in results], sum(1 for _, ok in results if not ok)
+
+
+def report(label, count, elapsed, latencies, failures):
+    print(f"  {label}: {count / elapsed:.0f}/s, p50 {statistics.median(latencies):.1f}ms, "
+          f"p95 {percentile(latencies, 0.95):.1f}ms, {failures} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time signup and login with a large users table")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--users', type=int, default=100000, help="Existing accounts")
+    parser.add_argument('--signups', type=int, default=500)
+    parser.add_argument('--logins', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16, help="Concurrent clients")
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_auth.db')}"
+    # The app builds its engine from DB_URL on first use
+    os.environ['DB_URL'] = db_url
+    engine = create_engine(db_url)
+    migrate.upgrade(engine)
+    print(f"Generating {args.users} users...")
+    generate(engine, tenants=args.users, products=0, sales=0)
+
+    from app import app
+    from scripts.ids import get_allocator
+    from scripts.passwords import get_executor, hash_iterations
+
+    print(f"PBKDF2 iterations {hash_iterations()}, hash pool {get_executor()._max_workers} threads, "
+          f"{args.threads} clients")
+    allocator = get_allocator('users')
+    started = time.perf_counter()
+    allocated = [allocator.allocate() for _ in range(10000)]
+    elapsed = time.perf_counter() - started
+    print(f"  allocate: {len(allocated) / elapsed:.0f} IDs/s (block of {allocator.block_size})")
+
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+
+    def signup(n):
+        response = client().post('/api/signup', json={"username": f"new_{n}", "password": f"secret-{n}"})
+        return response.status_code == 200
+
+    def login(n):
+        username = f"bench_{FIRST_USER_ID + n % args.users}"
+        response = client().post('/api/login', json={"username": username, "password": "bench"})
+        return response.status_code == 200
+
+    report('signup', args.signups, *timed_calls(args.signups, args.threads, signup))
+
+    # A probe calling a cheap authenticated route for as long as the login burst lasts
+    probe_latencies, done = [], threading.Event()
+
+    def probe():
+        probe_client = app.test_client()
+        with probe_client.session_transaction() as session:
+            session['user_id'] = FIRST_USER_ID
+        while not done.is_set():
+            started = time.perf_counter()
+            probe_client.get('/api/cache-stats')
+            probe_latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    try:
+        report('login', args.logins, *timed_calls(args.logins, args.threads, login))
+    finally:
+        done.set()
+        prober.join()
+    print(f"  other route during the login burst: p50 {statistics.median(probe_latencies):.1f}ms, "
+          f"p95 {percentile(probe_latencies, 0.95):.1f}ms ({len(probe_latencies)} calls)")
+
+
+if __name__ == "__main__":
+    main()
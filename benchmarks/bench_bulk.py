@@ -0,0 +1,111 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from scripts import bulk, migrate
+from scripts.cache import TenantCache
+from scripts.inventory_agent import InventoryAgent
+from benchmarks.datagen import generate
+
+# Bulk product import and export throughput.
+#
+#  1. import:  a generated --skus catalog as CSV and as Parquet through
+#              InventoryAgent.import_products, against --sample single
+#              add_product calls (what onboarding cost before).
+#  2. export:  inventory and sales_history as CSV and Parquet, streamed the
+#              way /api/products/export and /api/sales-history send them.
+#
+#   python -m benchmarks.bench_bulk --skus 20000
+#   python -m benchmarks.bench_bulk --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+
+def catalog(skus, seed=7):
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    return pd.DataFrame({
+        'product_name': [f"Imported product {n}" for n in range(skus)],
+        'current_stock': rng.integers(0, 500, skus),
+        'safety_stock_level': rng.integers(5, 100, skus),
+        'forecasted_demand': rng.integers(10, 400, skus),
+        'lead_time_days': rng.integers(1, 30, skus),
+        'annual_demand': rng.integers(100, 10000, skus),
+        'order_cost_fixed': np.round(rng.uniform(5, 200, skus), 2),
+        'holding_cost_per_unit': np.round(rng.uniform(0.1, 5), 2),
+        'expiry_date': [today + timedelta(days=int(days)) for days in rng.integers(-30, 400, skus)],
+    })
+
+
+def encode(frame, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'csv':
+        buffer.write(frame.to_csv(index=False).encode())
+    else:
+        frame.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def drain(pieces):
+    """Total bytes of a streamed export"""
+    return sum(len(piece) for piece in pieces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time bulk product import and chunked exports")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--skus', type=int, default=20000, help="Products in the imported catalog")
+    parser.add_argument('--sales', type=int, default=200000, help="sales_history rows for the export benchmark")
+    parser.add_argument('--sample', type=int, default=500, help="Single add_product calls to compare against")
+    parser.add_argument('--chunksize', type=int, default=bulk.DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_bulk.db')}"
+    engine = create_engine(db_url)
+    migrate.upgrade(engine)
+    user_ids = generate(engine, tenants=2, products=100, sales=args.sales)
+    frame = catalog(args.skus)
+    formats = ('csv', 'parquet') if bulk.pa is not None else ('csv',)
+    if bulk.pa is None:
+        print("pyarrow is not installed: Parquet skipped")
+
+    print(f"Importing {args.skus} products...")
+    for fmt, user_id in zip(formats, user_ids):
+        agent = InventoryAgent(user_id, engine=engine, cache=TenantCache(ttl=0))
+        data = encode(frame, fmt)
+        started = time.perf_counter()
+        summary = agent.import_products(io.BytesIO(data), fmt, args.chunksize)
+        elapsed = time.perf_counter() - started
+        print(f"  {fmt:8} {elapsed:6.2f}s  {summary['imported'] / elapsed:8.0f} rows/s  "
+              f"({len(data) / 1e6:.1f} MB, {summary['chunks']} chunks, {summary['failed']} failed)")
+
+    agent = InventoryAgent(user_ids[0], engine=engine, cache=TenantCache(ttl=0))
+    started = time.perf_counter()
+    for row in frame.head(args.sample).itertuples(index=False):
+        agent.add_product(row.product_name, int(row.current_stock), int(row.safety_stock_level),
+                          int(row.forecasted_demand), int(row.lead_time_days), int(row.annual_demand),
+                          float(row.order_cost_fixed), float(row.holding_cost_per_unit), row.expiry_date)
+    elapsed = time.perf_counter() - started
+    print(f"  add_product x {args.sample}: {args.sample / elapsed:.0f} rows/s "
+          f"(a {args.skus}-SKU catalog would take {args.skus * elapsed / args.sample:.0f}s)")
+
+    print(f"Exporting (tenant of {args.skus + 100 + args.sample} products, {args.sales} sales)...")
+    for table in ('inventory', 'sales_history'):
+        for fmt in formats:
+            if table == 'inventory':
+                chunks, columns = agent.iter_inventory(args.chunksize), bulk.EXPORT_COLUMNS
+            else:
+                chunks, columns = agent.iter_sales_history(chunk_size=args.chunksize), bulk.SALES_HISTORY_COLUMNS
+            started = time.perf_counter()
+            size = drain(bulk.encode_chunks(chunks, fmt, table, columns))
+            elapsed = time.perf_counter() - started
+            print(f"  {table:14} {fmt:8} {elapsed:6.2f}s  ({size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from scripts import forecasting, migrate
+from scripts.cache import TenantCache
+from scripts.inventory_agent import InventoryAgent
+from benchmarks.datagen import generate
+
+# Demand forecasting at catalog scale.
+#
+#  1. fold:    the vectorized EW fold over a dense products x days matrix of
+#              daily totals (every product sells every day), chunked the way
+#              forecasting.rebuild streams them; no database involved.
+#  2. rebuild: forecasting.rebuild over a generated tenant's sales_history.
+#  3. read:    forecast state decayed to today and applied to /api/advise.
+#
+#   python -m benchmarks.bench_forecasting --products 100000 --days 730
+#   python -m benchmarks.bench_forecasting --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+
+def bench_fold(products, days, chunksize):
+    """Seconds spent folding `products` x `days` daily totals (data generation excluded), plus the states"""
+    rng = np.random.default_rng(7)
+    alpha = forecasting.smoothing()
+    today = date.today()
+    dates = pd.date_range(today - timedelta(days=days - 1), today).to_numpy()
+    products_per_chunk = max(1, chunksize // days)
+
+    elapsed = 0.0
+    partials = []
+    for start in range(0, products, products_per_chunk):
+        count = min(products_per_chunk, products - start)
+        chunk = pd.DataFrame({
+            'user_id': 1,
+            'product_id': np.repeat(np.arange(start, start + count), days),
+            'sale_date': np.tile(dates, count),
+            'units': rng.poisson(rng.uniform(0.5, 20, count).repeat(days)),
+        })
+        started = time.perf_counter()
+        partials.append(forecasting.fold_daily(chunk, today.toordinal(), alpha))
+        elapsed += time.perf_counter() - started
+    started = time.perf_counter()
+    states = forecasting.combine_states(partials)
+    return elapsed + time.perf_counter() - started, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time demand forecast rebuilds and reads")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--products', type=int, default=100000, help="SKUs in the benchmark tenant")
+    parser.add_argument('--days', type=int, default=730, help="Days of daily sales in the fold benchmark")
+    parser.add_argument('--sales', type=int, default=1000000, help="sales_history rows for the rebuild benchmark")
+    parser.add_argument('--chunksize', type=int, default=500000)
+    args = parser.parse_args()
+
+    print(f"Folding {args.products} products x {args.days} days of daily sales in memory...")
+    elapsed, states = bench_fold(args.products, args.days, args.chunksize)
+    rows = args.products * args.days
+    print(f"  fold: {elapsed:.2f}s ({rows / elapsed / 1e6:.1f}M daily rows/s, {len(states)} products)")
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_forecasting.db')}"
+    engine = create_engine(db_url)
+    migrate.upgrade(engine)
+    print(f"Generating 1 tenant x {args.products} products x {args.sales} sales over {args.days} days...")
+    user_id = generate(engine, tenants=1, products=args.products, sales=args.sales, days=args.days)[0]
+
+    started = time.perf_counter()
+    count = forecasting.rebuild(engine, user_id=user_id, chunksize=args.chunksize)
+    print(f"  rebuild: {time.perf_counter() - started:.2f}s ({count} products forecast)")
+
+    # A zero-TTL cache so every call really reads the forecast state
+    agent = InventoryAgent(user_id, engine=engine, cache=TenantCache(ttl=0))
+    started = time.perf_counter()
+    forecasts = agent.fetch_forecasts()
+    print(f"  read state + decay: {(time.perf_counter() - started) * 1000:.0f}ms ({len(forecasts)} products)")
+    started = time.perf_counter()
+    advice = agent.get_advice()
+    print(f"  /api/advise with forecasts: {(time.perf_counter() - started) * 1000:.0f}ms ({len(advice)} lines)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine, text
+from scripts import migrate
+from benchmarks.datagen import generate
+
+# Query plans and latency of the tenant-scoped hot queries before and after
+# migration 0004 (composite indexes).
+#
+#   python -m benchmarks.bench_indexes --tenants 200 --products 500 --sales 10000
+#   python -m benchmarks.bench_indexes --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+INDEX_MIGRATION = '0004'
+
+HOT_QUERIES = {
+    'inventory_load': (
+        "SELECT * FROM inventory WHERE user_id = :uid", {}),
+    'product_lookup': (
+        "SELECT product_id, order_cost_fixed FROM inventory WHERE user_id = :uid AND product_id = :pid", {}),
+    'history_page': (
+        "SELECT id, product_id, sale_date, quantity_sold FROM sales_history WHERE user_id = :uid "
+        "ORDER BY sale_date DESC, id DESC LIMIT 100", {}),
+    'fast_moving_30d': (
+        "SELECT s.product_id, SUM(s.quantity_sold) AS q FROM sales_history s "
+        "WHERE s.user_id = :uid AND s.sale_date >= :since GROUP BY s.product_id ORDER BY q DESC LIMIT 5", {}),
+    'product_history_count': (
+        "SELECT COUNT(*) FROM sales_history WHERE user_id = :uid AND product_id = :pid", {}),
+    'login_lookup': (
+        "SELECT user_id FROM users WHERE username = :username", {}),
+}
+
+
+def explain(conn, sql, params):
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == 'sqlite' else "EXPLAIN "
+    rows = conn.execute(text(prefix + sql), params).fetchall()
+    if conn.dialect.name == 'sqlite':
+        return '; '.join(str(row[-1]) for row in rows)
+    return '; '.join(f"{row._mapping.get('table')}:{row._mapping.get('type')}/{row._mapping.get('key')}"
+                     f" rows={row._mapping.get('rows')}" for row in rows)
+
+
+def measure(engine, user_ids, repeat):
+    """{query: (median_ms, p95_ms, plan)} over `repeat` random tenants"""
+    results = {}
+    since = date.today() - timedelta(days=30)
+    with engine.connect() as conn:
+        first_product = {
+            uid: conn.execute(text("SELECT MIN(product_id) FROM inventory WHERE user_id = :uid"), {"uid": uid}).scalar()
+            for uid in user_ids
+        }
+        for name, (sql, _) in HOT_QUERIES.items():
+            timings = []
+            plan = None
+            for n in range(repeat):
+                uid = user_ids[n % len(user_ids)]
+                params = {"uid": uid, "pid": first_product[uid], "since": since, "username": f"bench_{uid}"}
+                params = {key: value for key, value in params.items() if f":{key}" in sql}
+                if plan is None:
+                    plan = explain(conn, sql, params)
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = (statistics.median(timings), timings[int(len(timings) * 0.95) - 1], plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tenant-scoped queries with and without indexes")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--sales', type=int, default=5000, help="sales_history rows per tenant")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')}"
+    engine = create_engine(db_url)
+
+    previous = [version for version, _, _ in migrate.discover() if version < INDEX_MIGRATION][-1]
+    migrate.upgrade(engine, target=previous)
+    print(f"Generating {args.tenants} tenants x {args.products} products x {args.sales} sales rows...")
+    user_ids = generate(engine, args.tenants, args.products, args.sales)
+
+    before = measure(engine, user_ids, args.repeat)
+    migrate.upgrade(engine, target=INDEX_MIGRATION)
+    after = measure(engine, user_ids, args.repeat)
+
+    print(f"\n{'query':24} {'before p50':>11} {'after p50':>10} {'before p95':>11} {'after p95':>10} {'speedup':>8}")
+    for name in HOT_QUERIES:
+        b50, b95, _ = before[name]
+        a50, a95, _ = after[name]
+        print(f"{name:24} {b50:9.3f}ms {a50:8.3f}ms {b95:9.3f}ms {a95:8.3f}ms {b50 / a50 if a50 else 0:7.1f}x")
+
+    print("\nQuery plans:")
+    for name in HOT_QUERIES:
+        print(f"  {name}\n    before: {before[name][2]}\n    after:  {after[name][2]}")
+
+
+if __name__ == "__main__":
+    main()
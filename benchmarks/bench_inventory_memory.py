@@ -0,0 +1,84 @@
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from sqlalchemy import create_engine, text
+from scripts import migrate
+from scripts.cache import TenantCache
+from scripts.expiry import EXPIRY_RISK_COLUMNS
+from scripts.inventory_agent import InventoryAgent, RECOMMENDATION_COLUMNS
+from benchmarks.datagen import generate
+
+# Memory and load time of one large tenant's inventory: the old
+# SELECT * / default-dtype path against the projected, typed loader.
+#
+#   python -m benchmarks.bench_inventory_memory --products 100000
+#   python -m benchmarks.bench_inventory_memory --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+
+def legacy_load(engine, user_id):
+    """The pre-projection loader: every column, pandas' default dtypes"""
+    query = text("SELECT * FROM inventory WHERE user_id = :user_id")
+    df = pd.read_sql(query, engine, params={"user_id": user_id})
+    df['mrp'] = df['order_cost_fixed'].fillna(0) * 1.5
+    return df
+
+
+def measure(load, repeat):
+    """(frame_bytes, peak_bytes, median_ms) for one loader"""
+    gc.collect()
+    tracemalloc.start()
+    df = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    frame_bytes = int(df.memory_usage(index=True, deep=True).sum())
+    del df
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return frame_bytes, peak, timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inventory DataFrame memory before and after typed loading")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--products', type=int, default=100000, help="SKUs in the benchmark tenant")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_inventory_memory.db')}"
+    engine = create_engine(db_url)
+
+    migrate.upgrade(engine)
+    print(f"Generating 1 tenant x {args.products} products...")
+    user_id = generate(engine, tenants=1, products=args.products, sales=0)[0]
+
+    # A zero-TTL cache so every call really hits the database
+    agent = InventoryAgent(user_id, engine=engine, cache=TenantCache(ttl=0))
+    loaders = {
+        'SELECT * (legacy)': lambda: legacy_load(engine, user_id),
+        'typed, all columns': lambda: agent.fetch_compressed_data(),
+        'typed, recommendations': lambda: agent.fetch_compressed_data(RECOMMENDATION_COLUMNS),
+        'typed, expiry alerts': lambda: agent.fetch_compressed_data(EXPIRY_RISK_COLUMNS),
+    }
+
+    results = {name: measure(load, args.repeat) for name, load in loaders.items()}
+    baseline = results['SELECT * (legacy)'][0]
+
+    print(f"\n{'loader':24} {'frame MB':>9} {'peak MB':>8} {'p50 ms':>8} {'vs legacy':>10}")
+    for name, (frame_bytes, peak, median_ms) in results.items():
+        print(f"{name:24} {frame_bytes / 2**20:9.2f} {peak / 2**20:8.2f} {median_ms:8.1f} "
+              f"{frame_bytes / baseline:9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import gzip
+import os
+import statistics
+import tempfile
+import time
+from flask import Flask
+from sqlalchemy import create_engine
+from scripts import columnar, migrate
+from scripts.cache import TenantCache
+from scripts.inventory_agent import InventoryAgent, inventory_records
+from benchmarks.datagen import generate
+
+# Serialization cost and payload size of the DataFrame endpoints, per
+# response mode:
+#
+#  records:   the default body, a list of row dicts through Flask's JSON
+#             provider (what /api/inventory and /api/sales-history send).
+#  columnar:  ?format=columnar with the stdlib encoder and, if installed,
+#             with orjson.
+#  arrow:     ?format=arrow, an Arrow IPC stream (needs pyarrow).
+#
+# The frames are loaded once; only the frame -> bytes step is timed (CPU
+# time, median of --repeat runs).
+#
+#   python -m benchmarks.bench_serialization --products 100000 --rows 100000
+
+
+def cpu_ms(encode, repeat):
+    """(median CPU ms, body) of `repeat` calls of encode()"""
+    times = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = encode()
+        times.append((time.process_time() - started) * 1000)
+    return statistics.median(times), body
+
+
+def modes(flask_app, records):
+    """(label, encode(frame)) for every mode available here"""
+    found = [('records', lambda frame: flask_app.json.dumps(records(frame)).encode()),
+             ('columnar', lambda frame: columnar.encode_columnar(frame, fast=False))]
+    if columnar.orjson is not None:
+        found.append(('columnar+orjson', lambda frame: columnar.encode_columnar(frame, fast=True)))
+    if columnar.pa is not None:
+        found.append(('arrow', columnar.encode_arrow))
+    return found
+
+
+def report(title, frame, flask_app, records, repeat):
+    print(f"{title} ({len(frame)} rows x {len(frame.columns)} columns):")
+    baseline = None
+    for label, encode in modes(flask_app, records):
+        ms, body = cpu_ms(lambda: encode(frame), repeat)
+        packed = len(gzip.compress(body, compresslevel=6))
+        baseline = baseline or (ms, len(body))
+        print(f"  {label:16} {ms:8.1f}ms CPU ({baseline[0] / ms:4.1f}x)  {len(body) / 1e6:7.2f} MB "
+              f"({baseline[1] / len(body):4.1f}x smaller)  gzip {packed / 1e6:6.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON records, columnar JSON and Arrow response bodies")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--products', type=int, default=100000, help="Products of the benchmarked tenant")
+    parser.add_argument('--rows', type=int, default=100000, help="sales_history rows serialized in one body")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_serialization.db')}"
+    engine = create_engine(db_url)
+    migrate.upgrade(engine)
+    print(f"Generating 1 tenant x {args.products} products, {args.rows} sales...")
+    user_id = generate(engine, tenants=1, products=args.products, sales=args.rows)[0]
+    agent = InventoryAgent(user_id, engine=engine, cache=TenantCache(ttl=0))
+    print(f"orjson {'installed' if columnar.orjson is not None else 'not installed'}, "
+          f"pyarrow {'installed' if columnar.pa is not None else 'not installed'}")
+
+    # Same JSON provider (and date encoding) as the app's jsonify
+    flask_app = Flask(__name__)
+    report('inventory', agent.fetch_compressed_data(), flask_app, inventory_records, args.repeat)
+    history, _ = agent.get_sales_history_frame(limit=args.rows)
+    report('sales history', history, flask_app,
+           lambda frame: InventoryAgent._format_sales_history(frame.copy()).to_dict('records'), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
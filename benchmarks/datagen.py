@@ -0,0 +1,110 @@
+import argparse
+import time
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import create_engine, text
+from scripts import ids
+from scripts.migrate import has_table
+from scripts.passwords import hash_password
+
+# Synthetic tenants for benchmarks: N users x M products x K sales rows each.
+# Works against any database the app supports (MySQL or a SQLite stand-in);
+# the schema must already exist (python -m scripts.migrate upgrade).
+
+FIRST_USER_ID = 100000
+INSERT_CHUNK = 20000
+
+WORDS = np.array(['Warm', 'White', 'Slate', 'Grey', 'Oak', 'Brass', 'Smart', 'Copper',
+                  'Primer', 'Zinc', 'Vinyl', 'Steel', 'Hinge', 'Paint', 'Tile', 'Wire'])
+
+
+def _chunks(rows, size=INSERT_CHUNK):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def generate(engine, tenants=10, products=100, sales=1000, days=365, seed=42, first_user_id=FIRST_USER_ID):
+    """
+    Inserts `tenants` users, each with `products` products and `sales`
+    sales_history rows spread over the last `days` days.
+    Returns the generated user_ids.
+    """
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    user_ids = list(range(first_user_id, first_user_id + tenants))
+
+    # One hash of "bench" shared by every tenant: hashing each would dominate large runs
+    password = hash_password("bench")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (user_id, username, password) VALUES (:uid, :name, :pw)
+        """), [{"uid": uid, "name": f"bench_{uid}", "pw": password} for uid in user_ids])
+        if user_ids and has_table(conn, 'id_sequences'):
+            # Signups must not be handed the IDs generated here
+            ids.advance_past(conn, 'users', user_ids[-1])
+
+        next_product_id = (conn.execute(text("SELECT MAX(product_id) FROM inventory")).scalar() or 0) + 1
+        for uid in user_ids:
+            product_ids = np.arange(next_product_id, next_product_id + products)
+            next_product_id += products
+
+            names = [f"{a} {b} {pid}" for a, b, pid in
+                     zip(rng.choice(WORDS, products), rng.choice(WORDS, products), product_ids)]
+            safety = rng.integers(5, 100, products)
+            cost = np.round(rng.uniform(5, 200, products), 2)
+            inventory_rows = [
+                {"pid": int(product_ids[i]), "pn": names[i], "cs": int(rng.integers(0, 500)),
+                 "ssl": int(safety[i]), "fd": int(safety[i] * rng.uniform(1.5, 4)),
+                 "ltd": int(rng.integers(1, 30)), "ad": int(rng.integers(100, 10000)),
+                 "ocf": float(cost[i]), "hcpu": float(np.round(rng.uniform(0.1, 5), 2)),
+                 "ed": today + timedelta(days=int(rng.integers(-30, 400))), "uid": uid}
+                for i in range(products)
+            ]
+            for chunk in _chunks(inventory_rows):
+                conn.execute(text("""
+                    INSERT INTO inventory
+                    (product_id, product_name, current_stock, safety_stock_level, forecasted_demand,
+                     lead_time_days, annual_demand, order_cost_fixed, holding_cost_per_unit, expiry_date, user_id)
+                    VALUES (:pid, :pn, :cs, :ssl, :fd, :ltd, :ad, :ocf, :hcpu, :ed, :uid)
+                """), chunk)
+
+            # Skewed demand: a few products sell far more than the rest
+            picks = np.minimum(rng.zipf(1.3, sales) - 1, products - 1)
+            quantity = rng.integers(1, 20, sales)
+            is_sale = rng.random(sales) < 0.8
+            unit_cost = cost[picks]
+            revenue = np.where(is_sale, quantity * unit_cost * 1.5, -quantity * unit_cost)
+            profit = np.where(is_sale, quantity * unit_cost * 0.5, 0)
+            offsets = rng.integers(0, days, sales)
+            sales_rows = [
+                {"pid": int(product_ids[picks[i]]), "uid": uid,
+                 "sdate": today - timedelta(days=int(offsets[i])), "qs": int(quantity[i]),
+                 "rev": round(float(revenue[i]), 2), "prof": round(float(profit[i]), 2),
+                 "type": 'sale' if is_sale[i] else 'purchase'}
+                for i in range(sales)
+            ]
+            for chunk in _chunks(sales_rows):
+                conn.execute(text("""
+                    INSERT INTO sales_history (product_id, user_id, sale_date, quantity_sold, revenue, profit, type)
+                    VALUES (:pid, :uid, :sdate, :qs, :rev, :prof, :type)
+                """), chunk)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load synthetic tenants into a benchmark database")
+    parser.add_argument('--db-url', required=True, help="Target database (never point this at production)")
+    parser.add_argument('--tenants', type=int, default=10)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--sales', type=int, default=1000, help="sales_history rows per tenant")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    user_ids = generate(create_engine(args.db_url), args.tenants, args.products, args.sales, args.days, args.seed)
+    print(f"--- Generated {len(user_ids)} tenants in {time.perf_counter() - started:.1f}s ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import json
+import statistics
+import threading
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from benchmarks.datagen import FIRST_USER_ID
+
+# Concurrent dashboard users against a running server, to compare the sync
+# (gunicorn app:app) and async (uvicorn asgi:application) serving modes on the
+# same database.  Users are the tenants created by benchmarks.datagen
+# (username bench_<id>, password "bench").
+#
+#   gunicorn -w 4 app:app -b :8000               &   uvicorn asgi:application --workers 4 --port 8001 &
+#   python -m benchmarks.load_test --target sync=http://localhost:8000 --target async=http://localhost:8001
+#
+# Run both servers with CACHE_ENABLED=false to measure the database path
+# rather than the read cache.
+#
+# Scenarios: `tabs` (the five tab calls of one page view, back to back),
+# `overview` (the single batched dashboard call, back to back) and `mixed`,
+# which replays what an open dashboard really sends: a page load, a
+# conditional refresh every --poll-interval seconds and, for --sellers of the
+# users, a burst of --burst sales every --burst-interval seconds.
+#
+# --max-p95-ms / --max-error-rate turn the run into a pass/fail check.
+
+OVERVIEW_URL = '/api/dashboard?sections=inventory,advice,fast_moving,expiry_alerts,slow_moving'
+# The five calls the old dashboard issued in parallel for one page view
+TAB_URLS = ('/api/inventory', '/api/advise', '/api/expiry-alerts', '/api/purchase-order', '/api/sales-summary/monthly')
+
+
+def login(base_url, user_id):
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    body = json.dumps({"username": f"bench_{user_id}", "password": "bench"}).encode()
+    request = urllib.request.Request(base_url + '/api/login', data=body, headers={'Content-Type': 'application/json'})
+    opener.open(request, timeout=30).read()
+    return opener
+
+
+def timed_get(opener, url):
+    ms, status, _ = timed_request(opener, url)
+    return ms, status == 200
+
+
+def timed_request(opener, url, body=None, etag=None):
+    """(milliseconds, HTTP status or None, ETag) of one call"""
+    headers = {'Content-Type': 'application/json'}
+    if etag:
+        headers['If-None-Match'] = etag
+    data = json.dumps(body).encode() if body is not None else None
+    started = time.perf_counter()
+    try:
+        with opener.open(urllib.request.Request(url, data=data, headers=headers), timeout=60) as response:
+            response.read()
+            status, etag = response.status, response.headers.get('ETag')
+    except urllib.error.HTTPError as e:
+        # 304 Not Modified and 409 sold out are answers, not failures
+        status = e.code
+    except Exception:
+        status = None
+    return (time.perf_counter() - started) * 1000, status, etag
+
+
+def record(results, lock, kind, ms, ok):
+    with lock:
+        results['kinds'].setdefault(kind, []).append(ms)
+        results['requests'].append(ms)
+        results['errors'] += 0 if ok else 1
+
+
+def run_dashboard(base_url, user_id, deadline, results, lock, options, seller):
+    """One open dashboard: page load, then conditional refreshes and (for sellers) sale bursts"""
+    opener = login(base_url, user_id)
+    rng = random.Random(user_id)
+    ms, status, etag = timed_request(opener, base_url + OVERVIEW_URL)
+    record(results, lock, 'page_load', ms, status == 200)
+    with lock:
+        results['pages'].append(ms)
+
+    product_ids = []
+    if seller:
+        with opener.open(base_url + '/api/inventory', timeout=60) as response:
+            product_ids = [row['product_id'] for row in json.load(response)]
+    # Spread the users' schedules out instead of polling in lockstep
+    next_poll = time.monotonic() + rng.uniform(0, options.poll_interval)
+    next_burst = time.monotonic() + rng.uniform(0, options.burst_interval)
+    while True:
+        now = time.monotonic()
+        wake = min(next_poll, next_burst) if product_ids else next_poll
+        if wake >= deadline:
+            return
+        time.sleep(max(0.0, wake - now))
+        if time.monotonic() >= next_poll:
+            next_poll += options.poll_interval
+            ms, status, new_etag = timed_request(opener, base_url + OVERVIEW_URL, etag=etag)
+            record(results, lock, 'poll', ms, status in (200, 304))
+            etag = new_etag or etag
+        if product_ids and time.monotonic() >= next_burst:
+            next_burst += options.burst_interval
+            for _ in range(options.burst):
+                body = {"product_id": rng.choice(product_ids), "quantity": rng.randint(1, 3)}
+                ms, status, _ = timed_request(opener, base_url + '/api/record-sale', body=body)
+                record(results, lock, 'sale', ms, status in (200, 409))
+
+
+def run_user(base_url, user_id, scenario, deadline, results, lock):
+    opener = login(base_url, user_id)
+    # Per-user pool so the five tab calls really are concurrent, as in a browser
+    with ThreadPoolExecutor(max_workers=len(TAB_URLS)) as calls:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            if scenario == 'overview':
+                samples = [timed_get(opener, base_url + OVERVIEW_URL)]
+            else:
+                samples = list(calls.map(lambda path: timed_get(opener, base_url + path), TAB_URLS))
+            page_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                results['pages'].append(page_ms)
+                results['requests'].extend(ms for ms, _ in samples)
+                results['errors'] += sum(1 for _, ok in samples if not ok)
+
+
+def run(base_url, users, tenants, scenario, duration, options=None):
+    results = {'pages': [], 'requests': [], 'errors': 0, 'kinds': {}}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        if scenario == 'mixed':
+            sellers = round(users * options.sellers)
+            futures = [pool.submit(run_dashboard, base_url, FIRST_USER_ID + n % tenants, deadline, results, lock,
+                                   options, n < sellers)
+                       for n in range(users)]
+        else:
+            futures = [pool.submit(run_user, base_url, FIRST_USER_ID + n % tenants, scenario, deadline, results,
+                                   lock)
+                       for n in range(users)]
+        for future in futures:
+            future.result()
+    return results
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard read APIs with concurrent users")
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help="Server to test, e.g. async=http://localhost:8001 (repeatable)")
+    parser.add_argument('--users', type=int, default=200, help="Concurrent simulated users")
+    parser.add_argument('--tenants', type=int, default=100, help="Tenants created by benchmarks.datagen")
+    parser.add_argument('--scenario', choices=('overview', 'tabs', 'mixed'), default='tabs')
+    parser.add_argument('--duration', type=float, default=60, help="Seconds per target")
+    parser.add_argument('--poll-interval', type=float, default=30, help="mixed: seconds between dashboard refreshes")
+    parser.add_argument('--sellers', type=float, default=0.1, help="mixed: fraction of users that record sales")
+    parser.add_argument('--burst', type=int, default=10, help="mixed: sales per burst")
+    parser.add_argument('--burst-interval', type=float, default=15, help="mixed: seconds between a seller's bursts")
+    parser.add_argument('--max-p95-ms', type=float, default=None, help="Fail if any target's request p95 is higher")
+    parser.add_argument('--max-error-rate', type=float, default=None, help="Fail if any target's error rate is higher")
+    args = parser.parse_args()
+
+    rows, kinds, failures = [], [], []
+    for target in args.target:
+        name, _, base_url = target.partition('=')
+        print(f"Running {args.users} users against {name} ({base_url}) for {args.duration:.0f}s...")
+        results = run(base_url.rstrip('/'), args.users, args.tenants, args.scenario, args.duration, args)
+        pages, requests = results['pages'], results['requests']
+        rows.append((name, len(pages) / args.duration, len(requests) / args.duration,
+                     statistics.median(pages) if pages else 0.0, percentile(pages, 0.95),
+                     percentile(requests, 0.99), results['errors']))
+        for kind, samples in sorted(results['kinds'].items()):
+            kinds.append((name, kind, len(samples), statistics.median(samples), percentile(samples, 0.95)))
+
+        p95 = percentile(requests, 0.95)
+        error_rate = results['errors'] / len(requests) if requests else 1.0
+        if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+            failures.append(f"{name}: request p95 {p95:.1f}ms > {args.max_p95_ms:.1f}ms")
+        if args.max_error_rate is not None and error_rate > args.max_error_rate:
+            failures.append(f"{name}: error rate {error_rate:.3f} > {args.max_error_rate:.3f}")
+
+    print(f"\n{'target':10} {'pages/s':>8} {'req/s':>8} {'page p50':>10} {'page p95':>10} {'req p99':>10} {'errors':>7}")
+    for name, page_rate, request_rate, p50, p95, p99, errors in rows:
+        print(f"{name:10} {page_rate:8.1f} {request_rate:8.1f} {p50:8.1f}ms {p95:8.1f}ms {p99:8.1f}ms {errors:7}")
+    if args.scenario == 'mixed':
+        print(f"\n{'target':10} {'call':10} {'count':>7} {'p50':>10} {'p95':>10}")
+        for name, kind, count, p50, p95 in kinds:
+            print(f"{name:10} {kind:10} {count:7} {p50:8.1f}ms {p95:8.1f}ms")
+    if failures:
+        print("\n  FAILED:\n    " + "\n    ".join(failures))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
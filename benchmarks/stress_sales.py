@@ -0,0 +1,125 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, text
+from scripts import migrate
+from scripts.cache import TenantCache
+from scripts.inventory_agent import InsufficientStockError, InventoryAgent
+from benchmarks.datagen import generate
+
+# Many sellers hammering a few products at once through record_sale, to show
+# that the conditional stock decrement never oversells and what it costs.
+# Every product starts with --stock units; sellers keep selling until the
+# time is up, most of the run against sold-out products.  At the end:
+#
+#   * no product's stock is below zero,
+#   * every product's stock dropped by exactly the units of successful sales,
+#   * sales_history holds exactly those sales.
+#
+#   python -m benchmarks.stress_sales --sellers 32 --products 5 --stock 2000
+#   python -m benchmarks.stress_sales --db-url mysql+pymysql://user:pw@localhost/bench_db
+
+
+def seller(agent, product_ids, max_quantity, deadline, seed):
+    """One seller's loop: ({product_id: units sold}, Counter of outcomes, latencies in ms)"""
+    rng = random.Random(seed)
+    sold, outcomes, latencies = Counter(), Counter(), []
+    while time.monotonic() < deadline:
+        product_id = rng.choice(product_ids)
+        quantity = rng.randint(1, max_quantity)
+        started = time.perf_counter()
+        try:
+            agent.record_sale(product_id, quantity)
+            sold[product_id] += quantity
+            outcomes['ok'] += 1
+        except InsufficientStockError:
+            outcomes['insufficient_stock'] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sold, outcomes, latencies
+
+
+def stock_levels(engine, user_id):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT product_id, current_stock FROM inventory WHERE user_id = :uid"),
+                            {"uid": user_id})
+        return {row[0]: row[1] for row in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent record_sale calls against a few hot products")
+    parser.add_argument('--db-url', default=None, help="Empty scratch database; defaults to a temporary SQLite file")
+    parser.add_argument('--sellers', type=int, default=32, help="Concurrent seller threads")
+    parser.add_argument('--products', type=int, default=5, help="Products the sellers compete for")
+    parser.add_argument('--stock', type=int, default=2000, help="Starting stock of every product")
+    parser.add_argument('--max-quantity', type=int, default=5, help="Largest quantity of one sale")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to run")
+    args = parser.parse_args()
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress_sales.db')}"
+    engine = create_engine(db_url, pool_size=args.sellers, max_overflow=0)
+    migrate.upgrade(engine)
+    user_id = generate(engine, tenants=1, products=args.products, sales=0)[0]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = :stock WHERE user_id = :uid"),
+                     {"stock": args.stock, "uid": user_id})
+        last_history_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM sales_history")).scalar()
+    before = stock_levels(engine, user_id)
+    product_ids = sorted(before)
+
+    # One agent per seller, as one per request in the web workers; no read cache in the way
+    agents = [InventoryAgent(user_id, engine=engine, cache=TenantCache(ttl=0)) for _ in range(args.sellers)]
+    print(f"{args.sellers} sellers x {args.products} products x {args.stock} units for {args.duration:.0f}s...")
+    deadline = time.monotonic() + args.duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sellers) as pool:
+        runs = list(pool.map(lambda n: seller(agents[n], product_ids, args.max_quantity, deadline, n),
+                             range(args.sellers)))
+    elapsed = time.perf_counter() - started
+
+    sold, outcomes, latencies = Counter(), Counter(), []
+    for run_sold, run_outcomes, run_latencies in runs:
+        sold.update(run_sold)
+        outcomes.update(run_outcomes)
+        latencies.extend(run_latencies)
+    latencies.sort()
+    calls = sum(outcomes.values())
+    print(f"  {calls} calls in {elapsed:.1f}s: {calls / elapsed:.0f} calls/s, "
+          f"{outcomes['ok'] / elapsed:.0f} sales/s, p50 {latencies[len(latencies) // 2]:.1f}ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:.1f}ms")
+    print("  outcomes: " + ", ".join(f"{name} {count}" for name, count in outcomes.most_common()))
+
+    after = stock_levels(engine, user_id)
+    with engine.connect() as conn:
+        history = dict(conn.execute(text("""
+            SELECT product_id, SUM(quantity_sold) FROM sales_history
+            WHERE user_id = :uid AND id > :after AND type = 'sale'
+            GROUP BY product_id
+        """), {"uid": user_id, "after": last_history_id}).fetchall())
+
+    failures = []
+    for product_id in product_ids:
+        if after[product_id] < 0:
+            failures.append(f"product {product_id}: stock {after[product_id]} below zero")
+        if before[product_id] - after[product_id] != sold[product_id]:
+            failures.append(f"product {product_id}: stock dropped {before[product_id] - after[product_id]}, "
+                            f"{sold[product_id]} units sold")
+        if int(history.get(product_id) or 0) != sold[product_id]:
+            failures.append(f"product {product_id}: {history.get(product_id) or 0} units in sales_history, "
+                            f"{sold[product_id]} units sold")
+    print(f"  left in stock: {sum(after.values())} of {sum(before.values())} units")
+    if failures:
+        print("  FAILED:\n    " + "\n    ".join(failures))
+        raise SystemExit(1)
+    print("  OK: no product oversold, stock and sales_history agree with the successful sales")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,7 +33,8 @@ REFERENCES users(user_id)
 ON DELETE CASCADE;
 
 CREATE TABLE sales_history (
-    product_id INT AUTO_INCREMENT,
+    id INT AUTO_INCREMENT PRIMARY KEY, -- keyset pagination tiebreaker (sale_date, id)
+    product_id INT,
     user_id INT NOT NULL,
     sale_date DATE,
     quantity_sold INT,
@@ -44,6 +45,19 @@ CREATE TABLE sales_history (
     FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
 
+-- Materialized sales summary, maintained by record_sale / update_stock.
+-- Backfill with: python -m scripts.rollups rebuild
+CREATE TABLE sales_rollups (
+    user_id INT NOT NULL,
+    period_type VARCHAR(10) NOT NULL, -- daily / weekly / monthly
+    period_key VARCHAR(10) NOT NULL, -- 2026-01-31 / 2026-04 (week) / 2026-01
+    gross_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+    total_profit DECIMAL(14,2) NOT NULL DEFAULT 0,
+    row_count INT NOT NULL DEFAULT 0, -- sales_history rows in the period
+    PRIMARY KEY (user_id, period_type, period_key)
+);
+
 -- ALTER TABLE sales_history
 -- ADD COLUMN user_id INT NOT NULL unique;
 
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 
@@ -5,20 +6,35 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from scripts.inventory_agent import InventoryAgent
+from scripts import batch
+from scripts.db_connection import get_engine
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the warehouse agent for one tenant or for all of them")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--user-id', type=int, help="Print the stock optimization report of this tenant")
+    target.add_argument('--all', action='store_true', help="Batch run: store recommendations for every tenant")
+    parser.add_argument('--workers', type=int, default=None, help="Batch pool processes (default: one per core)")
+    args = parser.parse_args()
+
     print("="*40)
     print("   WAREHOUSE AI AGENT INITIALIZED   ")
     print("="*40)
-    
-    # 1. Initialize the Agent
-    agent = InventoryAgent()
-    
+
     try:
-        print("\n[Step 1]: Fetching compressed warehouse data...")
-        # 2. Run the optimization logic
-        agent.optimize_stock()
-        
+        if args.all:
+            print("\n[Step 1]: Streaming inventory of all tenants...")
+            summary = batch.run(get_engine(), workers=args.workers)
+            print(f"[Step 2]: {summary['products']} products of {summary['tenants']} tenants "
+                  f"written to stock_recommendations ({summary['CRITICAL']} critical, {summary['WARNING']} warning)")
+        else:
+            # 1. Initialize the Agent
+            agent = InventoryAgent(args.user_id)
+
+            print("\n[Step 1]: Fetching compressed warehouse data...")
+            # 2. Run the optimization logic
+            agent.optimize_stock()
+
         print("\n[Status]: Agent cycle completed successfully.")
         
     except Exception as e:
@@ -26,4 +42,4 @@ def main():
         print("Tip: Make sure your MySQL server is running and credentials in db_connection.py are correct.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,47 @@
+"""Baseline multi-tenant schema: users, inventory, sales_history"""
+from sqlalchemy import text
+from scripts.migrate import auto_increment_pk, has_table
+
+
+def upgrade(conn):
+    if not has_table(conn, 'users'):
+        conn.execute(text("""
+            CREATE TABLE users (
+                user_id INT NOT NULL PRIMARY KEY,
+                username VARCHAR(50) NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+    if not has_table(conn, 'inventory'):
+        conn.execute(text(f"""
+            CREATE TABLE inventory (
+                {auto_increment_pk(conn, 'product_id')},
+                product_name VARCHAR(100),
+                current_stock INT,
+                safety_stock_level INT,
+                forecasted_demand INT,
+                lead_time_days INT,
+                annual_demand INT,
+                order_cost_fixed DECIMAL(10,2),
+                holding_cost_per_unit DECIMAL(10,2),
+                expiry_date DATE,
+                user_id INT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """))
+
+    if not has_table(conn, 'sales_history'):
+        conn.execute(text(f"""
+            CREATE TABLE sales_history (
+                {auto_increment_pk(conn, 'id')},
+                product_id INT,
+                user_id INT NOT NULL,
+                sale_date DATE,
+                quantity_sold INT,
+                revenue DECIMAL(10,2),
+                FOREIGN KEY (product_id) REFERENCES inventory(product_id),
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        """))
@@ -0,0 +1,14 @@
+"""Profit and transaction type on sales_history (formerly alter_table.py)"""
+from sqlalchemy import text
+from scripts.migrate import has_column
+
+
+def upgrade(conn):
+    if not has_column(conn, 'sales_history', 'profit'):
+        conn.execute(text("ALTER TABLE sales_history ADD COLUMN profit DECIMAL(10,2) DEFAULT 0"))
+    if not has_column(conn, 'sales_history', 'type'):
+        conn.execute(text("ALTER TABLE sales_history ADD COLUMN type VARCHAR(20) DEFAULT 'sale'"))
+    if not has_column(conn, 'sales_history', 'id') and conn.dialect.name == 'mysql':
+        # Older databases were created without a surrogate key; keyset
+        # pagination of the sales history orders by (sale_date, id)
+        conn.execute(text("ALTER TABLE sales_history ADD COLUMN id INT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST"))
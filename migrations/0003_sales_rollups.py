@@ -0,0 +1,23 @@
+"""Materialized daily/weekly/monthly sales rollups (see scripts/rollups.py)"""
+from sqlalchemy import text
+from scripts import rollups
+from scripts.migrate import has_table
+
+
+def upgrade(conn):
+    if has_table(conn, 'sales_rollups'):
+        return
+    conn.execute(text("""
+        CREATE TABLE sales_rollups (
+            user_id INT NOT NULL,
+            period_type VARCHAR(10) NOT NULL,
+            period_key VARCHAR(10) NOT NULL,
+            gross_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+            order_cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_profit DECIMAL(14,2) NOT NULL DEFAULT 0,
+            row_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period_type, period_key)
+        )
+    """))
+    # Backfill from the existing history; sales keep it current from here on
+    rollups.rebuild_in(conn)
@@ -0,0 +1,13 @@
+"""Composite indexes for the tenant-scoped hot queries"""
+from scripts.migrate import create_index
+
+
+def upgrade(conn):
+    # Every inventory query filters by user_id, most also by product_id
+    create_index(conn, 'ix_inventory_user_product', 'inventory', ['user_id', 'product_id'])
+    # Sales history pages / date windows: WHERE user_id = ? ORDER BY sale_date DESC, id DESC
+    create_index(conn, 'ix_sales_history_user_date', 'sales_history', ['user_id', 'sale_date'])
+    # Per-product aggregation (fast/slow moving) and product deletion
+    create_index(conn, 'ix_sales_history_user_product', 'sales_history', ['user_id', 'product_id'])
+    # Login and signup look users up by name
+    create_index(conn, 'ux_users_username', 'users', ['username'], unique=True)
@@ -0,0 +1,7 @@
+"""Index for the tenant-scoped expiry date-range query"""
+from scripts.migrate import create_index
+
+
+def upgrade(conn):
+    # Expiry alerts: WHERE user_id = ? AND expiry_date <= ?
+    create_index(conn, 'ix_inventory_user_expiry', 'inventory', ['user_id', 'expiry_date'])
@@ -0,0 +1,23 @@
+"""Per-product demand forecast state (see scripts/forecasting.py)"""
+from sqlalchemy import text
+from scripts import forecasting
+from scripts.migrate import has_table
+
+
+def upgrade(conn):
+    if has_table(conn, 'demand_forecasts'):
+        return
+    conn.execute(text("""
+        CREATE TABLE demand_forecasts (
+            user_id INT NOT NULL,
+            product_id INT NOT NULL,
+            ew_level DOUBLE NOT NULL DEFAULT 0,
+            ew_square DOUBLE NOT NULL DEFAULT 0,
+            last_day_units INT NOT NULL DEFAULT 0,
+            first_sale_date DATE NOT NULL,
+            as_of_date DATE NOT NULL,
+            PRIMARY KEY (user_id, product_id)
+        )
+    """))
+    # Backfill from the existing history; sales keep it current from here on
+    forecasting.rebuild_in(conn)
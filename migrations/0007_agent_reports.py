@@ -0,0 +1,25 @@
+"""Precomputed agent reports and their refresh queue (see scripts/scheduler.py)"""
+from sqlalchemy import text
+from scripts.migrate import has_table
+
+
+def upgrade(conn):
+    # A large tenant's advice runs to megabytes; TEXT stops at 64KB on MySQL
+    payload_type = 'LONGTEXT' if conn.dialect.name == 'mysql' else 'TEXT'
+    if not has_table(conn, 'agent_reports'):
+        conn.execute(text(f"""
+            CREATE TABLE agent_reports (
+                user_id INT NOT NULL,
+                kind VARCHAR(32) NOT NULL,
+                payload {payload_type} NOT NULL,
+                computed_at DATETIME NOT NULL,
+                PRIMARY KEY (user_id, kind)
+            )
+        """))
+    if not has_table(conn, 'report_requests'):
+        conn.execute(text("""
+            CREATE TABLE report_requests (
+                user_id INT NOT NULL PRIMARY KEY,
+                requested_at DATETIME NOT NULL
+            )
+        """))
@@ -0,0 +1,22 @@
+"""Nightly per-product recommendations written by scripts/batch.py"""
+from sqlalchemy import text
+from scripts.migrate import has_table
+
+
+def upgrade(conn):
+    if has_table(conn, 'stock_recommendations'):
+        return
+    conn.execute(text("""
+        CREATE TABLE stock_recommendations (
+            user_id INT NOT NULL,
+            product_id INT NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            reorder_qty INT,
+            min_req INT,
+            po_quantity INT,
+            eoq INT,
+            priority VARCHAR(10) NOT NULL DEFAULT '',
+            computed_at DATETIME NOT NULL,
+            PRIMARY KEY (user_id, product_id)
+        )
+    """))
@@ -0,0 +1,21 @@
+"""Sequence table for user IDs (see scripts/ids.py), replacing random 4-digit IDs"""
+from sqlalchemy import text
+from scripts.migrate import has_table
+
+# New IDs start past the old 1000-9999 range
+FIRST_USER_ID = 10000
+
+
+def upgrade(conn):
+    if not has_table(conn, 'id_sequences'):
+        conn.execute(text("""
+            CREATE TABLE id_sequences (
+                name VARCHAR(32) NOT NULL PRIMARY KEY,
+                next_value BIGINT NOT NULL
+            )
+        """))
+    exists = conn.execute(text("SELECT 1 FROM id_sequences WHERE name = 'users'")).fetchone()
+    if not exists:
+        highest = conn.execute(text("SELECT MAX(user_id) FROM users")).scalar() or 0
+        conn.execute(text("INSERT INTO id_sequences (name, next_value) VALUES ('users', :next)"),
+                     {"next": max(FIRST_USER_ID, highest + 1)})
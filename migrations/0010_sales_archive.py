@@ -0,0 +1,39 @@
+"""Archive tier for old sales_history months and soft-deleted products (see scripts/archive.py)"""
+from sqlalchemy import text
+from scripts.migrate import auto_increment_pk, create_index, has_column, has_table
+
+
+def upgrade(conn):
+    # A deleted product stays (hidden) until the archiver has purged its history
+    if not has_column(conn, 'inventory', 'deleted_at'):
+        conn.execute(text("ALTER TABLE inventory ADD COLUMN deleted_at DATETIME NULL"))
+    create_index(conn, 'ix_inventory_deleted', 'inventory', ['deleted_at'])
+    # The archiver finds the oldest hot month and a month's tenants by date alone
+    create_index(conn, 'ix_sales_history_date', 'sales_history', ['sale_date'])
+
+    if not has_table(conn, 'sales_archive_segments'):
+        conn.execute(text(f"""
+            CREATE TABLE sales_archive_segments (
+                {auto_increment_pk(conn, 'segment_id')},
+                month DATE NOT NULL,
+                ends_on DATE NOT NULL,
+                path VARCHAR(255) NOT NULL,
+                row_count INT NOT NULL,
+                state VARCHAR(16) NOT NULL,
+                created_at DATETIME NOT NULL,
+                retired_at DATETIME NULL
+            )
+        """))
+    create_index(conn, 'ix_sales_archive_segments_state', 'sales_archive_segments', ['state', 'ends_on'])
+
+    if not has_table(conn, 'sales_archive_tenants'):
+        conn.execute(text("""
+            CREATE TABLE sales_archive_tenants (
+                user_id INT NOT NULL,
+                segment_id INT NOT NULL,
+                row_count INT NOT NULL,
+                first_date DATE NOT NULL,
+                last_date DATE NOT NULL,
+                PRIMARY KEY (user_id, segment_id)
+            )
+        """))
@@ -0,0 +1,9 @@
+"""Claimed report refreshes stay queued until their reports are stored (see scripts/reports.py)"""
+from sqlalchemy import text
+from scripts.migrate import has_column
+
+
+def upgrade(conn):
+    # NULL: waiting for the scheduler; set: a job is computing the tenant's reports
+    if not has_column(conn, 'report_requests', 'claimed_at'):
+        conn.execute(text("ALTER TABLE report_requests ADD COLUMN claimed_at DATETIME NULL"))
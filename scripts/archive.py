@@ -0,0 +1,633 @@
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from scripts import rollups
+from scripts.db_connection import get_engine
+from scripts.log_config import configure_logging
+from scripts.migrate import has_table
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # in requirements.txt; needed once there is anything to archive
+    pa = pq = None
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Hot/cold split of sales_history, run next to the web workers:
+#
+#   python -m scripts.archive run
+#
+# sales_history keeps the last SALES_HOT_MONTHS calendar months.  Older
+# months are copied, all tenants at once, into one Parquet segment per month
+# under SALES_ARCHIVE_DIR (rows sorted by tenant, so a tenant's read skips
+# the other tenants' row groups), catalogued in sales_archive_segments and
+# sales_archive_tenants, then deleted from the table in small chunks.
+#
+# The catalog makes the split transparent: hot reads only look at dates from
+# hot_from() on (the month after the newest archived one, see
+# hot_condition()), so rows already copied but not yet deleted are never
+# seen twice, and archived reads open only the segments holding the tenant's
+# rows for the dates asked for.  A row inserted with a date in an archived
+# month stays hidden until the next sweep archives it.
+#
+# The same loop purges soft-deleted products (inventory.deleted_at).  The
+# delete itself takes the product's history out of the rollups; the purge
+# then deletes that history in chunks, rewrites the archived segments
+# holding it, and finally drops the product row.
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_COLUMNS = ('id', 'product_id', 'user_id', 'sale_date', 'quantity_sold', 'revenue', 'profit', 'type')
+# Rows read per query, and per Parquet row group
+ARCHIVE_CHUNKSIZE = 50000
+# Replaced segment files are kept this long for reads that already looked them up
+RETIRED_GRACE_SECONDS = 300
+
+PURGING, ACTIVE, RETIRED = 'purging', 'active', 'retired'
+
+
+def archive_dir():
+    return os.getenv('SALES_ARCHIVE_DIR', os.path.join('archive', 'sales_history'))
+
+
+def hot_months():
+    months = int(os.getenv('SALES_HOT_MONTHS', 13))
+    if months < 1:
+        raise ValueError("SALES_HOT_MONTHS must be at least 1")
+    return months
+
+
+def purge_chunk_rows():
+    return int(os.getenv('SALES_PURGE_CHUNK_ROWS', 5000))
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ValueError("The sales archive needs the pyarrow package (pip install -r requirements.txt)")
+
+
+def _as_date(value):
+    # SQLite hands DATE back as text
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value.date() if isinstance(value, datetime) else value
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _segment_schema():
+    integer = pa.int64()
+    return pa.schema([('id', integer), ('product_id', integer), ('user_id', integer), ('sale_date', pa.date32()),
+                      ('quantity_sold', integer), ('revenue', pa.float64()), ('profit', pa.float64()),
+                      ('type', pa.string())])
+
+
+def _to_table(frame):
+    frame = frame[list(SEGMENT_COLUMNS)].copy()
+    frame['sale_date'] = pd.to_datetime(frame['sale_date']).dt.date
+    for name in ('id', 'product_id', 'user_id', 'quantity_sold'):
+        frame[name] = pd.to_numeric(frame[name]).astype('Int64')
+    for name in ('revenue', 'profit'):
+        frame[name] = pd.to_numeric(frame[name], errors='coerce')
+    return pa.Table.from_pandas(frame, schema=_segment_schema(), preserve_index=False)
+
+
+# --- Catalog -----------------------------------------------------------------
+
+def hot_from(conn):
+    """First day kept in sales_history; earlier dates are read from segments (None: nothing archived)"""
+    ends_on = conn.execute(text(f"SELECT MAX(ends_on) FROM sales_archive_segments WHERE state <> '{RETIRED}'")).scalar()
+    return None if ends_on is None else _as_date(ends_on)
+
+
+def hot_condition(alias='s'):
+    """
+    SQL condition keeping a sales_history alias to the hot tier. The
+    boundary is a scalar subquery, so hot reads need no extra round trip
+    and still use the (user_id, sale_date) index.
+    """
+    return (f"{alias}.sale_date >= COALESCE((SELECT MAX(ends_on) FROM sales_archive_segments "
+            f"WHERE state <> '{RETIRED}'), '1000-01-01')")
+
+
+def tenant_segments(conn, user_id, start_date=None, end_date=None):
+    """
+    The segments holding this tenant's rows between start_date and end_date
+    (inclusive, None = open), newest month first:
+    [{segment_id, month, path, row_count, first_date, last_date}]
+    """
+    rows = conn.execute(text(f"""
+        SELECT s.segment_id, s.month, s.path, t.row_count, t.first_date, t.last_date
+        FROM sales_archive_tenants t
+        JOIN sales_archive_segments s ON s.segment_id = t.segment_id
+        WHERE t.user_id = :uid AND s.state <> '{RETIRED}'
+        ORDER BY s.month DESC, s.segment_id DESC
+    """), {"uid": user_id}).fetchall()
+    segments = []
+    for segment_id, month, path, row_count, first_date, last_date in rows:
+        first_date, last_date = _as_date(first_date), _as_date(last_date)
+        if (start_date is not None and last_date < start_date) or (end_date is not None and first_date > end_date):
+            continue
+        segments.append({'segment_id': segment_id, 'month': _as_date(month), 'path': path,
+                         'row_count': row_count, 'first_date': first_date, 'last_date': last_date})
+    return segments
+
+
+def by_month(segments):
+    """Groups newest-first segments into [[segments of one month], ...], keeping the order"""
+    groups = []
+    for segment in segments:
+        if groups and groups[-1][0]['month'] == segment['month']:
+            groups[-1].append(segment)
+        else:
+            groups.append([segment])
+    return groups
+
+
+def read_segments(segments, user_id, columns=SEGMENT_COLUMNS, product_id=None, txn_type=None,
+                  start_date=None, end_date=None, exclude_products=()):
+    """
+    Yields one DataFrame per segment with the tenant's rows that match the
+    filters. Dates come back as datetime64; rows of `exclude_products` are
+    dropped.
+    """
+    _require_pyarrow()
+    filters = [('user_id', '=', user_id)]
+    if product_id is not None:
+        filters.append(('product_id', '=', product_id))
+    if txn_type:
+        filters.append(('type', '=', txn_type))
+    if start_date is not None:
+        filters.append(('sale_date', '>=', start_date))
+    if end_date is not None:
+        filters.append(('sale_date', '<=', end_date))
+    read = list(columns)
+    if exclude_products and 'product_id' not in read:
+        read.append('product_id')
+    for segment in segments:
+        frame = pq.read_table(segment['path'], columns=read, filters=filters).to_pandas(date_as_object=False)
+        if exclude_products:
+            frame = frame[~frame['product_id'].isin(list(exclude_products))]
+        yield frame[list(columns)].reset_index(drop=True)
+
+
+def iter_archived(conn, user_id=None, columns=SEGMENT_COLUMNS, chunksize=ARCHIVE_CHUNKSIZE):
+    """Every archived row, of one tenant or of everyone, as DataFrames (for backfills)"""
+    if user_id is not None:
+        yield from read_segments(tenant_segments(conn, user_id), user_id, columns)
+        return
+    paths = [row[0] for row in conn.execute(text(f"""
+        SELECT path FROM sales_archive_segments WHERE state <> '{RETIRED}' ORDER BY month, segment_id
+    """))]
+    if paths:
+        _require_pyarrow()
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=list(columns)):
+            yield batch.to_pandas(date_as_object=False)
+
+
+def catalog_exists(conn):
+    """False until migration 0010, which the backfills of earlier migrations run before"""
+    return has_table(conn, 'sales_archive_segments')
+
+
+def _tally(tenants, frame):
+    """Adds a chunk's rows to the per-tenant {user_id: [rows, first_date, last_date]} of a segment"""
+    dates = pd.to_datetime(frame['sale_date'])
+    grouped = dates.groupby(frame['user_id'].to_numpy()).agg(['count', 'min', 'max'])
+    for user_id, count, first, last in grouped.itertuples():
+        entry = tenants.setdefault(int(user_id), [0, first.date(), last.date()])
+        entry[0] += int(count)
+        entry[1], entry[2] = min(entry[1], first.date()), max(entry[2], last.date())
+
+
+def _catalog(conn, month, path, tenants, state):
+    """Registers a segment file and its tenants; returns the segment_id"""
+    result = conn.execute(text("""
+        INSERT INTO sales_archive_segments (month, ends_on, path, row_count, state, created_at)
+        VALUES (:month, :ends_on, :path, :rows, :state, :at)
+    """), {"month": month, "ends_on": add_months(month, 1), "path": path,
+           "rows": sum(entry[0] for entry in tenants.values()),
+           "state": state, "at": datetime.now()})
+    segment_id = result.lastrowid
+    conn.execute(text("""
+        INSERT INTO sales_archive_tenants (user_id, segment_id, row_count, first_date, last_date)
+        VALUES (:uid, :sid, :rows, :first, :last)
+    """), [{"uid": user_id, "sid": segment_id, "rows": rows, "first": first, "last": last}
+           for user_id, (rows, first, last) in tenants.items()])
+    return segment_id
+
+
+def _segment_path(directory, month):
+    # Unique per write: a rewrite never replaces a file someone may be reading
+    return os.path.join(directory, f"{month:%Y-%m}-{uuid.uuid4().hex[:12]}.parquet")
+
+
+# --- Archiving ---------------------------------------------------------------
+
+def _delete_hot_rows(engine, ids, chunk_rows=None):
+    """Deletes copied rows from sales_history by id, one short transaction per chunk"""
+    chunk_rows = chunk_rows or purge_chunk_rows()
+    query = text("DELETE FROM sales_history WHERE id IN :ids").bindparams(bindparam('ids', expanding=True))
+    for start in range(0, len(ids), chunk_rows):
+        with engine.begin() as conn:
+            conn.execute(query, {"ids": [int(row_id) for row_id in ids[start:start + chunk_rows]]})
+
+
+def _set_state(engine, segment_id, state):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE sales_archive_segments SET state = :state WHERE segment_id = :sid"),
+                     {"state": state, "sid": segment_id})
+
+
+def archive_month(engine, month, directory=None, chunksize=ARCHIVE_CHUNKSIZE):
+    """
+    Moves every sales_history row dated in `month` (all tenants) into a new
+    segment: write the file, catalog it, then delete the copied rows.
+    Returns the number of rows archived.
+    """
+    _require_pyarrow()
+    directory = directory or archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    params = {"start": month, "end": add_months(month, 1)}
+    rows_query = text(f"""
+        SELECT {', '.join(SEGMENT_COLUMNS)} FROM sales_history
+        WHERE user_id = :uid AND sale_date >= :start AND sale_date < :end
+        ORDER BY sale_date, id
+    """)
+
+    path = _segment_path(directory, month)
+    partial = path + '.partial'
+    tenants, ids, pending = {}, [], []
+    try:
+        with engine.connect() as conn, pq.ParquetWriter(partial, _segment_schema()) as writer:
+            user_ids = [row[0] for row in conn.execute(text("""
+                SELECT DISTINCT user_id FROM sales_history
+                WHERE sale_date >= :start AND sale_date < :end ORDER BY user_id
+            """), params)]
+            for user_id in user_ids:
+                for chunk in pd.read_sql(rows_query, conn, params={**params, "uid": user_id}, chunksize=chunksize):
+                    _tally(tenants, chunk)
+                    ids.append(chunk['id'].to_numpy())
+                    pending.append(chunk)
+                    if sum(len(frame) for frame in pending) >= chunksize:
+                        writer.write_table(_to_table(pd.concat(pending, ignore_index=True)))
+                        pending = []
+            if pending:
+                writer.write_table(_to_table(pd.concat(pending, ignore_index=True)))
+        if not tenants:
+            os.remove(partial)
+            return 0
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    # From this commit on readers take the month from the file (hot_from moves past it)
+    with engine.begin() as conn:
+        segment_id = _catalog(conn, month, path, tenants, PURGING)
+    ids = np.concatenate(ids)
+    _delete_hot_rows(engine, ids)
+    _set_state(engine, segment_id, ACTIVE)
+    logger.info("sales month archived", extra={'month': month.isoformat(), 'rows': len(ids),
+                                               'tenants': len(tenants), 'path': path})
+    return len(ids)
+
+
+def finish_purging(engine):
+    """Deletes the hot copies left behind by an interrupted archive_month()"""
+    with engine.connect() as conn:
+        pending = conn.execute(text(f"SELECT segment_id, path FROM sales_archive_segments WHERE state = '{PURGING}'")).fetchall()
+    for segment_id, path in pending:
+        _require_pyarrow()
+        _delete_hot_rows(engine, pq.read_table(path, columns=['id'])['id'].to_numpy())
+        _set_state(engine, segment_id, ACTIVE)
+    return len(pending)
+
+
+def archive_due(engine, today=None, months=None, directory=None):
+    """Archives every month older than the last `months` (SALES_HOT_MONTHS), oldest first"""
+    cutoff = add_months(month_start(today or date.today()), -(months or hot_months()))
+    archived = 0
+    while True:
+        with engine.connect() as conn:
+            oldest = conn.execute(text("SELECT MIN(sale_date) FROM sales_history WHERE sale_date < :cutoff"),
+                                  {"cutoff": cutoff}).scalar()
+        if oldest is None:
+            return archived
+        archived += archive_month(engine, month_start(_as_date(oldest)), directory)
+
+
+def drop_retired(engine, grace=RETIRED_GRACE_SECONDS):
+    """Deletes segment files replaced more than `grace` seconds ago"""
+    with engine.connect() as conn:
+        retired = conn.execute(text(f"""
+            SELECT segment_id, path FROM sales_archive_segments
+            WHERE state = '{RETIRED}' AND retired_at <= :before
+        """), {"before": datetime.now() - timedelta(seconds=grace)}).fetchall()
+    for segment_id, path in retired:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM sales_archive_segments WHERE segment_id = :sid"), {"sid": segment_id})
+    return len(retired)
+
+
+# --- Purging soft-deleted products -------------------------------------------
+
+DAILY_TOTAL_COLUMNS = ('user_id', 'sale_date', 'type', 'revenue', 'profit', 'row_count')
+
+
+def _product_segments(conn, user_id):
+    """(segment_id, state, path) of every live segment holding the tenant's rows"""
+    return tuple(tuple(row) for row in conn.execute(text(f"""
+        SELECT s.segment_id, s.state, s.path
+        FROM sales_archive_tenants t
+        JOIN sales_archive_segments s ON s.segment_id = t.segment_id
+        WHERE t.user_id = :uid AND s.state <> '{RETIRED}'
+        ORDER BY s.segment_id
+    """), {"uid": user_id}))
+
+
+def archived_daily_totals(conn, user_id, product_id):
+    """
+    A product's archived rows summed per day, for mark_deleted(). Returns
+    (segments read, DAILY_TOTAL_COLUMNS frame, ids still also in sales_history):
+    rows of a purging segment are both archived and hot until archive_month()
+    has deleted them. Archived rows never change, so this can be read before
+    the delete's transaction; the segments tell it whether anything moved since.
+    """
+    segments = _product_segments(conn, user_id)
+    frames, copied = [], []
+    if segments:
+        _require_pyarrow()
+    for _, state, path in segments:
+        table = pq.read_table(path, columns=['id', 'sale_date', 'type', 'revenue', 'profit'],
+                              filters=[('user_id', '=', user_id), ('product_id', '=', product_id)])
+        if not table.num_rows:
+            continue
+        if state == PURGING:
+            copied.extend(table.column('id').to_pylist())
+        totals = table.group_by(['sale_date', 'type']).aggregate([('revenue', 'sum'), ('profit', 'sum'), ('id', 'count')])
+        frames.append(totals.to_pandas(date_as_object=False).rename(
+            columns={'revenue_sum': 'revenue', 'profit_sum': 'profit', 'id_count': 'row_count'}))
+    totals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(DAILY_TOTAL_COLUMNS))
+    return segments, totals.assign(user_id=user_id)[list(DAILY_TOTAL_COLUMNS)], copied
+
+
+def mark_deleted(conn, user_id, product_id, archived=None):
+    """
+    Soft-deletes a product: hidden from now on, purged by the archiver.
+    Its history leaves the rollups in the same transaction, so summaries
+    agree with every other read before the purge runs. The hot rows are
+    summed per day by the database and `archived` is archived_daily_totals(),
+    read before the transaction, so the row lock is held only briefly.
+    False if not found.
+    """
+    result = conn.execute(text("""
+        UPDATE inventory SET deleted_at = :at
+        WHERE user_id = :uid AND product_id = :pid AND deleted_at IS NULL
+    """), {"at": datetime.now(), "uid": user_id, "pid": product_id})
+    if result.rowcount != 1:
+        return False
+
+    if archived is None or archived[0] != _product_segments(conn, user_id):
+        # A month was archived or rewritten in between: read it again under the lock
+        archived = archived_daily_totals(conn, user_id, product_id)
+    _, archived_totals, copied = archived
+    skip = "AND id NOT IN :copied" if copied else ""
+    query = text(f"""
+        SELECT user_id, sale_date, type, SUM(revenue) AS revenue, SUM(profit) AS profit, COUNT(*) AS row_count
+        FROM sales_history
+        WHERE user_id = :uid AND product_id = :pid {skip}
+        GROUP BY user_id, sale_date, type
+    """)
+    params = {"uid": user_id, "pid": product_id}
+    if copied:
+        query = query.bindparams(bindparam('copied', expanding=True))
+        params["copied"] = copied
+    frames = [frame for frame in (pd.read_sql(query, conn, params=params), archived_totals) if not frame.empty]
+    if frames:
+        rollups.remove_rows(conn, pd.concat(frames, ignore_index=True))
+    return True
+
+
+def deleted_pairs(conn, user_id=None):
+    """(user_id, product_id) of the soft-deleted products not purged yet"""
+    where = "AND user_id = :uid" if user_id is not None else ""
+    params = {"uid": user_id} if user_id is not None else {}
+    return [tuple(row) for row in conn.execute(text(f"""
+        SELECT user_id, product_id FROM inventory WHERE deleted_at IS NOT NULL {where}
+    """), params)]
+
+
+def _purge_hot(engine, user_id, product_id, chunk_rows):
+    # mark_deleted() already took these rows out of the rollups
+    query = text("""
+        SELECT id FROM sales_history
+        WHERE user_id = :uid AND product_id = :pid
+        ORDER BY id LIMIT :limit
+    """)
+    delete = text("DELETE FROM sales_history WHERE id IN :ids").bindparams(bindparam('ids', expanding=True))
+    purged = 0
+    while True:
+        with engine.begin() as conn:
+            ids = [int(row[0]) for row in conn.execute(query, {"uid": user_id, "pid": product_id, "limit": chunk_rows})]
+            if not ids:
+                return purged
+            conn.execute(delete, {"ids": ids})
+        purged += len(ids)
+        if len(ids) < chunk_rows:
+            return purged
+
+
+def _purge_archived(engine, deleted, directory=None, chunksize=ARCHIVE_CHUNKSIZE):
+    """
+    Rewrites the segments holding rows of `deleted` {user_id: {product_id}}
+    without them, replacing the old file in the catalog in one transaction.
+    The rows already left the rollups in mark_deleted().
+    """
+    directory = directory or archive_dir()
+    with engine.connect() as conn:
+        segments = conn.execute(text(f"""
+            SELECT DISTINCT s.segment_id, s.month, s.path
+            FROM sales_archive_segments s
+            JOIN sales_archive_tenants t ON t.segment_id = s.segment_id
+            WHERE t.user_id IN :uids AND s.state = '{ACTIVE}'
+            ORDER BY s.segment_id
+        """).bindparams(bindparam('uids', expanding=True)), {"uids": list(deleted)}).fetchall()
+    if not segments:
+        return 0
+    _require_pyarrow()
+    doomed = pd.MultiIndex.from_tuples([(user_id, product_id) for user_id, products in deleted.items()
+                                        for product_id in products])
+    purged = 0
+    for segment_id, month, path in segments:
+        # Most segments hold none of the products: check before rewriting
+        keys = pq.read_table(path, columns=['user_id', 'product_id'],
+                             filters=[('user_id', 'in', list(deleted))]).to_pandas()
+        if not pd.MultiIndex.from_frame(keys).isin(doomed).any():
+            continue
+
+        month = _as_date(month)
+        new_path = _segment_path(directory, month)
+        partial = new_path + '.partial'
+        tenants, removed = {}, 0
+        with pq.ParquetWriter(partial, _segment_schema()) as writer:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                frame = batch.to_pandas(date_as_object=False)
+                drop = pd.MultiIndex.from_frame(frame[['user_id', 'product_id']]).isin(doomed)
+                removed += int(drop.sum())
+                kept = frame[~drop]
+                if not kept.empty:
+                    _tally(tenants, kept)
+                    writer.write_table(_to_table(kept))
+        if tenants:
+            os.replace(partial, new_path)
+        else:
+            os.remove(partial)
+
+        with engine.begin() as conn:
+            if tenants:
+                _catalog(conn, month, new_path, tenants, ACTIVE)
+            conn.execute(text("DELETE FROM sales_archive_tenants WHERE segment_id = :sid"), {"sid": segment_id})
+            conn.execute(text(f"""
+                UPDATE sales_archive_segments SET state = '{RETIRED}', retired_at = :at WHERE segment_id = :sid
+            """), {"at": datetime.now(), "sid": segment_id})
+        purged += removed
+    return purged
+
+
+def purge_deleted(engine, chunk_rows=None, directory=None):
+    """
+    Purges every soft-deleted product: its hot history in chunks of
+    `chunk_rows` (SALES_PURGE_CHUNK_ROWS), then its archived rows, then the
+    inventory row. Returns the number of products purged.
+    """
+    chunk_rows = chunk_rows or purge_chunk_rows()
+    with engine.connect() as conn:
+        pending = sorted(deleted_pairs(conn))
+    if not pending:
+        return 0
+
+    # Only active segments are rewritten below: finish an interrupted archive first
+    finish_purging(engine)
+    deleted = {}
+    for user_id, product_id in pending:
+        rows = _purge_hot(engine, user_id, product_id, chunk_rows)
+        deleted.setdefault(user_id, set()).add(product_id)
+        logger.info("product history purged", extra={'user_id': user_id, 'product_id': product_id, 'rows': rows})
+    _purge_archived(engine, deleted, directory)
+
+    for user_id, products in deleted.items():
+        with engine.begin() as conn:
+            conn.execute(text("""
+                DELETE FROM inventory WHERE user_id = :uid AND product_id IN :pids AND deleted_at IS NOT NULL
+            """).bindparams(bindparam('pids', expanding=True)), {"uid": user_id, "pids": sorted(products)})
+    return len(pending)
+
+
+# --- Background loop ---------------------------------------------------------
+
+class SalesArchiver:
+    def __init__(self, engine=None, directory=None, interval=None, poll=None):
+        # Fail at startup, not at the first month due
+        _require_pyarrow()
+        self.engine = engine if engine is not None else get_engine()
+        self.directory = directory or archive_dir()
+        self.interval = interval or float(os.getenv('SALES_ARCHIVE_INTERVAL_SECONDS', 3600))
+        self.poll = poll or float(os.getenv('SALES_PURGE_POLL_SECONDS', 10))
+
+    def purge(self):
+        purged = purge_deleted(self.engine, directory=self.directory)
+        drop_retired(self.engine)
+        return purged
+
+    def archive(self, today=None):
+        finish_purging(self.engine)
+        return archive_due(self.engine, today=today, directory=self.directory)
+
+    def run_once(self, today=None):
+        """Purges deleted products and archives whatever is due; returns (products purged, rows archived)"""
+        purged = self.purge()
+        return purged, self.archive(today)
+
+    def run(self, stop=None):
+        """Purges every `poll` seconds and archives every `interval` seconds until `stop` is set"""
+        stop = stop or threading.Event()
+        next_archive = 0.0
+        while not stop.is_set():
+            try:
+                self.purge()
+                if time.monotonic() >= next_archive:
+                    next_archive = time.monotonic() + self.interval
+                    rows = self.archive()
+                    logger.info("archive sweep", extra={'rows': rows})
+            except Exception as e:
+                logger.warning("sales archive run failed", extra={'error': str(e)})
+            stop.wait(self.poll)
+
+
+def status(engine):
+    """(hot_from, [(month, segments, rows)], products awaiting purge)"""
+    with engine.connect() as conn:
+        boundary = hot_from(conn)
+        months = conn.execute(text(f"""
+            SELECT month, COUNT(*), SUM(row_count) FROM sales_archive_segments
+            WHERE state <> '{RETIRED}' GROUP BY month ORDER BY month
+        """)).fetchall()
+        pending = conn.execute(text("SELECT COUNT(*) FROM inventory WHERE deleted_at IS NOT NULL")).scalar()
+    return boundary, [(_as_date(month), count, int(rows)) for month, count, rows in months], pending
+
+
+def main():
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Archive old sales_history months and purge deleted products")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help="Purge every SALES_PURGE_POLL_SECONDS, archive every SALES_ARCHIVE_INTERVAL_SECONDS")
+    sub.add_parser('once', help="Purge and archive now, then exit")
+    sub.add_parser('status', help="Show the archived months and pending purges")
+    args = parser.parse_args()
+
+    archiver = SalesArchiver()
+    if args.command == 'status':
+        boundary, months, pending = status(archiver.engine)
+        for month, count, rows in months:
+            print(f"{month:%Y-%m}  {rows:>10} rows  ({count} segment{'s' if count != 1 else ''})")
+        print(f"--- Hot from {boundary or 'the beginning'}; {pending} deleted products awaiting purge ---")
+        return
+    if args.command == 'once':
+        started = time.perf_counter()
+        purged, rows = archiver.run_once()
+        print(f"--- Purged {purged} products, archived {rows} rows in {time.perf_counter() - started:.1f}s ---")
+        return
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    archiver.run(stop)
+
+
+if __name__ == "__main__":
+    main()
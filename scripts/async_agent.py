@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from dotenv import load_dotenv
+from scripts import archive, reports, rollups
+from scripts.columnar import encode_arrow, encode_columnar
+from scripts.cache import INVENTORY, SALES, get_cache
+from scripts.db_connection import get_async_engine
+from scripts.expiry import EXPIRY_RISK_COLUMNS, expiry_window_end
+from scripts.forecasting import forecast_frame, forecasting_enabled, states_frame, states_query
+from scripts.inventory_agent import (FORECAST_STATES, InventoryAgent, RECOMMENDATION_COLUMNS, inventory_records,
+                                     merge_dashboard)
+from scripts.reports import REPORT_KINDS, reports_enabled
+from scripts.metrics import stage
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Async counterpart of InventoryAgent for the ASGI serving mode (asgi.py).
+# SQL goes through the async engine so a request waiting on MySQL does not
+# hold a thread; the pandas/NumPy work reuses InventoryAgent's code and runs
+# on a small bounded thread pool so it never blocks the event loop.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Bounded pool for CPU-bound DataFrame work (ASYNC_PANDAS_WORKERS threads)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_PANDAS_WORKERS', 4)),
+                                               thread_name_prefix='pandas')
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+async def _resolved(value):
+    return value
+
+
+class AsyncInventoryAgent:
+    def __init__(self, user_id, engine=None, cache=None, executor=None):
+        """Per-request view sharing the async pool, the read cache and the pandas executor"""
+        self.user_id = user_id
+        self.engine = engine if engine is not None else get_async_engine()
+        self.cache = cache if cache is not None else get_cache()
+        self.executor = executor if executor is not None else get_executor()
+        # Supplies the SQL and the DataFrame logic; its own engine is never used here
+        self.agent = InventoryAgent(user_id, cache=self.cache)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def _fetch(self, query, params):
+        async with self.engine.connect() as conn:
+            result = await conn.execute(query, params)
+            return list(result.keys()), result.fetchall()
+
+    async def fetch_compressed_data(self, columns=None):
+        """Same frame as InventoryAgent.fetch_compressed_data, loaded without blocking"""
+        columns = self.agent._inventory_columns(columns)
+        df = self.cache.get(self.user_id, INVENTORY, columns)
+        if df is not None:
+            return df
+
+        version = self.cache.versions.get_version(self.user_id, INVENTORY)
+        with stage('load_inventory') as st:
+            query, params, selected = self.agent._inventory_query(columns)
+            _, rows = await self._fetch(query, params)
+            df = await self._run(self.agent._inventory_frame, columns, selected, rows)
+            st.rows = len(df)
+        self.cache.set(self.user_id, INVENTORY, df, version=version, variant=columns)
+        return df
+
+    async def fetch_forecasts(self):
+        """Same frame as InventoryAgent.fetch_forecasts, loaded without blocking"""
+        if not forecasting_enabled():
+            return None
+        states = self.cache.get(self.user_id, SALES, FORECAST_STATES)
+        if states is None:
+            version = self.cache.versions.get_version(self.user_id, SALES)
+            with stage('load_forecasts') as st:
+                _, rows = await self._fetch(*states_query(self.user_id))
+                states = await self._run(states_frame, rows)
+                st.rows = len(states)
+            self.cache.set(self.user_id, SALES, states, version=version, variant=FORECAST_STATES)
+        return await self._run(forecast_frame, states)
+
+    async def get_inventory(self, fmt=None):
+        """Row dicts, or the encoded body (bytes) for ?format=columnar / arrow"""
+        df = await self.fetch_compressed_data()
+        if fmt == 'arrow':
+            return await self._run(encode_arrow, df)
+        if fmt == 'columnar':
+            return await self._run(encode_columnar, df)
+        return await self._run(inventory_records, df)
+
+    async def _planning_inputs(self, df, forecasts):
+        if df is None:
+            df = await self.fetch_compressed_data(RECOMMENDATION_COLUMNS)
+        if forecasts is None:
+            forecasts = await self.fetch_forecasts()
+        return df, forecasts
+
+    async def get_advice(self, df=None, forecasts=None):
+        df, forecasts = await self._planning_inputs(df, forecasts)
+        return await self._run(self.agent.get_advice, df, forecasts)
+
+    async def generate_purchase_order(self, df=None, forecasts=None):
+        df, forecasts = await self._planning_inputs(df, forecasts)
+        return await self._run(self.agent.generate_purchase_order, df, forecasts)
+
+    async def get_expiry_alerts(self, days_ahead=30, df=None):
+        if df is None:
+            df = await self._expiring_rows(expiry_window_end(days_ahead))
+        return await self._run(self.agent._format_expiry_alerts, df, days_ahead)
+
+    async def _expiring_rows(self, until):
+        if self.agent.expiry_index is not None:
+            # Index hits are in memory; a rebuild reads on the executor thread
+            return await self._run(self.agent._expiring_rows, until)
+        query, params = self.agent._expiring_query(until)
+        _, rows = await self._fetch(query, params)
+        return await self._run(self.agent._inventory_frame, EXPIRY_RISK_COLUMNS, EXPIRY_RISK_COLUMNS, rows)
+
+    async def _moving_items(self, order, days=None, limit=None, threshold=None):
+        async with self.engine.connect() as conn:
+            segments = await conn.run_sync(archive.tenant_segments, self.user_id, self.agent._moving_window(days))
+        query, params = self.agent._moving_items_query(order, days, limit, threshold, archived=bool(segments))
+        with stage('moving_items') as st:
+            keys, rows = await self._fetch(query, params)
+            st.rows = len(rows)
+
+        def finish():
+            df = pd.DataFrame(rows, columns=keys)
+            if segments:
+                # Archive segments are local files, read on the executor
+                totals = self.agent._archived_item_totals(segments, days)
+                df = self.agent._combine_moving_items(df, totals, order, limit, threshold)
+            return self.agent._moving_items_records(df)
+        return await self._run(finish)
+
+    async def get_fast_moving_items(self, top_n=5, days=None):
+        return await self._moving_items('DESC', days=days, limit=top_n)
+
+    async def get_slow_moving_items(self, threshold=10, days=None, limit=None):
+        return await self._moving_items('ASC', days=days, limit=limit, threshold=threshold)
+
+    async def get_sales_summary(self, period='monthly'):
+        async with self.engine.connect() as conn:
+            # Rollup rows are few; read_summary's sync code runs on the async connection
+            return await conn.run_sync(rollups.read_summary, self.user_id, period)
+
+    async def get_dashboard(self, sections=None):
+        """
+        Same payload as InventoryAgent.get_dashboard; the inventory read and
+        the fast/slow-moving aggregates run concurrently.
+        """
+        sections, columns = self.agent._dashboard_plan(sections)
+        planning = 'advice' in sections or 'purchase_order' in sections
+        inventory_df, forecasts, fast, slow = await asyncio.gather(
+            self.fetch_compressed_data(columns) if columns is None or columns else _resolved(None),
+            self.fetch_forecasts() if planning else _resolved(None),
+            self.get_fast_moving_items() if 'fast_moving' in sections else _resolved(None),
+            self.get_slow_moving_items() if 'slow_moving' in sections else _resolved(None),
+        )
+
+        builders = {
+            'inventory': lambda: self._run(inventory_records, inventory_df),
+            'advice': lambda: self.get_advice(inventory_df, forecasts),
+            'fast_moving': lambda: _resolved(fast),
+            'slow_moving': lambda: _resolved(slow),
+            'expiry_alerts': lambda: self.get_expiry_alerts(df=inventory_df if columns is None else None),
+            'purchase_order': lambda: self.generate_purchase_order(inventory_df, forecasts),
+        }
+        results = await asyncio.gather(*(builders[name]() for name in sections))
+        return dict(zip(sections, results))
+
+    async def fresh_reports(self, kinds):
+        """Same as InventoryAgent.fresh_reports"""
+        if not reports_enabled():
+            return {}
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(reports.fresh, self.user_id, list(kinds))
+
+    async def serve_dashboard(self, sections=None):
+        """Same as InventoryAgent.serve_dashboard; stored sections are parsed on the pandas pool"""
+        sections, _ = self.agent._dashboard_plan(sections)
+        stored = await self.fresh_reports([name for name in sections if name in REPORT_KINDS])
+        live = [name for name in sections if name not in stored]
+        built = await self.get_dashboard(live) if live else {}
+        return await self._run(merge_dashboard, sections, stored, built)
@@ -0,0 +1,191 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from scripts.forecasting import apply_forecasts, forecast_frame, forecasting_enabled
+from scripts.recommendations import CRITICAL, WARNING, build_recommendations
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Nightly multi-tenant recommendation run.  The inventory table (joined to
+# the demand forecast state) is streamed once in keyset chunks ordered by
+# (user_id, product_id); every chunk is classified by a pool process with
+# the same vectorized code as the web routes, whatever tenants it spans,
+# and the results are upserted into stock_recommendations in bulk while
+# the next chunks are being computed.
+#
+#   python -m scripts.batch --workers 8 --chunksize 50000
+
+DEFAULT_CHUNKSIZE = 50000
+
+INVENTORY_COLUMNS = ('user_id', 'product_id', 'product_name', 'current_stock', 'safety_stock_level',
+                     'forecasted_demand', 'lead_time_days', 'annual_demand', 'order_cost_fixed',
+                     'holding_cost_per_unit')
+FORECAST_COLUMNS = ('ew_level', 'ew_square', 'first_sale_date', 'as_of_date')
+
+RESULT_COLUMNS = ('status', 'reorder_qty', 'min_req', 'po_quantity', 'eoq', 'priority')
+
+
+def _chunk_query(with_forecasts, user_ids=None):
+    columns = [f"i.{name}" for name in INVENTORY_COLUMNS]
+    join = ""
+    if with_forecasts:
+        columns += [f"f.{name}" for name in FORECAST_COLUMNS]
+        join = "LEFT JOIN demand_forecasts f ON f.user_id = i.user_id AND f.product_id = i.product_id"
+    tenants = "AND i.user_id IN :uids" if user_ids is not None else ""
+    query = text(f"""
+        SELECT {', '.join(columns)}
+        FROM inventory i {join}
+        WHERE (i.user_id, i.product_id) > (:after_uid, :after_pid) AND i.deleted_at IS NULL {tenants}
+        ORDER BY i.user_id, i.product_id
+        LIMIT :limit
+    """)
+    if user_ids is not None:
+        query = query.bindparams(bindparam('uids', expanding=True))
+    return query
+
+
+def iter_chunks(engine, chunksize=DEFAULT_CHUNKSIZE, user_ids=None, with_forecasts=True):
+    """
+    Streams inventory rows as DataFrames of up to `chunksize` rows. Keyset
+    paging on (user_id, product_id) keeps every chunk an index range scan,
+    however far into the table the run is.
+    """
+    query = _chunk_query(with_forecasts, user_ids)
+    params = {"after_uid": -1, "after_pid": -1, "limit": chunksize}
+    if user_ids is not None:
+        params["uids"] = list(user_ids)
+    while True:
+        with engine.connect() as conn:
+            result = conn.execute(query, params)
+            keys, rows = list(result.keys()), result.fetchall()
+        if not rows:
+            return
+        yield pd.DataFrame(rows, columns=keys)
+        params["after_uid"], params["after_pid"] = rows[-1][0], rows[-1][1]
+        if len(rows) < chunksize:
+            return
+
+
+def _nullable(values):
+    # Integer results of rows with gaps come back as float NaN; store NULL
+    return [None if value is None or (isinstance(value, float) and np.isnan(value)) else int(value)
+            for value in values]
+
+
+def recommend_chunk(chunk, today=None):
+    """
+    Pool job: classifies one chunk of inventory rows (any mix of tenants)
+    and returns result rows ready for a bulk upsert.
+    """
+    df = chunk
+    if 'ew_level' in chunk:
+        states = chunk.loc[chunk['ew_level'].notna(), ['product_id', *FORECAST_COLUMNS]].copy()
+        states['first_sale_date'] = pd.to_datetime(states['first_sale_date'])
+        states['as_of_date'] = pd.to_datetime(states['as_of_date'])
+        states['ew_level'] = states['ew_level'].astype('float64')
+        states['ew_square'] = states['ew_square'].astype('float64')
+        df = apply_forecasts(chunk, forecast_frame(states, today))
+
+    recs = build_recommendations(df)
+    columns = {name: recs[name].tolist() for name in ('status', 'priority')}
+    for name in ('reorder_qty', 'min_req', 'po_quantity', 'eoq'):
+        columns[name] = _nullable(recs[name].tolist())
+    user_ids = chunk['user_id'].tolist()
+    product_ids = chunk['product_id'].tolist()
+    return [
+        {"uid": user_ids[n], "pid": product_ids[n], **{name: columns[name][n] for name in RESULT_COLUMNS}}
+        for n in range(len(product_ids))
+    ]
+
+
+def _upsert_sql(dialect_name):
+    insert = """
+        INSERT INTO stock_recommendations
+        (user_id, product_id, status, reorder_qty, min_req, po_quantity, eoq, priority, computed_at)
+        VALUES (:uid, :pid, :status, :reorder_qty, :min_req, :po_quantity, :eoq, :priority, :at)
+    """
+    updates = ('status', 'reorder_qty', 'min_req', 'po_quantity', 'eoq', 'priority', 'computed_at')
+    if dialect_name == 'mysql':
+        return text(insert + " ON DUPLICATE KEY UPDATE "
+                    + ', '.join(f"{name} = VALUES({name})" for name in updates))
+    return text(insert + " ON CONFLICT (user_id, product_id) DO UPDATE SET "
+                + ', '.join(f"{name} = excluded.{name}" for name in updates))
+
+
+def write_results(engine, rows, computed_at):
+    """One bulk upsert per chunk of results"""
+    for row in rows:
+        row["at"] = computed_at
+    with engine.begin() as conn:
+        conn.execute(_upsert_sql(conn.dialect.name), rows)
+
+
+def run(engine, workers=None, chunksize=DEFAULT_CHUNKSIZE, user_ids=None):
+    """
+    Recomputes stock_recommendations for every tenant (or `user_ids`) in one
+    pass and removes rows of products that no longer exist. Returns a
+    summary of the run.
+    """
+    workers = workers or int(os.getenv('BATCH_WORKERS', 0)) or os.cpu_count()
+    computed_at = datetime.now().replace(microsecond=0)
+    today = date.today()
+    summary = {'tenants': set(), 'products': 0, CRITICAL: 0, WARNING: 0, 'chunks': 0}
+
+    def collect(rows):
+        write_results(engine, rows, computed_at)
+        summary['chunks'] += 1
+        summary['products'] += len(rows)
+        summary['tenants'].update(row["uid"] for row in rows)
+        for row in rows:
+            if row["status"] in (CRITICAL, WARNING):
+                summary[row["status"]] += 1
+
+    # Bounded in-flight chunks: memory stays at a few chunks however big the table is
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in iter_chunks(engine, chunksize, user_ids, with_forecasts=forecasting_enabled()):
+            pending.append(pool.submit(recommend_chunk, chunk, today))
+            if len(pending) >= workers * 2:
+                collect(pending.popleft().result())
+        while pending:
+            collect(pending.popleft().result())
+
+    # Products deleted since the last run were not rewritten
+    stale = "DELETE FROM stock_recommendations WHERE computed_at < :at"
+    params = {"at": computed_at}
+    with engine.begin() as conn:
+        if user_ids is not None:
+            conn.execute(text(stale + " AND user_id IN :uids").bindparams(bindparam('uids', expanding=True)),
+                         {**params, "uids": list(user_ids)})
+        else:
+            conn.execute(text(stale), params)
+
+    summary['tenants'] = len(summary['tenants'])
+    return summary
+
+
+def main():
+    from scripts.db_connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Compute stock recommendations for every tenant in one pass")
+    parser.add_argument('--workers', type=int, default=None, help="Pool processes (default BATCH_WORKERS or one per core)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Inventory rows per chunk")
+    parser.add_argument('--user-id', type=int, action='append', help="Only this tenant (repeatable)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = run(get_engine(), workers=args.workers, chunksize=args.chunksize, user_ids=args.user_id)
+    print(f"--- Recommendations computed for {summary['tenants']} tenants / {summary['products']} products "
+          f"in {time.perf_counter() - started:.1f}s: {summary[CRITICAL]} critical, {summary[WARNING]} warning ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import argparse
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # in requirements.txt; without it CSV still works, Parquet does not
+    pa = pq = None
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Bulk product import and chunked exports.  An upload (CSV or Parquet) is
+# read DEFAULT_CHUNKSIZE rows at a time; each chunk is validated with
+# vectorized checks and its good rows go in with one multi-row INSERT and
+# one commit, so a 20k-SKU catalog is a handful of statements instead of
+# 20k requests.  Bad rows are reported by row number and never stop the
+# rest of the file.
+#
+#   python -m scripts.bulk import --user-id 1 catalog.csv
+#   python -m scripts.bulk export --user-id 1 --table sales_history --format parquet -o history.parquet
+
+DEFAULT_CHUNKSIZE = 5000
+# Per-row errors returned in an import summary; the count covers them all
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'parquet')
+MAX_NAME_LENGTH = 100
+# Largest values the INT and DECIMAL(10,2) inventory columns hold
+MAX_INTEGER = 2**31 - 1
+MAX_MONEY = 99999999.99
+
+REQUIRED_COLUMNS = ('product_name', 'current_stock', 'order_cost_fixed')
+INTEGER_COLUMNS = ('current_stock', 'safety_stock_level', 'forecasted_demand', 'lead_time_days', 'annual_demand')
+MONEY_COLUMNS = ('order_cost_fixed', 'holding_cost_per_unit')
+IMPORT_COLUMNS = ('product_name',) + INTEGER_COLUMNS + MONEY_COLUMNS + ('expiry_date',)
+EXPORT_COLUMNS = ('product_id',) + IMPORT_COLUMNS
+SALES_HISTORY_COLUMNS = ('id', 'product_id', 'product_name', 'sale_date', 'quantity_sold', 'revenue', 'profit', 'type')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ValueError("Parquet needs the pyarrow package (pip install -r requirements.txt)")
+
+
+def detect_format(fmt=None, filename=None):
+    """'csv' or 'parquet' from an explicit format, else the file extension (default csv)"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt!r}; use csv or parquet")
+        return fmt
+    if filename and filename.lower().endswith(('.parquet', '.pq')):
+        return 'parquet'
+    return 'csv'
+
+
+def read_chunks(stream, fmt, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields DataFrames of up to `chunksize` uploaded rows"""
+    if fmt == 'parquet':
+        _require_pyarrow()
+        for batch in pq.ParquetFile(stream).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+    # Everything as text: the validation below decides what is a number
+    yield from pd.read_csv(stream, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+def _blank_to_na(values):
+    # Parquet columns arrive typed (int, all-null, dates): text first, then one set of checks
+    values = values.astype('string').str.strip()
+    return values.mask(values == '')
+
+
+def validate_chunk(chunk, first_row):
+    """
+    Vectorized checks of one chunk. Returns (rows ready for INSERT, errors),
+    errors as [{"row": n, "error": message}] with 1-based data row numbers.
+    """
+    missing = [name for name in REQUIRED_COLUMNS if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    errors = pd.Series('', index=chunk.index, dtype=object)
+
+    def fail(mask, message):
+        errors[mask & (errors == '')] = message
+
+    clean = pd.DataFrame(index=chunk.index)
+    names = _blank_to_na(chunk['product_name'])
+    fail(names.isna(), "product_name is required")
+    fail(names.str.len().fillna(0) > MAX_NAME_LENGTH, f"product_name is longer than {MAX_NAME_LENGTH} characters")
+    clean['product_name'] = names
+
+    for name in INTEGER_COLUMNS + MONEY_COLUMNS:
+        raw = _blank_to_na(chunk[name]) if name in chunk.columns else pd.Series(np.nan, index=chunk.index)
+        values = pd.to_numeric(raw, errors='coerce').astype('float64')
+        if name in REQUIRED_COLUMNS:
+            fail(raw.isna(), f"{name} is required")
+        fail(raw.notna() & ~np.isfinite(values), f"{name} must be a number")
+        fail(values < 0, f"{name} must not be negative")
+        # One out-of-range value would fail the whole chunk's INSERT (MySQL) or be stored wrapped (SQLite)
+        limit = MAX_INTEGER if name in INTEGER_COLUMNS else MAX_MONEY
+        too_large = values.round(2) > limit
+        fail(too_large, f"{name} must be at most {limit}")
+        values = values.where(np.isfinite(values) & ~too_large)
+        if name in INTEGER_COLUMNS:
+            fail(values.notna() & (values % 1 != 0), f"{name} must be a whole number")
+            values = values.round().astype('Int64')
+        clean[name] = values
+
+    if 'expiry_date' in chunk.columns:
+        raw = _blank_to_na(chunk['expiry_date'])
+        dates = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+        fail(raw.notna() & dates.isna(), "expiry_date must be a YYYY-MM-DD date")
+        clean['expiry_date'] = dates.dt.date
+    else:
+        clean['expiry_date'] = None
+
+    bad = errors != ''
+    reported = [{"row": first_row + int(position), "error": message}
+                for position, message in zip(np.flatnonzero(bad.to_numpy()), errors[bad])]
+    good = clean[~bad].astype(object)
+    return good.where(good.notna(), None).to_dict('records'), reported
+
+
+def insert_rows(conn, user_id, rows):
+    """One multi-row INSERT for a chunk of validated rows"""
+    for row in rows:
+        row['user_id'] = user_id
+    conn.execute(text(f"""
+        INSERT INTO inventory ({', '.join(IMPORT_COLUMNS)}, user_id)
+        VALUES ({', '.join(':' + name for name in IMPORT_COLUMNS)}, :user_id)
+    """), rows)
+
+
+def new_summary():
+    return {'rows': 0, 'imported': 0, 'failed': 0, 'errors': [], 'chunks': 0}
+
+
+def import_products(engine, user_id, stream, fmt='csv', chunksize=DEFAULT_CHUNKSIZE, summary=None):
+    """
+    Imports an upload chunk by chunk, one transaction per chunk. Returns
+    {rows, imported, failed, errors (first MAX_REPORTED_ERRORS), chunks}.
+    A passed-in `summary` is updated after every committed chunk, so it
+    still shows what went in when a later chunk raises.
+    """
+    summary = summary if summary is not None else new_summary()
+    for chunk in read_chunks(stream, fmt, chunksize):
+        rows, errors = validate_chunk(chunk.reset_index(drop=True), summary['rows'] + 1)
+        if rows:
+            with engine.begin() as conn:
+                insert_rows(conn, user_id, rows)
+        summary['rows'] += len(chunk)
+        summary['imported'] += len(rows)
+        summary['failed'] += len(errors)
+        summary['errors'].extend(errors[:MAX_REPORTED_ERRORS - len(summary['errors'])])
+        summary['chunks'] += 1
+    return summary
+
+
+def iter_inventory(engine, user_id, chunksize=DEFAULT_CHUNKSIZE):
+    """Streams a tenant's products as DataFrames of EXPORT_COLUMNS, keyset-paged on product_id"""
+    query = text(f"""
+        SELECT {', '.join(EXPORT_COLUMNS)} FROM inventory
+        WHERE user_id = :uid AND product_id > :after AND deleted_at IS NULL
+        ORDER BY product_id LIMIT :limit
+    """)
+    after = -1
+    while True:
+        with engine.connect() as conn:
+            chunk = pd.read_sql(query, conn, params={"uid": user_id, "after": after, "limit": chunksize})
+        if chunk.empty:
+            return
+        # Nullable integers, so a gap does not turn a column's counts into floats
+        yield chunk.astype({name: 'Int64' for name in INTEGER_COLUMNS})
+        after = int(chunk['product_id'].iloc[-1])
+        if len(chunk) < chunksize:
+            return
+
+
+def _arrow_schema(table):
+    integer, money, string, day = pa.int64(), pa.float64(), pa.string(), pa.date32()
+    if table == 'inventory':
+        fields = [('product_id', integer), ('product_name', string)]
+        fields += [(name, integer) for name in INTEGER_COLUMNS] + [(name, money) for name in MONEY_COLUMNS]
+        fields += [('expiry_date', day)]
+    else:
+        fields = [('id', integer), ('product_id', integer), ('product_name', string), ('sale_date', day),
+                  ('quantity_sold', integer), ('revenue', money), ('profit', money), ('type', string)]
+    return pa.schema(fields)
+
+
+class _PendingBytes(io.RawIOBase):
+    """Write-only sink the Parquet writer fills; take() hands out what was written since the last call"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def encode_chunks(chunks, fmt, table, columns):
+    """
+    Yields the export file piece by piece: CSV text per chunk, or one
+    Parquet row group per chunk, so memory stays at one chunk.
+    """
+    if fmt == 'csv':
+        header = True
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+        if header:
+            yield ','.join(columns) + '\n'
+        return
+
+    _require_pyarrow()
+    schema = _arrow_schema(table)
+    sink = _PendingBytes()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            chunk = chunk[list(schema.names)].copy()
+            for field in schema:
+                if field.type == pa.date32():
+                    chunk[field.name] = pd.to_datetime(chunk[field.name]).dt.date
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+
+def main():
+    from scripts.inventory_agent import InventoryAgent
+
+    parser = argparse.ArgumentParser(description="Bulk product import and inventory / sales history export")
+    sub = parser.add_subparsers(dest='command', required=True)
+    load = sub.add_parser('import', help="Import products from a CSV or Parquet file")
+    load.add_argument('path')
+    dump = sub.add_parser('export', help="Export inventory or sales history")
+    dump.add_argument('--table', choices=('inventory', 'sales_history'), default='inventory')
+    dump.add_argument('-o', '--output', default=None, help="File to write (default stdout, CSV only)")
+    for command in (load, dump):
+        command.add_argument('--user-id', type=int, required=True)
+        command.add_argument('--format', choices=FORMATS, default=None, help="Default: from the file extension")
+        command.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    agent = InventoryAgent(args.user_id)
+    started = time.perf_counter()
+    if args.command == 'import':
+        with open(args.path, 'rb') as f:
+            summary = agent.import_products(f, detect_format(args.format, args.path), args.chunksize)
+        for error in summary['errors']:
+            print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+        print(f"--- Imported {summary['imported']} of {summary['rows']} rows ({summary['failed']} failed) "
+              f"in {time.perf_counter() - started:.1f}s ---")
+        return
+
+    fmt = detect_format(args.format, args.output)
+    if args.table == 'inventory':
+        chunks, columns = agent.iter_inventory(args.chunksize), EXPORT_COLUMNS
+    else:
+        chunks, columns = agent.iter_sales_history(chunk_size=args.chunksize), SALES_HISTORY_COLUMNS
+    pieces = encode_chunks(chunks, fmt, args.table, columns)
+    if args.output is None:
+        if fmt != 'csv':
+            parser.error("Parquet exports need --output")
+        for piece in pieces:
+            sys.stdout.write(piece)
+        return
+    with open(args.output, 'wb') as f:
+        for piece in pieces:
+            f.write(piece.encode() if isinstance(piece, str) else piece)
+    print(f"--- Exported {args.table} to {args.output} in {time.perf_counter() - started:.1f}s ---", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Cached frame kinds; mutations invalidate exactly the kinds they touch
+INVENTORY = 'inventory'
+SALES = 'sales'
+
+
+class LocalVersionStore:
+    """Per-process invalidation counters (single worker / development)"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_version(self, user_id, kind):
+        with self._lock:
+            return self._versions.get((user_id, kind), 0)
+
+    def bump(self, user_id, kind):
+        with self._lock:
+            version = self._versions.get((user_id, kind), 0) + 1
+            self._versions[(user_id, kind)] = version
+            return version
+
+
+class SQLiteVersionStore:
+    """
+    Invalidation counters in a local SQLite file shared by every gunicorn
+    worker on the host, so a write in one worker expires the others' entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tenant_versions (
+                    user_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, kind)
+                )
+            """)
+
+    def _connect(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_version(self, user_id, kind):
+        row = self._connect().execute(
+            "SELECT version FROM tenant_versions WHERE user_id = ? AND kind = ?",
+            (user_id, kind)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, user_id, kind):
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO tenant_versions (user_id, kind, version) VALUES (?, ?, 1)
+            ON CONFLICT (user_id, kind) DO UPDATE SET version = version + 1
+        """, (user_id, kind))
+        return self.get_version(user_id, kind)
+
+
+class TenantCache:
+    """
+    In-process read cache for per-tenant DataFrames.
+    Entries expire after `ttl` seconds, the least recently used ones are
+    evicted beyond `max_entries`/`max_bytes`, and every entry is tagged with
+    the tenant's invalidation version so writes expire it immediately.
+    """
+
+    def __init__(self, ttl=30, max_entries=512, max_bytes=256 * 1024 * 1024, versions=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.versions = versions or LocalVersionStore()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['size']
+
+    def get(self, user_id, kind, variant=None):
+        """Returns a private copy of the cached frame, or None on a miss"""
+        key = (user_id, kind, variant)
+        version = self.versions.get_version(user_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version or time.monotonic() >= entry['expires_at']:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry['df']
+        # Callers add and reshape columns, so never hand out the cached frame
+        return df.copy()
+
+    def set(self, user_id, kind, df, version=None, variant=None):
+        # `variant` separates differently shaped frames of one kind (e.g. a
+        # column projection); they all share the kind's invalidation version
+        key = (user_id, kind, variant)
+        if version is None:
+            version = self.versions.get_version(user_id, kind)
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {
+                'df': df.copy(),
+                'version': version,
+                'expires_at': time.monotonic() + self.ttl,
+                'size': size,
+            }
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, user_id, kind, loader, variant=None):
+        """Serves from cache, or calls loader() and caches its result"""
+        df = self.get(user_id, kind, variant)
+        if df is not None:
+            return df
+        # Read the version before loading so a write that lands mid-load
+        # leaves the entry already stale instead of caching old data
+        version = self.versions.get_version(user_id, kind)
+        df = loader()
+        self.set(user_id, kind, df, version=version, variant=variant)
+        return df
+
+    def invalidate(self, user_id, kinds=(INVENTORY, SALES)):
+        """Expires the given kinds for one tenant in this and every sharing worker"""
+        for kind in kinds:
+            self.versions.bump(user_id, kind)
+            with self._lock:
+                for key in [key for key in self._entries if key[:2] == (user_id, kind)]:
+                    self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'pid': os.getpid(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'ttl': self.ttl,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'shared_backend': isinstance(self.versions, SQLiteVersionStore),
+            }
+
+
+class _NullCache:
+    """
+    Stand-in used when CACHE_ENABLED=false; every lookup is a miss, but
+    writes still bump the data versions that ETags are built from.
+    """
+
+    def __init__(self, versions=None):
+        self.versions = versions or LocalVersionStore()
+
+    def get(self, user_id, kind, variant=None):
+        return None
+
+    def set(self, user_id, kind, df, version=None, variant=None):
+        pass
+
+    def get_or_load(self, user_id, kind, loader, variant=None):
+        return loader()
+
+    def invalidate(self, user_id, kinds=(INVENTORY, SALES)):
+        for kind in kinds:
+            self.versions.bump(user_id, kind)
+
+    def stats(self):
+        return {'enabled': False}
+
+
+class PriceCache:
+    """
+    Unit costs (order_cost_fixed) per tenant and product for the sale and
+    purchase paths, so a write needs no product lookup. Costs are fixed
+    once a product is added; a delete evicts the entry here, and a sale of
+    a product deleted through another worker fails its conditional UPDATE
+    and evicts it there.
+    """
+
+    def __init__(self, ttl=300, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, user_id, product_ids):
+        """{product_id: cost} for the ids that are cached and fresh"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get((user_id, product_id))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((user_id, product_id))
+                    found[product_id] = entry[0]
+        return found
+
+    def set_many(self, user_id, costs):
+        if self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for product_id, cost in costs.items():
+                self._entries[(user_id, product_id)] = (cost, expires_at)
+                self._entries.move_to_end((user_id, product_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._entries.pop((user_id, product_id), None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_price_cache = None
+
+
+def _build_cache():
+    shared_path = os.getenv('CACHE_SHARED_PATH')
+    versions = SQLiteVersionStore(shared_path) if shared_path else LocalVersionStore()
+    if os.getenv('CACHE_ENABLED', 'true').strip().lower() in ('0', 'false', 'no', 'off'):
+        return _NullCache(versions)
+
+    return TenantCache(
+        ttl=float(os.getenv('CACHE_TTL_SECONDS', 30)),
+        max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 512)),
+        max_bytes=int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+        versions=versions,
+    )
+
+
+def get_cache():
+    """Returns the process-wide tenant cache, configured from .env"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _build_cache()
+    return _cache
+
+
+def get_price_cache():
+    """Process-wide PriceCache (PRICE_CACHE_TTL_SECONDS, 0 disables it)"""
+    global _price_cache
+    if _price_cache is None:
+        with _cache_lock:
+            if _price_cache is None:
+                _price_cache = PriceCache(ttl=float(os.getenv('PRICE_CACHE_TTL_SECONDS', 300)),
+                                          max_entries=int(os.getenv('PRICE_CACHE_MAX_ENTRIES', 100000)))
+    return _price_cache
+
+
+def _reset_after_fork():
+    # Locks may have been held by another thread at fork time
+    global _cache, _cache_lock, _price_cache
+    _cache_lock = threading.Lock()
+    _cache = None
+    _price_cache = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Per-tenant change feed behind /api/stream (Server-Sent Events) and
+# /api/changes (long-poll).  Write paths publish the products they touched;
+# every event gets the next sequence number for its tenant so a client can
+# resume with Last-Event-ID / ?since= after a reconnect.
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class LocalEventStore:
+    """Recent events per tenant in this process (single worker / development)"""
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self._events = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def append(self, user_id, payload):
+        with self._lock:
+            seq = self._latest.get(user_id, 0) + 1
+            self._latest[user_id] = seq
+            self._events.setdefault(user_id, deque(maxlen=self.max_events)).append((seq, payload))
+            return seq
+
+    def read(self, user_id, after):
+        """(events after `after`, oldest retained seq, latest seq)"""
+        with self._lock:
+            events = self._events.get(user_id, ())
+            oldest = events[0][0] if events else None
+            return [event for event in events if event[0] > after], oldest, self._latest.get(user_id, 0)
+
+
+class SQLiteEventStore:
+    """
+    Recent events in a local SQLite file shared by every gunicorn worker on
+    the host, so a write handled by one worker reaches streams held by another.
+    """
+
+    def __init__(self, path, max_events=1000):
+        self.path = path
+        self.max_events = max_events
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS change_events (
+                    user_id INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (user_id, seq)
+                )
+            """)
+
+    def _connect(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, user_id, payload):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM change_events WHERE user_id = ?",
+                               (user_id,)).fetchone()[0]
+            conn.execute("INSERT INTO change_events (user_id, seq, payload) VALUES (?, ?, ?)",
+                         (user_id, seq, payload))
+            conn.execute("DELETE FROM change_events WHERE user_id = ? AND seq <= ?",
+                         (user_id, seq - self.max_events))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    def read(self, user_id, after):
+        """(events after `after`, oldest retained seq, latest seq)"""
+        conn = self._connect()
+        oldest, latest = conn.execute("SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM change_events WHERE user_id = ?",
+                                      (user_id,)).fetchone()
+        events = conn.execute("SELECT seq, payload FROM change_events WHERE user_id = ? AND seq > ? ORDER BY seq",
+                              (user_id, after)).fetchall()
+        return events, oldest, latest
+
+
+class ChangeFeed:
+    """
+    Publishes JSON change events per tenant and lets readers block until
+    something newer than their last seen sequence number arrives.
+    """
+
+    def __init__(self, events=None, poll_interval=0.5):
+        self.events = events or LocalEventStore()
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+
+    def publish(self, user_id, event):
+        """Appends one event and wakes this worker's waiting readers; returns its seq"""
+        seq = self.events.append(user_id, json.dumps(event, default=_json_default))
+        with self._condition:
+            self._condition.notify_all()
+        return seq
+
+    def latest(self, user_id):
+        return self.events.read(user_id, float('inf'))[2]
+
+    def read(self, user_id, after):
+        """
+        {'events': [(seq, json_text), ...], 'last_seq': n, 'resync': bool}.
+        resync is set when `after` is older than the retained events or newer
+        than anything published (e.g. after a restart); reload everything then.
+        """
+        events, oldest, latest = self.events.read(user_id, after)
+        resync = after > latest or (oldest is not None and after < oldest - 1)
+        return {'events': [] if resync else events, 'last_seq': latest, 'resync': resync}
+
+    def wait(self, user_id, after, timeout):
+        """Like read(), but blocks up to `timeout` seconds for a new event"""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.read(user_id, after)
+            remaining = deadline - time.monotonic()
+            if result['events'] or result['resync'] or remaining <= 0:
+                return result
+            # Local publishes notify immediately; other workers' events are
+            # picked up on the next poll of the shared store
+            with self._condition:
+                self._condition.wait(min(self.poll_interval, remaining))
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def _build_feed():
+    max_events = int(os.getenv('CHANGE_FEED_MAX_EVENTS', 1000))
+    shared_path = os.getenv('CHANGE_FEED_SHARED_PATH') or os.getenv('CACHE_SHARED_PATH')
+    events = SQLiteEventStore(shared_path, max_events) if shared_path else LocalEventStore(max_events)
+    return ChangeFeed(events, poll_interval=float(os.getenv('CHANGE_FEED_POLL_SECONDS', 0.5)))
+
+
+def get_change_feed():
+    """Returns the process-wide change feed, configured from .env"""
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = _build_feed()
+    return _feed
+
+
+def _reset_after_fork():
+    # Locks may have been held by another thread at fork time
+    global _feed, _feed_lock
+    _feed_lock = threading.Lock()
+    _feed = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
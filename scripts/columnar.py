@@ -0,0 +1,106 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # in requirements.txt; the stdlib encoder is used without it (see log_encoder)
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # in requirements.txt; ?format=arrow needs it, columnar JSON does not
+    pa = None
+
+# Compact response modes for the DataFrame endpoints.  The default JSON body
+# is a list of row objects: every key is repeated on every row and pandas
+# builds one Python dict per row before the encoder sees it.  ?format=columnar
+# sends {"columns": [...], "data": {column: [values]}, "rows": n} built
+# straight from the frame's arrays (orjson writes numeric columns from numpy
+# without a Python object per value), and ?format=arrow sends the frame as an
+# Arrow IPC stream for clients that can read it.
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('columnar', 'arrow')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def log_encoder():
+    """Called once at startup: the fallback encoder is several times slower on large frames"""
+    if orjson is None:
+        logger.warning("orjson is not installed: ?format=columnar uses the stdlib JSON encoder")
+
+
+def column_values(values, fast=True):
+    """
+    One column as something the encoder can write: dates as YYYY-MM-DD,
+    missing values as null.  With `fast` (orjson), numeric columns are
+    returned as numpy arrays; otherwise everything is a list.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        days = values.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        text = np.datetime_as_string(days).astype(object)
+        text[np.isnat(days)] = None
+        return text.tolist()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Each distinct label is converted once, rows just index into them
+        labels = np.append(values.cat.categories.to_numpy(dtype=object), None)
+        return labels[values.cat.codes.to_numpy()].tolist()
+
+    array = values.to_numpy() if isinstance(values.dtype, np.dtype) else values.to_numpy(dtype=object)
+    if array.dtype.kind in 'iub':
+        return np.ascontiguousarray(array) if fast else array.tolist()
+    if array.dtype.kind == 'f':
+        if fast:
+            # orjson writes NaN as null
+            return np.ascontiguousarray(array)
+        missing = np.isnan(array)
+        if not missing.any():
+            return array.tolist()
+        array = array.astype(object)
+        array[missing] = None
+        return array.tolist()
+    # Strings, objects and nullable extension types
+    return [None if value is None or value is pd.NA or value != value else _native(value)
+            for value in array]
+
+
+def _native(value):
+    return value.item() if hasattr(value, 'item') else value
+
+
+def encode_columnar(frame, extra=None, fast=None):
+    """
+    ?format=columnar body (bytes) for a DataFrame; `extra` adds top-level
+    keys such as next_cursor.  `fast` defaults to using orjson if installed.
+    """
+    if fast is None:
+        fast = orjson is not None
+    columns = [str(name) for name in frame.columns]
+    payload = {
+        'columns': columns,
+        'data': {name: column_values(frame[source], fast) for name, source in zip(columns, frame.columns)},
+        'rows': len(frame),
+    }
+    if extra:
+        payload.update(extra)
+    if fast:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':'), default=_native).encode()
+
+
+def encode_arrow(frame):
+    """The frame as an Arrow IPC stream (bytes); dates become date32, categoricals dictionaries"""
+    if pa is None:
+        raise ValueError("?format=arrow needs the pyarrow package (pip install -r requirements.txt)")
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    for position, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(position, field.name, table.column(position).cast(pa.date32()))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -1,21 +1,175 @@
-import mysql.connector
-from mysql.connector import Error
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from scripts.metrics import instrument_engine
+
+# Load the variables from the .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# One engine (and therefore one connection pool) per process.  Every
+# InventoryAgent and the auth blueprint borrow connections from it instead of
+# building their own engine on each request.
+_engine = None
+_engine_lock = threading.Lock()
+
+# The ASGI serving mode (asgi.py) reads through its own async engine; its
+# pool is sized from the same DB_POOL_* settings.
+_async_engine = None
+
+# Async DBAPI driver used for each backend in the ASGI serving mode
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_database_url():
+    """Builds the SQLAlchemy URL from .env (DB_URL overrides the DB_* parts)"""
+    url = os.getenv('DB_URL')
+    if url:
+        return url
+
+    db_host = os.getenv('DB_HOST')
+    db_user = os.getenv('DB_USER')
+    db_password = os.getenv('DB_PASSWORD')
+    db_name = os.getenv('DB_NAME')
+    return f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}"
+
+
+def get_pool_settings():
+    """Pool configuration, tunable per deployment through .env"""
+    return {
+        # Persistent connections kept per worker process
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        # Extra connections allowed under bursts, closed when returned
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        # Seconds to wait for a free connection before failing the request
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        # RDS drops idle connections; recycle before that happens
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        # Cheap liveness check so a dropped connection never reaches a query
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+
+def get_engine():
+    """Returns the process-wide pooled engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # Every statement is timed into db_query_duration_seconds
+                _engine = instrument_engine(create_engine(get_database_url(), **get_pool_settings()))
+    return _engine
+
+
+def dispose_engine():
+    """Closes every pooled connection; the next get_engine() builds a fresh pool"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def get_async_database_url():
+    """The database URL with its driver swapped for the async one (aiomysql for MySQL)"""
+    url = make_url(get_database_url())
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def get_async_engine():
+    """
+    Returns the process-wide AsyncEngine used by the ASGI serving mode.
+    Only called from the event loop thread, so it needs no lock.
+    """
+    global _async_engine
+    if _async_engine is None:
+        # Imported lazily: sync deployments do not need greenlet/aiomysql
+        from sqlalchemy.ext.asyncio import create_async_engine
+        settings = get_pool_settings()
+        url = get_async_database_url()
+        if url.get_backend_name() == 'sqlite':
+            # SQLite's async driver does not use a queue pool
+            settings = {'pool_pre_ping': settings['pool_pre_ping']}
+        _async_engine = create_async_engine(url, **settings)
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Closes the async pool; called on ASGI shutdown"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def _reset_after_fork():
+    # gunicorn forks workers from the master; sockets inherited from the parent
+    # must never be shared, so each child starts with its own empty pool.
+    global _engine, _engine_lock, _async_engine
+    _engine_lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+        _async_engine = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool_stats():
+    """Current pool usage for this worker process, used to size the pool"""
+    settings = get_pool_settings()
+    stats = {
+        'pid': os.getpid(),
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'pool_recycle': settings['pool_recycle'],
+        'pool_pre_ping': settings['pool_pre_ping'],
+        'initialized': _engine is not None,
+    }
+    if _engine is None:
+        return stats
+
+    pool = _engine.pool
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        metric = getattr(pool, name, None)
+        if callable(metric):
+            stats[name] = metric()
+    stats['status'] = pool.status()
+    return stats
+
 
 def get_connection():
     """
-    Creates a central connection to the MySQL Warehouse database.
-    Update the user and password to match your MySQL settings.
+    Borrows a raw DBAPI connection from the shared pool.
+    Call close() on it when done to hand it back to the pool.
     """
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',         # Your MySQL username
-            password='Railord@2005', # Your MySQL password
-            database='WarehouseDB'
-        )
-        if connection.is_connected():
-            return connection
-
-    except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
-        return None
\ No newline at end of file
+        return get_engine().raw_connection()
+    except Exception as e:
+        logger.error("error while connecting to MySQL", extra={'error': str(e)})
+        return None
@@ -0,0 +1,171 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Expiry tiers: every product expiring within the largest horizon lands in
+# the first tier it fits (already expired, then the day bounds in order).
+DEFAULT_TIER_DAYS = (7, 30, 90)
+EXPIRED = 'expired'
+
+# Columns an expiry lookup returns; cost is needed for the stock-at-risk value
+EXPIRY_RISK_COLUMNS = ('product_id', 'product_name', 'current_stock', 'expiry_date', 'order_cost_fixed')
+
+
+def parse_tier_days(value=None):
+    """Sorted, de-duplicated day bounds from "7,30,90" (default: EXPIRY_TIER_DAYS from .env)"""
+    if value is None:
+        value = os.getenv('EXPIRY_TIER_DAYS')
+    if not value:
+        return DEFAULT_TIER_DAYS
+    message = "Expiry tiers must be non-negative day counts, e.g. 7,30,90"
+    try:
+        days = sorted({int(part) for part in str(value).split(',') if part.strip()})
+    except ValueError:
+        raise ValueError(message)
+    if not days or days[0] < 0:
+        raise ValueError(message)
+    return tuple(days)
+
+
+def tier_name(days):
+    return f"within_{days}_days"
+
+
+def build_tiers(rows, tier_days, today=None):
+    """
+    Buckets expiring rows (EXPIRY_RISK_COLUMNS) into tiers, each with its
+    products, units and stock-at-risk value (units x unit cost).
+    """
+    today = pd.Timestamp(today or date.today())
+    rows = rows.copy()
+    rows['days_to_expiry'] = (rows['expiry_date'] - today).dt.days
+    stock = pd.to_numeric(rows['current_stock'], errors='coerce').fillna(0)
+    cost = pd.to_numeric(rows['order_cost_fixed'], errors='coerce').fillna(0)
+    rows['value_at_risk'] = (stock * cost).round(2)
+
+    bounds = [-1] + list(tier_days)
+    names = [EXPIRED] + [tier_name(days) for days in tier_days]
+    # Index of the first bound each row fits under: 0 = expired, 1 = first day tier, ...
+    position = np.searchsorted(np.asarray(bounds), rows['days_to_expiry'].to_numpy(), side='left')
+
+    tiers = []
+    for index, name in enumerate(names):
+        members = rows[position == index].sort_values(['days_to_expiry', 'product_id'])
+        member_stock = stock[position == index]
+        tiers.append({
+            'tier': name,
+            'max_days': None if index == 0 else tier_days[index - 1],
+            'products': int(len(members)),
+            'units': int(member_stock.sum()),
+            'stock_at_risk': round(float(members['value_at_risk'].sum()), 2),
+            'items': members[['product_id', 'product_name', 'current_stock', 'expiry_date',
+                              'days_to_expiry', 'value_at_risk']].to_dict('records'),
+        })
+    return tiers
+
+
+class ExpiryIndex:
+    """
+    Optional per-tenant in-memory index of products ordered by expiry date.
+    An expiry lookup is a binary search plus a prefix slice instead of a
+    query.  Writes in this process patch it in place; a write seen only
+    through the tenant's inventory version (another worker) drops it so it
+    is rebuilt on the next lookup.
+    """
+
+    def __init__(self, max_tenants=256):
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id, version, until, loader):
+        """Rows expiring on or before `until`; loader() returns every dated row of the tenant"""
+        with self._lock:
+            entry = self._tenants.get(user_id)
+            if entry is not None and entry['version'] == version:
+                self._tenants.move_to_end(user_id)
+                frame = entry['frame']
+            else:
+                frame = None
+        if frame is None:
+            frame = self._sorted(loader())
+            self._store(user_id, version, frame)
+        end = frame['expiry_date'].searchsorted(pd.Timestamp(until), side='right')
+        return frame.iloc[:end].sort_values('product_id', kind='stable').reset_index(drop=True)
+
+    def apply(self, user_id, previous_version, version, changed, deleted=()):
+        """
+        Patches a tenant after a local write: `changed` holds the written
+        products' current rows. Applied only if the index was built at
+        `previous_version`, i.e. no other write happened in between.
+        """
+        with self._lock:
+            entry = self._tenants.get(user_id)
+            if entry is None:
+                return
+            if entry['version'] != previous_version:
+                del self._tenants[user_id]
+                return
+            frame = entry['frame']
+        touched = set(deleted)
+        if changed is not None:
+            touched.update(changed['product_id'].tolist())
+        kept = frame[~frame['product_id'].isin(list(touched))]
+        if changed is not None and not changed.empty:
+            kept = pd.concat([kept, changed[list(EXPIRY_RISK_COLUMNS)]], ignore_index=True)
+        self._store(user_id, version, self._sorted(kept))
+
+    def discard(self, user_id):
+        with self._lock:
+            self._tenants.pop(user_id, None)
+
+    @staticmethod
+    def _sorted(frame):
+        frame = frame[frame['expiry_date'].notna()]
+        return frame.sort_values(['expiry_date', 'product_id'], kind='stable').reset_index(drop=True)
+
+    def _store(self, user_id, version, frame):
+        with self._lock:
+            self._tenants[user_id] = {'version': version, 'frame': frame}
+            self._tenants.move_to_end(user_id)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+
+
+def expiry_window_end(days_ahead, today=None):
+    """Last expiry date included in a `days_ahead` window"""
+    return (today or date.today()) + timedelta(days=days_ahead)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_expiry_index():
+    """Process-wide ExpiryIndex, or None unless EXPIRY_INDEX_ENABLED is set"""
+    global _index
+    if os.getenv('EXPIRY_INDEX_ENABLED', 'false').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ExpiryIndex(max_tenants=int(os.getenv('EXPIRY_INDEX_MAX_TENANTS', 256)))
+    return _index
+
+
+def _reset_after_fork():
+    # Locks may have been held by another thread at fork time
+    global _index, _index_lock
+    _index_lock = threading.Lock()
+    _index = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,330 @@
+import argparse
+import os
+from datetime import date
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from scripts import archive
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Demand forecasts from sales_history.  Every product keeps exponentially
+# weighted sums of its daily units sold (and of their squares) as of its last
+# sale day.  A sale folds into them inside record_sales' transaction, and
+# reads decay them to today, so the demand rate, its variability, the
+# lead-time safety stock and the reorder point are never more than one
+# vectorized pass over a row per product away.
+#
+#   level  = alpha * sum((1 - alpha) ** (as_of - day) * units[day])
+#   square = the same over units[day] ** 2
+
+DEFAULT_SPAN_DAYS = 28
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_MIN_HISTORY_DAYS = 14
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+STATE_COLUMNS = ('product_id', 'ew_level', 'ew_square', 'last_day_units', 'first_sale_date', 'as_of_date')
+
+
+def forecasting_enabled():
+    return os.getenv('FORECAST_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def smoothing():
+    """Daily smoothing factor for a FORECAST_SPAN_DAYS span (pandas' ewm(span=...) convention)"""
+    span = float(os.getenv('FORECAST_SPAN_DAYS', DEFAULT_SPAN_DAYS))
+    if span < 1:
+        raise ValueError("FORECAST_SPAN_DAYS must be at least 1")
+    return 2.0 / (span + 1.0)
+
+
+def service_factor():
+    """z for FORECAST_SERVICE_LEVEL, e.g. 1.645 at 95%"""
+    level = float(os.getenv('FORECAST_SERVICE_LEVEL', DEFAULT_SERVICE_LEVEL))
+    if not 0.5 <= level < 1:
+        raise ValueError("FORECAST_SERVICE_LEVEL must be in [0.5, 1)")
+    return NormalDist().inv_cdf(level)
+
+
+# --------------------------
+# Incremental updates
+# --------------------------
+
+def _upsert_sql(dialect_name):
+    insert = """
+        INSERT INTO demand_forecasts
+        (user_id, product_id, ew_level, ew_square, last_day_units, first_sale_date, as_of_date)
+        VALUES (:uid, :pid, :level, :square, :units, :first, :as_of)
+    """
+    if dialect_name == 'mysql':
+        return text(insert + """
+            ON DUPLICATE KEY UPDATE
+                ew_level = VALUES(ew_level), ew_square = VALUES(ew_square),
+                last_day_units = VALUES(last_day_units), as_of_date = VALUES(as_of_date)
+        """)
+    return text(insert + """
+        ON CONFLICT (user_id, product_id) DO UPDATE SET
+            ew_level = excluded.ew_level, ew_square = excluded.ew_square,
+            last_day_units = excluded.last_day_units, as_of_date = excluded.as_of_date
+    """)
+
+
+def record_sales(conn, user_id, sale_date, units):
+    """
+    Call inside the transaction that inserts the sales_history rows, after
+    the INSERT: folds {product_id: units sold} on `sale_date` into the forecasts.
+    """
+    if not units:
+        return
+    sql = """
+        SELECT product_id, ew_level, ew_square, last_day_units, first_sale_date, as_of_date
+        FROM demand_forecasts WHERE user_id = :uid AND product_id IN :pids
+    """
+    if conn.dialect.name == 'mysql':
+        # Concurrent sales of the same product must not both fold into the old state
+        sql += " FOR UPDATE"
+    rows = conn.execute(text(sql).bindparams(bindparam('pids', expanding=True)),
+                        {"uid": user_id, "pids": sorted(units)}).fetchall()
+    states = {row[0]: row for row in rows}
+
+    alpha = smoothing()
+    day = sale_date.toordinal()
+    params = []
+    for product_id, quantity in units.items():
+        quantity = float(quantity)
+        state = states.get(product_id)
+        if state is None:
+            level, square, last, first, as_of = 0.0, 0.0, 0.0, sale_date, sale_date
+        else:
+            level, square, last = float(state[1]), float(state[2]), float(state[3])
+            first, as_of = state[4], pd.Timestamp(state[5]).date()
+
+        gap = day - as_of.toordinal()
+        if state is None or gap > 0:
+            # First sale of a new day: age the sums by the days in between
+            decay = (1 - alpha) ** max(gap, 0)
+            level = level * decay + alpha * quantity
+            square = square * decay + alpha * quantity ** 2
+            last, as_of = quantity, sale_date
+        else:
+            # Another sale on the same day: the day's total grows, so its square does too
+            level += alpha * quantity
+            square += alpha * ((last + quantity) ** 2 - last ** 2)
+            last += quantity
+        params.append({"uid": user_id, "pid": product_id, "level": level, "square": square,
+                       "units": int(last), "first": first, "as_of": as_of})
+    conn.execute(_upsert_sql(conn.dialect.name), params)
+
+
+def remove_product(conn, user_id, product_id):
+    conn.execute(text("DELETE FROM demand_forecasts WHERE user_id = :uid AND product_id = :pid"),
+                 {"uid": user_id, "pid": product_id})
+
+
+# --------------------------
+# Reads
+# --------------------------
+
+def states_query(user_id, product_ids=None):
+    """(query, params) reading a tenant's stored forecast state, optionally only `product_ids`"""
+    sql = f"SELECT {', '.join(STATE_COLUMNS)} FROM demand_forecasts WHERE user_id = :uid"
+    params = {"uid": user_id}
+    if product_ids is None:
+        return text(sql), params
+    params["pids"] = [int(product_id) for product_id in product_ids] or [-1]
+    return text(sql + " AND product_id IN :pids").bindparams(bindparam('pids', expanding=True)), params
+
+
+def load_states(conn, user_id, product_ids=None):
+    query, params = states_query(user_id, product_ids)
+    return states_frame(conn.execute(query, params).fetchall())
+
+
+def states_frame(rows):
+    """STATE_COLUMNS rows as a DataFrame"""
+    values = list(zip(*rows)) if rows else [()] * len(STATE_COLUMNS)
+    return pd.DataFrame({
+        'product_id': np.fromiter(values[0], dtype='int64', count=len(rows)),
+        'ew_level': np.fromiter(values[1], dtype='float64', count=len(rows)),
+        'ew_square': np.fromiter(values[2], dtype='float64', count=len(rows)),
+        'last_day_units': np.fromiter(values[3], dtype='float64', count=len(rows)),
+        'first_sale_date': pd.to_datetime(pd.Series(values[4], dtype=object)),
+        'as_of_date': pd.to_datetime(pd.Series(values[5], dtype=object)),
+    })
+
+
+def forecast_frame(states, today=None):
+    """
+    Decays the stored state to `today`: one row per product (indexed by
+    product_id) with its daily demand rate, daily standard deviation and
+    days of history.
+    """
+    alpha = smoothing()
+    today = pd.Timestamp(today or date.today())
+    idle = np.clip((today - states['as_of_date']).dt.days.to_numpy(), 0, None)
+    history = np.clip((today - states['first_sale_date']).dt.days.to_numpy() + 1, 1, None)
+
+    decay = (1 - alpha) ** idle
+    # Days before the first sale carry no weight; rescale what the history has
+    weight = 1 - (1 - alpha) ** history
+    rate = states['ew_level'].to_numpy() * decay / weight
+    second = states['ew_square'].to_numpy() * decay / weight
+    std = np.sqrt(np.clip(second - rate ** 2, 0, None))
+    return pd.DataFrame({'demand_rate': rate, 'demand_std': std, 'history_days': history},
+                        index=pd.Index(states['product_id'].to_numpy(), name='product_id'))
+
+
+def apply_forecasts(df, forecasts, min_history=None):
+    """
+    Inventory frame with forecasted_demand, safety_stock_level and
+    annual_demand replaced by values derived from `forecasts` for products
+    with at least `min_history` days of sales; the rest keep their typed-in
+    values. Also adds demand_rate, demand_std and reorder_point (NaN when
+    not forecast).
+
+      safety_stock_level = ceil(z * std * sqrt(lead_time))
+      reorder_point      = ceil(rate * lead_time) + safety_stock_level
+      forecasted_demand  = reorder_point
+      annual_demand      = round(rate * 365)
+    """
+    if min_history is None:
+        min_history = int(os.getenv('FORECAST_MIN_HISTORY_DAYS', DEFAULT_MIN_HISTORY_DAYS))
+    aligned = forecasts.reindex(df['product_id'].to_numpy())
+    rate = aligned['demand_rate'].to_numpy()
+    std = aligned['demand_std'].to_numpy()
+    use = (aligned['history_days'].to_numpy() >= min_history)
+
+    lead_time = np.ones(len(df))
+    if 'lead_time_days' in df:
+        lead_time = np.clip(np.nan_to_num(pd.to_numeric(df['lead_time_days'], errors='coerce').to_numpy(
+            dtype='float64'), nan=1), 1, None)
+    with np.errstate(invalid='ignore'):
+        safety = np.ceil(service_factor() * std * np.sqrt(lead_time))
+        reorder_point = np.ceil(rate * lead_time) + safety
+        annual = np.rint(rate * 365)
+
+    df = df.copy()
+    for name, values in (('safety_stock_level', safety), ('forecasted_demand', reorder_point),
+                         ('annual_demand', annual)):
+        if name in df:
+            current = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype='float64')
+            merged = np.where(use, values, current)
+            # Keep integer columns integer unless the typed-in data already had gaps
+            df[name] = merged if np.isnan(merged).any() else merged.astype('int64')
+    df['demand_rate'] = np.where(use, rate, np.nan)
+    df['demand_std'] = np.where(use, std, np.nan)
+    df['reorder_point'] = np.where(use, reorder_point, np.nan)
+    return df
+
+
+# --------------------------
+# Batch rebuild
+# --------------------------
+
+def fold_daily(daily, as_of, alpha):
+    """
+    Forecast state from daily totals (user_id, product_id, sale_date, units)
+    as of the ordinal day `as_of`. Partial results of chunks combine with
+    combine_states().
+    """
+    # Ordinal day numbers without a per-row Python call
+    # (DATE columns arrive as datetime.date objects or ISO strings depending on the driver)
+    day = daily['sale_date'].to_numpy().astype('datetime64[D]').astype('int64') + EPOCH_ORDINAL
+    units = pd.to_numeric(daily['units'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    weighted = alpha * (1 - alpha) ** (as_of - day) * units
+
+    # One integer key per (user_id, product_id): factorize + bincount is far
+    # cheaper than a two-column groupby over millions of daily rows
+    user_ids = daily['user_id'].to_numpy(dtype='int64')
+    product_ids = daily['product_id'].to_numpy(dtype='int64')
+    codes, keys = pd.factorize((user_ids << 32) | product_ids)
+    first_day = np.full(len(keys), np.iinfo('int64').max)
+    np.minimum.at(first_day, codes, day)
+    return pd.DataFrame({
+        'user_id': keys >> 32,
+        'product_id': keys & 0xFFFFFFFF,
+        'ew_level': np.bincount(codes, weights=weighted, minlength=len(keys)),
+        'ew_square': np.bincount(codes, weights=weighted * units, minlength=len(keys)),
+        'last_day_units': np.bincount(codes, weights=np.where(day == as_of, units, 0), minlength=len(keys)),
+        'first_day': first_day,
+    })
+
+
+def combine_states(partials):
+    """Merges fold_daily() results of chunks that may share products"""
+    if len(partials) == 1:
+        return partials[0]
+    frame = pd.concat(partials, ignore_index=True)
+    return frame.groupby(['user_id', 'product_id'], as_index=False).agg(
+        ew_level=('ew_level', 'sum'), ew_square=('ew_square', 'sum'),
+        last_day_units=('last_day_units', 'sum'), first_day=('first_day', 'min'))
+
+
+def rebuild(engine, user_id=None, chunksize=500000, today=None):
+    """
+    Recomputes forecast state from sales_history for one tenant or for
+    everyone. Daily totals are aggregated in SQL and streamed in chunks, so
+    memory is bounded by the number of products.
+    """
+    with engine.begin() as conn:
+        return rebuild_in(conn, user_id=user_id, chunksize=chunksize, today=today)
+
+
+def rebuild_in(conn, user_id=None, chunksize=500000, today=None):
+    """rebuild() inside an existing transaction (used by the migrations)"""
+    today = today or date.today()
+    alpha = smoothing()
+    tenant = "AND user_id = :uid" if user_id is not None else ""
+    params = {"uid": user_id} if user_id is not None else {}
+    # Archived months are older than any forecast span, so they are not read
+    hot = f"AND {archive.hot_condition()}" if archive.catalog_exists(conn) else ""
+    query = text(f"""
+        SELECT user_id, product_id, sale_date, SUM(quantity_sold) AS units
+        FROM sales_history s
+        WHERE type = 'sale' AND product_id IS NOT NULL AND sale_date <= :today {tenant} {hot}
+        GROUP BY user_id, product_id, sale_date
+    """)
+
+    chunks = pd.read_sql(query, conn, params={**params, "today": today}, chunksize=chunksize)
+    partials = [fold_daily(chunk, today.toordinal(), alpha) for chunk in chunks]
+    states = combine_states(partials) if partials else None
+
+    where = "WHERE user_id = :uid" if user_id is not None else ""
+    conn.execute(text(f"DELETE FROM demand_forecasts {where}"), params)
+    if states is None or states.empty:
+        return 0
+    rows = [
+        {"uid": int(row.user_id), "pid": int(row.product_id), "level": float(row.ew_level),
+         "square": float(row.ew_square), "units": int(row.last_day_units),
+         "first": date.fromordinal(int(row.first_day)), "as_of": today}
+        for row in states.itertuples(index=False)
+    ]
+    conn.execute(text("""
+        INSERT INTO demand_forecasts
+        (user_id, product_id, ew_level, ew_square, last_day_units, first_sale_date, as_of_date)
+        VALUES (:uid, :pid, :level, :square, :units, :first, :as_of)
+    """), rows)
+    return len(rows)
+
+
+def main():
+    from scripts.db_connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the demand_forecasts table")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_cmd = sub.add_parser('rebuild', help="Recompute forecasts from sales_history")
+    rebuild_cmd.add_argument('--user-id', type=int, default=None, help="Only rebuild this tenant")
+    rebuild_cmd.add_argument('--chunksize', type=int, default=500000)
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        count = rebuild(get_engine(), user_id=args.user_id, chunksize=args.chunksize)
+        print(f"--- Forecasts rebuilt: {count} products ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+from datetime import date
+from functools import wraps
+from dotenv import load_dotenv
+from flask import make_response, request, session
+from scripts.cache import SQLiteVersionStore, get_cache
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is used when brotli is not installed
+    brotli = None
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Conditional GET for the read APIs.  The ETag of a response is derived from
+# the tenant's data versions (bumped by every write through the read cache's
+# invalidate()), so an unchanged tenant is answered with 304 before any SQL
+# or pandas work.  Versions must be shared between workers for that to be
+# safe, hence ETags default to on only with CACHE_SHARED_PATH.
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# JSON, and the Arrow IPC stream of ?format=arrow (its string columns compress well)
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/vnd.apache.arrow.stream')
+
+
+def etags_enabled():
+    setting = os.getenv('ETAG_ENABLED', 'auto').strip().lower()
+    if setting == 'auto':
+        return isinstance(get_cache().versions, SQLiteVersionStore)
+    return setting in ('1', 'true', 'yes', 'on')
+
+
+def data_etag(user_id, kinds, daily=False, full_path=None):
+    """Weak validator for this URL over the tenant's current data versions"""
+    versions = get_cache().versions
+    parts = [full_path if full_path is not None else request.full_path, user_id] + [f"{kind}={versions.get_version(user_id, kind)}" for kind in kinds]
+    if daily:
+        # Reports relative to today (days to expiry, last N days) change at midnight
+        parts.append(date.today().isoformat())
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()[:24]
+
+
+def conditional_get(*kinds, daily=False):
+    """
+    Decorates a read route: 304 when If-None-Match still matches the
+    tenant's data versions for `kinds`, otherwise the view's response tagged
+    with the new ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = session.get('user_id')
+            if not user_id or not etags_enabled():
+                return view(*args, **kwargs)
+
+            # Read the versions before the data so a concurrent write can only
+            # make the tag older than the body, never newer
+            etag = data_etag(user_id, kinds, daily)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Browsers keep the body but revalidate on every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response):
+    """after_request hook: brotli or gzip for large, non-streamed JSON and Arrow bodies"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body, encoding = compress_body(body, request.accept_encodings)
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def compress_body(body, accepted):
+    """(body, encoding) for a parsed Accept-Encoding; encoding is None when left as is"""
+    if brotli is not None and accepted['br']:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if accepted['gzip']:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
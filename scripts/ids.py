@@ -0,0 +1,83 @@
+import os
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Load the variables from the .env file
+load_dotenv()
+
+# ID allocation from id_sequences (migration 0009).  Each worker reserves a
+# block of IDs with one short UPDATE and hands them out from memory, so a
+# signup never probes for a free ID and the sequence row is locked once per
+# block rather than once per user.  IDs of a block a worker never used are
+# skipped, so IDs are unique and increasing per worker but not gapless.
+
+DEFAULT_BLOCK_SIZE = 100
+
+
+def reserve_block(conn, name, size):
+    """Moves the sequence on by `size`; returns the first ID of the reserved block"""
+    result = conn.execute(text("UPDATE id_sequences SET next_value = next_value + :size WHERE name = :name"),
+                          {"size": size, "name": name})
+    if result.rowcount != 1:
+        raise LookupError(f"No id sequence named {name!r}; run the migrations")
+    # The UPDATE holds the row until commit, so this reads our own value
+    end = conn.execute(text("SELECT next_value FROM id_sequences WHERE name = :name"), {"name": name}).scalar()
+    return end - size
+
+
+def advance_past(conn, name, value):
+    """Makes sure the sequence never hands out `value` or anything below it (e.g. after a bulk load)"""
+    conn.execute(text("UPDATE id_sequences SET next_value = :next WHERE name = :name AND next_value <= :value"),
+                 {"next": value + 1, "name": name, "value": value})
+
+
+class IdAllocator:
+    def __init__(self, engine, name, block_size=DEFAULT_BLOCK_SIZE):
+        self.engine = engine
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            if self._next >= self._end:
+                # Its own short transaction: never part of the caller's
+                with self.engine.begin() as conn:
+                    self._next = reserve_block(conn, self.name, self.block_size)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(name, engine=None):
+    """Process-wide allocator for one sequence (USER_ID_BLOCK_SIZE IDs reserved at a time)"""
+    allocator = _allocators.get(name)
+    if allocator is None:
+        with _allocators_lock:
+            allocator = _allocators.get(name)
+            if allocator is None:
+                if engine is None:
+                    from scripts.db_connection import get_engine
+                    engine = get_engine()
+                block_size = int(os.getenv('USER_ID_BLOCK_SIZE', DEFAULT_BLOCK_SIZE))
+                allocator = _allocators[name] = IdAllocator(engine, name, block_size)
+    return allocator
+
+
+def _reset_after_fork():
+    # A forked worker must reserve its own blocks, not share its parent's
+    global _allocators, _allocators_lock
+    _allocators_lock = threading.Lock()
+    _allocators = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,86 +1,301 @@
+import json
+import logging
+import numpy as np
 import pandas as pd
-import math
-from datetime import datetime, timedelta
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-# Load the variables from the .env file
-load_dotenv()
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, text
+from scripts.db_connection import get_engine
+from scripts.cache import INVENTORY, SALES, get_cache, get_price_cache
+from scripts.changes import get_change_feed
+from scripts.expiry import EXPIRY_RISK_COLUMNS, build_tiers, expiry_window_end, get_expiry_index, parse_tier_days
+from scripts.lookup import LOOKUP_COLUMNS, get_product_index, lookup_record
+from scripts.forecasting import apply_forecasts, forecast_frame, forecasting_enabled
+from scripts.reports import REPORT_KINDS, reports_enabled
+from scripts import archive, bulk, forecasting, reports, rollups
+from scripts.metrics import stage
+from scripts.recommendations import (
+    CRITICAL, WARNING, STATUS_LABELS, build_recommendations, compute_eoq, needs_reorder
+)
+
+logger = logging.getLogger(__name__)
+
+# Sections served by /api/dashboard; the first five make up the overview tab
+DASHBOARD_SECTIONS = ('inventory', 'advice', 'fast_moving', 'slow_moving', 'expiry_alerts', 'purchase_order')
+
+# Inventory columns and the compact dtype each one is loaded as.  Money stays
+# float64: DECIMAL(10,2) needs ten significant digits and float32 only has seven.
+INVENTORY_DTYPES = {
+    'product_id': 'int32',
+    'product_name': 'category',
+    'current_stock': 'int32',
+    'safety_stock_level': 'int32',
+    'forecasted_demand': 'int32',
+    'lead_time_days': 'int32',
+    'annual_demand': 'int32',
+    'order_cost_fixed': 'float64',
+    'holding_cost_per_unit': 'float64',
+    'expiry_date': 'datetime64',
+    'user_id': 'int32',
+}
+
+# Projections used by the agent's own reports
+RECOMMENDATION_COLUMNS = ('product_id', 'product_name', 'current_stock', 'safety_stock_level',
+                          'forecasted_demand', 'lead_time_days', 'annual_demand', 'order_cost_fixed',
+                          'holding_cost_per_unit')
+
+# Cache variant of the SALES kind holding the tenant's demand forecast state
+FORECAST_STATES = 'forecast_states'
+
+# Bulk ingestion limits
+MAX_BULK_ITEMS = 5000
+BULK_UPDATE_CHUNK = 500
+
+def _typed_column(dtype, values):
+    """One column of DBAPI values as a numpy/pandas array of `dtype`"""
+    count = len(values)
+    if dtype == 'int32':
+        try:
+            return np.fromiter(values, dtype='int32', count=count)
+        except TypeError:
+            # NULLs present: fall back to float so they stay NaN, as before
+            return np.fromiter((np.nan if v is None else v for v in values), dtype='float64', count=count)
+    if dtype == 'float64':
+        return np.fromiter((np.nan if v is None else v for v in values), dtype='float64', count=count)
+    if dtype == 'category':
+        return pd.Categorical(values)
+    return pd.to_datetime(list(values)).to_numpy()
+
+
+def inventory_records(df):
+    """DataFrame rows as JSON-ready dicts; missing dates become null instead of NaT"""
+    missing_dates = [name for name in df.columns
+                     if pd.api.types.is_datetime64_any_dtype(df[name]) and df[name].hasnans]
+    if missing_dates:
+        df = df.astype({name: object for name in missing_dates})
+        for name in missing_dates:
+            df[name] = df[name].where(df[name].notna(), None)
+    return df.to_dict(orient='records')
+
+
+def merge_dashboard(sections, stored, built):
+    """Dashboard payload in section order from stored report JSON and freshly built sections"""
+    return {name: json.loads(stored[name]) if name in stored else built[name] for name in sections}
+
+
+class InsufficientStockError(ValueError):
+    """A decrease asked for more units than are in stock"""
+
 
 class InventoryAgent:
-    def __init__(self, user_id):
+    def __init__(self, user_id, engine=None, cache=None, changes=None):
+        """Lightweight per-user view; all agents share the process-wide pool, cache and change feed"""
         self.user_id = user_id
-        
-        # Fetch DB credentials from .env
-        db_host = os.getenv('DB_HOST')
-        db_user = os.getenv('DB_USER')
-        db_password = os.getenv('DB_PASSWORD')
-        db_name = os.getenv('DB_NAME')
-        
-        print("HOST:", db_host)
-        print("USER:", db_user)
-        print("PASSWORD:", db_password)
-        print("DB:", db_name)
-
-        # Create SQLAlchemy Engine (The bridge to your AWS RDS)
-        connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}"
-        self.engine = create_engine(connection_string)
-
-    def fetch_compressed_data(self):
-        """Simulates fetching compressed data into a Dataframe for fast processing"""
-        query = text("SELECT * FROM inventory WHERE user_id = :user_id")
-        df = pd.read_sql(query, self.engine, params={"user_id": self.user_id})
-        
-        # Calculate MRP (selling price) with 50% profit margin
-        df['mrp'] = df['order_cost_fixed'].fillna(0) * 1.5
+        self.engine = engine if engine is not None else get_engine()
+        self.cache = cache if cache is not None else get_cache()
+        self.changes = changes if changes is not None else get_change_feed()
+        self.expiry_index = get_expiry_index()
+        self.prices = get_price_cache()
+        self.products = get_product_index()
+
+    def fetch_compressed_data(self, columns=None):
+        """
+        Inventory as a compact DataFrame holding only `columns` (default: all).
+        Stock counts are int32, names categorical and costs float64.
+        """
+        columns = self._inventory_columns(columns)
+        return self.cache.get_or_load(self.user_id, INVENTORY, lambda: self._load_inventory(columns),
+                                      variant=columns)
+
+    @staticmethod
+    def _inventory_columns(columns):
+        if columns is None:
+            return tuple(INVENTORY_DTYPES) + ('mrp',)
+        unknown = [name for name in columns if name not in INVENTORY_DTYPES and name != 'mrp']
+        if unknown:
+            raise ValueError(f"Unknown inventory column(s): {', '.join(unknown)}")
+        # Keep table order so every projection of the same columns shares a cache entry
+        return tuple(name for name in tuple(INVENTORY_DTYPES) + ('mrp',) if name in columns)
+
+    def _inventory_query(self, columns, product_ids=None):
+        """(query, params, selected) for a projected read of this tenant's inventory"""
+        selected = [name for name in INVENTORY_DTYPES
+                    if name in columns or (name == 'order_cost_fixed' and 'mrp' in columns)]
+        sql = f"SELECT {', '.join(selected)} FROM inventory WHERE user_id = :user_id AND deleted_at IS NULL"
+        params = {"user_id": self.user_id}
+        if product_ids is not None:
+            sql += " AND product_id IN :ids"
+            params["ids"] = list(product_ids)
+        # Catalog order, served by ix_inventory_user_product; without it the
+        # planner may pick another index and reorder every report
+        sql += " ORDER BY product_id"
+        query = text(sql)
+        if product_ids is not None:
+            query = query.bindparams(bindparam('ids', expanding=True))
+        return query, params, selected
+
+    @staticmethod
+    def _inventory_frame(columns, selected, rows):
+        """Typed DataFrame of `columns` from the rows of an _inventory_query()"""
+        # Build each column straight from the DBAPI tuples in its final
+        # dtype instead of materialising a default-typed frame first
+        values = list(zip(*rows)) if rows else [()] * len(selected)
+        data = {name: _typed_column(INVENTORY_DTYPES[name], column) for name, column in zip(selected, values)}
+
+        if 'mrp' in columns:
+            # Calculate MRP (selling price) with 50% profit margin
+            data['mrp'] = np.nan_to_num(data['order_cost_fixed']) * 1.5
+        return pd.DataFrame({name: data[name] for name in columns}, copy=False)
+
+    def _load_inventory(self, columns, product_ids=None):
+        with stage('load_inventory') as st:
+            query, params, selected = self._inventory_query(columns, product_ids)
+            with self.engine.connect() as conn:
+                rows = conn.execute(query, params).fetchall()
+            df = self._inventory_frame(columns, selected, rows)
+            st.rows = len(df)
         return df
 
     def fetch_sales_data(self):
         """Fetch sales history data"""
-        query = text("SELECT * FROM sales_history WHERE user_id = :user_id")
-        df = pd.read_sql(query, self.engine, params={"user_id": self.user_id})
+        return self.cache.get_or_load(self.user_id, SALES, self._load_sales)
+
+    def _load_sales(self):
+        with stage('load_sales') as st:
+            query = text(f"""
+                SELECT {', '.join(f's.{name}' for name in archive.SEGMENT_COLUMNS)}
+                FROM sales_history s
+                LEFT JOIN inventory i ON i.product_id = s.product_id AND i.user_id = s.user_id
+                WHERE s.user_id = :user_id AND i.deleted_at IS NULL AND {archive.hot_condition()}
+            """)
+            with self.engine.connect() as conn:
+                df = pd.read_sql(query, conn, params={"user_id": self.user_id})
+                segments = archive.tenant_segments(conn, self.user_id)
+                deleted = self._deleted_product_ids(conn) if segments else ()
+            if segments:
+                older = archive.read_segments(reversed(segments), self.user_id, exclude_products=deleted)
+                df = pd.concat([*older, df], ignore_index=True)
+                df['sale_date'] = pd.to_datetime(df['sale_date'])
+            st.rows = len(df)
         return df
 
+    def _deleted_product_ids(self, conn):
+        """Products deleted but not purged yet; their archived rows are hidden"""
+        rows = conn.execute(text("SELECT product_id FROM inventory WHERE user_id = :uid AND deleted_at IS NOT NULL"),
+                            {"uid": self.user_id})
+        return {row[0] for row in rows}
+
+    def fetch_forecasts(self, product_ids=None):
+        """
+        Demand rate and variability per product as of today (see
+        scripts/forecasting.py), or None when FORECAST_ENABLED is off.
+        """
+        if not forecasting_enabled():
+            return None
+        if product_ids is not None:
+            states = self._load_forecast_states(product_ids)
+        else:
+            states = self.cache.get_or_load(self.user_id, SALES, self._load_forecast_states,
+                                            variant=FORECAST_STATES)
+        return forecast_frame(states)
+
+    def _load_forecast_states(self, product_ids=None):
+        with stage('load_forecasts') as st:
+            with self.engine.connect() as conn:
+                states = forecasting.load_states(conn, self.user_id, product_ids)
+            st.rows = len(states)
+        return states
+
+    def get_recommendations(self, df=None, forecasts=None):
+        """
+        Status, reorder quantities, EOQ and priority for the whole catalog.
+        Forecast demand, safety stock and annual demand replace the typed-in
+        values for products with enough sales history.
+        """
+        if df is None:
+            df = self.fetch_compressed_data(RECOMMENDATION_COLUMNS)
+        if forecasts is None:
+            forecasts = self.fetch_forecasts()
+        with stage('recommendations') as st:
+            st.rows = len(df)
+            if forecasts is not None:
+                df = apply_forecasts(df, forecasts)
+            return build_recommendations(df)
+
+    def get_forecasts(self):
+        """Per-product forecast next to the typed-in planning values it overrides"""
+        df = self.fetch_compressed_data(('product_id', 'product_name', 'current_stock', 'safety_stock_level',
+                                         'forecasted_demand', 'lead_time_days', 'annual_demand'))
+        forecasts = self.fetch_forecasts()
+        if forecasts is None:
+            return []
+        with stage('forecasts') as st:
+            st.rows = len(df)
+            planned = apply_forecasts(df, forecasts)
+            planned = planned[planned['demand_rate'].notna()]
+            result = pd.DataFrame({
+                'product_id': planned['product_id'],
+                'product_name': planned['product_name'],
+                'current_stock': planned['current_stock'],
+                'demand_rate': planned['demand_rate'].round(3),
+                'demand_std': planned['demand_std'].round(3),
+                'lead_time_days': planned['lead_time_days'],
+                'safety_stock': planned['safety_stock_level'],
+                'reorder_point': planned['reorder_point'].astype('int64'),
+                'annual_demand': planned['annual_demand'],
+                'manual_safety_stock': df.loc[planned.index, 'safety_stock_level'],
+                'manual_forecasted_demand': df.loc[planned.index, 'forecasted_demand'],
+            })
+        return inventory_records(result)
+
     def optimize_stock(self):
         """The 'Reasoning' step where the agent makes decisions"""
-        df = self.fetch_compressed_data()
+        recs = self.get_recommendations()
 
         print("\n--- AGENT STOCK OPTIMIZATION REPORT ---")
-        for index, row in df.iterrows():
-            status = "✅ OPTIMAL"
+        for row in recs.itertuples(index=False):
             action = "No action needed."
-            ideal_qty = self.calculate_eoq(
-                    row['annual_demand'],
-                    row['order_cost_fixed'],
-                    row['holding_cost_per_unit']
-                )
-
-            if row['current_stock'] <= row['safety_stock_level']:
-                status = "❌ CRITICAL LOW"
-                reorder_qty = row['forecasted_demand'] - row['current_stock']
-                min_req = row['safety_stock_level'] - row['current_stock']
-                action = f"ORDER {reorder_qty} units IMMEDIATELY.\nMINIMUM ORDER:{min_req}"
-
-            elif row['current_stock'] < row['forecasted_demand']:
-                status = "🟡 WARNING"
-                reorder_qty = row['forecasted_demand'] - row['current_stock']
-                action = f"ORDER {reorder_qty} units for Prepare purchase order for next week."
-
-            print(f"Product: {row['product_name']}")
-            print(f"Status: {status}")
+            if row.status == CRITICAL:
+                action = f"ORDER {row.reorder_qty} units IMMEDIATELY.\nMINIMUM ORDER:{row.min_req}"
+            elif row.status == WARNING:
+                action = f"ORDER {row.reorder_qty} units for Prepare purchase order for next week."
+
+            print(f"Product: {row.product_name}")
+            print(f"Status: {STATUS_LABELS[row.status]}")
             print(f"Agent Recommendation: {action}")
-            print(f"EOQ:IDEAL QUANTITY: {ideal_qty}")
+            print(f"EOQ:IDEAL QUANTITY: {row.eoq}")
             print("-" * 40)
 
+    def get_advice(self, df=None, forecasts=None):
+        """Dashboard reorder advice for CRITICAL and WARNING items"""
+        recs = needs_reorder(self.get_recommendations(df, forecasts))
+        if recs.empty:
+            return []
+
+        critical = recs['status'] == CRITICAL
+        reorder = recs['reorder_qty'].astype(str)
+        eoq = recs['eoq'].astype(str)
+
+        critical_text = ("   " + STATUS_LABELS[CRITICAL] + ":   ORDER " + reorder
+                         + " units IMMEDIATELY._______MINIMUM ORDER:" + recs['min_req'].astype(str)
+                         + ":________ideal EOQ:" + eoq)
+        warning_text = ("   " + STATUS_LABELS[WARNING] + ":   ORDER " + reorder
+                        + " units for Prepare purchase order for next week.:_________ideal EOQ:" + eoq)
+
+        advice = pd.DataFrame({
+            'product_id': recs['product_id'],
+            'product': recs['product_name'],
+            'current': recs['current_stock'].astype('int64'),
+            'recommendation': critical_text.where(critical, warning_text),
+        })
+        return advice.to_dict('records')
+
     def calculate_eoq(self, annual_demand, order_cost, holding_cost):
-        """Standard EOQ formula implementation"""
-        if holding_cost == 0: return 0
-        eoq = math.sqrt((2 * annual_demand * order_cost) / holding_cost)
-        return round(eoq)
+        """Standard EOQ formula implementation (accepts scalars or arrays)"""
+        eoq = compute_eoq(annual_demand, order_cost, holding_cost)
+        return int(eoq) if eoq.ndim == 0 else eoq
 
     def update_stock(self, product_id, quantity_change, total_cost=0):
         """Edits the current stock in MySQL."""
-        print("update stock")
         if quantity_change is None:
             raise ValueError("Quantity change is required")
         if product_id is None:
@@ -88,25 +303,20 @@ class InventoryAgent:
         
         # engine.begin() auto-commits the transaction
         with self.engine.begin() as conn:
-            # Check if product exists
-            check_sql = text("SELECT COUNT(*) FROM inventory WHERE product_id = :pid")
-            count = conn.execute(check_sql, {"pid": product_id}).scalar()
-            
-            if count == 0:
-                raise ValueError("Product not found")
-
-            # Update the specific product
-            update_sql = text("UPDATE inventory SET current_stock = current_stock + :qc WHERE product_id = :pid")
-            conn.execute(update_sql, {"qc": quantity_change, "pid": product_id})
+            # One conditional UPDATE scoped to this user; no row changed means
+            # the product is not theirs or (for a decrease) not enough stock
+            if not self._change_stock(conn, product_id, quantity_change):
+                available = self._stock_level(conn, product_id)
+                if available is None:
+                    raise ValueError("Product not found")
+                raise InsufficientStockError(f"Insufficient stock: {available} available")
             
             # If adding stock (purchase), record in history
             if quantity_change > 0:
-                prod_sql = text("SELECT order_cost_fixed FROM inventory WHERE product_id = :pid")
-                cost_per_unit = conn.execute(prod_sql, {"pid": product_id}).scalar()
-                
                 if total_cost > 0:
                     revenue = -total_cost
                 else:
+                    cost_per_unit = self._lookup_products(conn, {product_id})[product_id]
                     revenue = - (quantity_change * cost_per_unit)  # Negative for purchase
                 profit = 0  # No profit on purchase
                 
@@ -115,188 +325,664 @@ class InventoryAgent:
                     (product_id, user_id, sale_date, quantity_sold, revenue, profit, type) 
                     VALUES (:pid, :uid, :sdate, :qs, :rev, :prof, :type)
                 """)
+                sale_date = datetime.now().date()
                 conn.execute(history_sql, {
                     "pid": product_id,
                     "uid": self.user_id,
-                    "sdate": datetime.now().date(),
+                    "sdate": sale_date,
                     "qs": quantity_change,
                     "rev": revenue,
                     "prof": profit,
                     "type": 'purchase'
                 })
+                rollups.record_transaction(conn, self.user_id, sale_date, 'purchase', revenue)
+
+        # Purchases also add a sales_history row
+        self.cache.invalidate(self.user_id, (INVENTORY, SALES) if quantity_change > 0 else (INVENTORY,))
+        self._after_write([product_id])
+        logger.info("stock updated", extra={'user_id': self.user_id, 'product_id': product_id,
+                                            'quantity_change': quantity_change})
 
-        print(f"--- Stock Updated: Product {product_id} changed by {quantity_change} ---")
+    def _change_stock(self, conn, product_id, change):
+        """
+        Atomic stock change: a decrease only applies while enough stock is
+        left, so the check and the write are one statement and concurrent
+        sellers can never take the stock below zero. True if applied.
+        """
+        guard = "AND current_stock >= :needed" if change < 0 else ""
+        result = conn.execute(text(f"""
+            UPDATE inventory SET current_stock = current_stock + :change
+            WHERE user_id = :uid AND product_id = :pid AND deleted_at IS NULL {guard}
+        """), {"change": change, "needed": -change, "uid": self.user_id, "pid": product_id})
+        return result.rowcount == 1
+
+    def _stock_level(self, conn, product_id):
+        """Current stock of a product after a failed _change_stock(), or None if it does not exist"""
+        row = conn.execute(text("""
+            SELECT current_stock FROM inventory WHERE user_id = :uid AND product_id = :pid AND deleted_at IS NULL
+        """), {"uid": self.user_id, "pid": product_id}).fetchone()
+        if row is None:
+            # Deleted through another worker: drop its cached price too
+            self.prices.evict(self.user_id, [product_id])
+            return None
+        return row[0] or 0
 
     def get_sales_summary(self, period='monthly'):
-        """Advanced financial summary"""
-        sales_df = self.fetch_sales_data()
-
-        if sales_df.empty:
-            return {
-                'gross_revenue': {}, 'order_cost': {}, 'total_profit': {},
-                'margin_of_revenue': {}, 'net_profit': {}
-            }
-
-        sales_df['sale_date'] = pd.to_datetime(sales_df['sale_date'])
-
-        # Create period column
-        if period == 'daily':
-            sales_df['period'] = sales_df['sale_date'].dt.date
-        elif period == 'weekly':
-            sales_df['period'] = sales_df['sale_date'].dt.strftime('%Y-%U')
-        else:
-            sales_df['period'] = sales_df['sale_date'].dt.strftime('%Y-%m')
-
-        results = {}
-
-        for period_key, group in sales_df.groupby('period'):
-            # Sales only
-            sales_only = group[group['type'] == 'sale']
-            gross_revenue = sales_only['revenue'].sum()
-            total_profit = sales_only['profit'].sum()
-
-            # Purchase only
-            purchase_only = group[group['type'] == 'purchase']
-            order_cost = abs(purchase_only['revenue'].sum())
-
-            margin_of_revenue = gross_revenue - order_cost
-            net_profit = gross_revenue - order_cost + total_profit
-
-            results[period_key] = {
-                'gross_revenue': gross_revenue,
-                'order_cost': order_cost,
-                'total_profit': total_profit,
-                'margin_of_revenue': margin_of_revenue,
-                'net_profit': net_profit
-            }
-
-        # Convert to structured dict
-        final = {
-            'gross_revenue': {}, 'order_cost': {}, 'total_profit': {},
-            'margin_of_revenue': {}, 'net_profit': {}
-        }
+        """Advanced financial summary, read from the materialized rollups"""
+        with self.engine.connect() as conn:
+            return rollups.read_summary(conn, self.user_id, period)
 
-        for key, value in results.items():
-            for metric in final.keys():
-                final[metric][str(key)] = float(value[metric])
+    @staticmethod
+    def _moving_window(days):
+        """First sale_date of a `days` window (None: all time)"""
+        return None if days is None else datetime.now().date() - timedelta(days=int(days))
 
-        return final
+    def _moving_items_query(self, order, days=None, limit=None, threshold=None, archived=False):
+        """
+        (query, params) for per-product SUM(quantity_sold) grouped, filtered and limited in SQL.
+        With `archived` (the window reaches archive segments) it returns every
+        product's hot totals and row counts instead, for _combine_moving_items().
+        """
+        params = {"uid": self.user_id}
+        window = ""
+        if days is not None:
+            window = "AND s.sale_date >= :since"
+            params["since"] = self._moving_window(days)
+        if archived:
+            query = text(f"""
+                SELECT i.product_id, COALESCE(SUM(s.quantity_sold), 0) AS quantity_sold, i.product_name,
+                       COUNT(s.id) AS sales_rows
+                FROM inventory i
+                LEFT JOIN sales_history s ON s.product_id = i.product_id AND s.user_id = i.user_id
+                    {window} AND {archive.hot_condition()}
+                WHERE i.user_id = :uid AND i.deleted_at IS NULL
+                GROUP BY i.product_id, i.product_name
+            """)
+            return query, params
 
-    def get_fast_moving_items(self, top_n=5):
-        """Identify fast-moving items based on sales quantity"""
-        sales_df = self.fetch_sales_data()
-        inventory_df = self.fetch_compressed_data()
+        having = ""
+        if threshold is not None:
+            having = "HAVING SUM(s.quantity_sold) <= :threshold"
+            params["threshold"] = threshold
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT :limit"
+            params["limit"] = int(limit)
 
-        if sales_df.empty:
-            return []
+        query = text(f"""
+            SELECT s.product_id, SUM(s.quantity_sold) AS quantity_sold, i.product_name
+            FROM sales_history s
+            JOIN inventory i ON i.product_id = s.product_id AND i.user_id = s.user_id AND i.deleted_at IS NULL
+            WHERE s.user_id = :uid {window} AND {archive.hot_condition()}
+            GROUP BY s.product_id, i.product_name
+            {having}
+            ORDER BY quantity_sold {order}, s.product_id
+            {limit_sql}
+        """)
+        return query, params
 
-        product_sales = sales_df.groupby('product_id')['quantity_sold'].sum().reset_index()
-        product_sales = product_sales.merge(inventory_df[['product_id', 'product_name']], on='product_id')
-        product_sales = product_sales.sort_values('quantity_sold', ascending=False).head(top_n)
+    def _archived_item_totals(self, segments, days=None):
+        """Per-product quantity_sold and sales_rows of the archived rows in a `days` window"""
+        frames = [frame.groupby('product_id')['quantity_sold'].agg(quantity_sold='sum', sales_rows='size')
+                  for frame in archive.read_segments(segments, self.user_id, columns=('product_id', 'quantity_sold'),
+                                                     start_date=self._moving_window(days))]
+        return pd.concat(frames).groupby(level=0).sum()
 
-        return product_sales.to_dict('records')
+    @staticmethod
+    def _combine_moving_items(df, archived, order, limit=None, threshold=None):
+        """Adds archived totals to an `archived` moving-items query, then filters, sorts and limits like the SQL"""
+        df = df.set_index('product_id')
+        totals = archived.reindex(df.index, fill_value=0)
+        df['quantity_sold'] = pd.to_numeric(df['quantity_sold']).fillna(0) + totals['quantity_sold']
+        # Only products with at least one sale in the window, as with the inner join
+        df = df[pd.to_numeric(df['sales_rows']) + totals['sales_rows'] > 0].reset_index()
+        if threshold is not None:
+            df = df[df['quantity_sold'] <= threshold]
+        df = df.sort_values(['quantity_sold', 'product_id'], ascending=[order == 'ASC', True])
+        if limit is not None:
+            df = df.head(int(limit))
+        return df[['product_id', 'quantity_sold', 'product_name']].reset_index(drop=True)
 
-    def get_slow_moving_items(self, threshold=10):
-        """Identify slow-moving items based on low sales"""
-        sales_df = self.fetch_sales_data()
-        inventory_df = self.fetch_compressed_data()
+    @staticmethod
+    def _moving_items_records(df):
+        # MySQL returns SUM() as DECIMAL
+        df['quantity_sold'] = df['quantity_sold'].fillna(0).astype('int64')
+        return df.to_dict('records')
 
-        if sales_df.empty:
-            return []
+    def _moving_items(self, order, days=None, limit=None, threshold=None):
+        with stage('moving_items') as st:
+            with self.engine.connect() as conn:
+                segments = archive.tenant_segments(conn, self.user_id, start_date=self._moving_window(days))
+                query, params = self._moving_items_query(order, days, limit, threshold, archived=bool(segments))
+                df = pd.read_sql(query, conn, params=params)
+            st.rows = len(df)
+            if segments:
+                df = self._combine_moving_items(df, self._archived_item_totals(segments, days), order, limit, threshold)
+            return self._moving_items_records(df)
+
+    def get_fast_moving_items(self, top_n=5, days=None):
+        """Identify fast-moving items based on sales quantity (optionally in the last `days`)"""
+        return self._moving_items('DESC', days=days, limit=top_n)
+
+    def get_slow_moving_items(self, threshold=10, days=None, limit=None):
+        """Identify slow-moving items (total sold <= threshold), slowest first"""
+        return self._moving_items('ASC', days=days, limit=limit, threshold=threshold)
+
+    def _expiring_query(self, until=None):
+        """(query, params) for dated products expiring on or before `until` (None = all)"""
+        params = {"uid": self.user_id}
+        window = "AND expiry_date IS NOT NULL"
+        if until is not None:
+            # Served by ix_inventory_user_expiry (migration 0005)
+            window = "AND expiry_date <= :until"
+            params["until"] = until
+        query = text(f"""
+            SELECT {', '.join(EXPIRY_RISK_COLUMNS)} FROM inventory
+            WHERE user_id = :uid AND deleted_at IS NULL {window}
+            ORDER BY product_id
+        """)
+        return query, params
+
+    def _expiring_rows(self, until):
+        """Products expiring on or before `until`, from the expiry index when enabled"""
+        def load(limit):
+            query, params = self._expiring_query(limit)
+            with self.engine.connect() as conn:
+                rows = conn.execute(query, params).fetchall()
+            return self._inventory_frame(EXPIRY_RISK_COLUMNS, EXPIRY_RISK_COLUMNS, rows)
+
+        with stage('expiring_rows') as st:
+            if self.expiry_index is not None:
+                version = self.cache.versions.get_version(self.user_id, INVENTORY)
+                df = self.expiry_index.lookup(self.user_id, version, until, lambda: load(None))
+            else:
+                df = load(until)
+            st.rows = len(df)
+        return df
 
-        product_sales = sales_df.groupby('product_id')['quantity_sold'].sum().reset_index()
-        slow_moving = product_sales[product_sales['quantity_sold'] <= threshold]
-        slow_moving = slow_moving.merge(inventory_df[['product_id', 'product_name']], on='product_id')
+    @staticmethod
+    def _format_expiry_alerts(df, days_ahead):
+        with stage('expiry_alerts') as st:
+            # Work on a copy so a shared inventory frame keeps its original dates
+            df = df[['product_id', 'product_name', 'current_stock', 'expiry_date']].copy()
+            df['expiry_date'] = pd.to_datetime(df['expiry_date'])
+            today = pd.Timestamp.today()
+            expiry_threshold = today + timedelta(days=days_ahead)
 
-        return slow_moving.to_dict('records')
+            expiring_soon = df[df['expiry_date'] <= expiry_threshold].copy()
+            expiring_soon['days_to_expiry'] = (expiring_soon['expiry_date'] - today).dt.days
+            st.rows = len(df)
 
-    def get_expiry_alerts(self, days_ahead=30):
-        """Get products nearing expiry with product name"""
-        df = self.fetch_compressed_data()
+        return expiring_soon.to_dict('records')
 
-        df['expiry_date'] = pd.to_datetime(df['expiry_date'])
-        today = pd.Timestamp.today()
-        expiry_threshold = today + timedelta(days=days_ahead)
+    def get_expiry_alerts(self, days_ahead=30, df=None):
+        """
+        Products expiring within `days_ahead` days (expired ones included).
+        Without a loaded inventory frame only the expiring rows are read.
+        """
+        if df is None:
+            df = self._expiring_rows(expiry_window_end(days_ahead))
+        return self._format_expiry_alerts(df, days_ahead)
 
-        expiring_soon = df[df['expiry_date'] <= expiry_threshold].copy()
-        expiring_soon['days_to_expiry'] = (expiring_soon['expiry_date'] - today).dt.days
+    def get_expiry_tiers(self, tier_days=None):
+        """Expiring products bucketed into expired / within N days tiers, with stock at risk"""
+        tier_days = parse_tier_days(tier_days)
+        rows = self._expiring_rows(expiry_window_end(tier_days[-1]))
+        with stage('expiry_tiers') as st:
+            st.rows = len(rows)
+            return {'as_of': date.today().isoformat(), 'tiers': build_tiers(rows, tier_days)}
 
-        result = expiring_soon[[
-            'product_id', 'product_name', 'current_stock',
-            'expiry_date', 'days_to_expiry'
-        ]]
+    def lookup_products(self, product_id=None, prefix=None, limit=10):
+        """
+        Products for the sale/stock forms, by id or by name prefix
+        (autocomplete): id, name, cost and MRP only, from the product index.
+        """
+        if product_id is not None:
+            record = self.products.get(self.user_id, product_id, self._load_lookup_records,
+                                       self._fetch_lookup_record)
+            return [record] if record is not None else []
+        if not prefix:
+            raise ValueError("A product id or name prefix is required")
+        return self.products.search(self.user_id, prefix, max(1, min(limit, 100)), self._load_lookup_records)
 
-        return result.to_dict('records')
+    def _load_lookup_records(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT {', '.join(LOOKUP_COLUMNS)} FROM inventory WHERE user_id = :uid AND deleted_at IS NULL
+            """), {"uid": self.user_id})
+            return [lookup_record(*row) for row in rows]
 
-    def generate_purchase_order(self):
+    def _fetch_lookup_record(self, product_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"""
+                SELECT {', '.join(LOOKUP_COLUMNS)} FROM inventory
+                WHERE user_id = :uid AND product_id = :pid AND deleted_at IS NULL
+            """), {"uid": self.user_id, "pid": product_id}).fetchone()
+        return lookup_record(*row) if row is not None else None
+
+    def get_dashboard(self, sections=None):
+        """
+        Builds the requested overview sections from a single inventory read.
+        Fast/slow-moving sections are aggregated in SQL and never load the sales history.
+        """
+        sections, columns = self._dashboard_plan(sections)
+        inventory_df = self.fetch_compressed_data(columns) if columns is None or columns else None
+        forecasts = None
+        if 'advice' in sections or 'purchase_order' in sections:
+            forecasts = self.fetch_forecasts()
+
+        builders = {
+            'inventory': lambda: inventory_records(inventory_df),
+            'advice': lambda: self.get_advice(inventory_df, forecasts),
+            'fast_moving': lambda: self.get_fast_moving_items(),
+            'slow_moving': lambda: self.get_slow_moving_items(),
+            # Reuse a full inventory read; otherwise only the expiring rows are queried
+            'expiry_alerts': lambda: self.get_expiry_alerts(df=inventory_df if columns is None else None),
+            'purchase_order': lambda: self.generate_purchase_order(inventory_df, forecasts),
+        }
+        return {name: builders[name]() for name in sections}
+
+    @staticmethod
+    def _dashboard_plan(sections):
+        """Validated section list and the inventory columns they read (None = all, empty = none)"""
+        sections = list(sections or DASHBOARD_SECTIONS)
+        unknown = [name for name in sections if name not in DASHBOARD_SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown dashboard section(s): {', '.join(unknown)}")
+
+        # Load only the columns the requested sections read
+        columns = None
+        if 'inventory' not in sections:
+            columns = set()
+            if 'advice' in sections or 'purchase_order' in sections:
+                columns.update(RECOMMENDATION_COLUMNS)
+        return sections, columns
+
+    def refresh_reports(self, kinds=REPORT_KINDS, save=True):
+        """Recomputes the precomputed reports (and stores them); returns {kind: (JSON text, computed_at)}"""
+        computed_at = datetime.now().replace(microsecond=0)
+        with stage('reports') as st:
+            payloads = {kind: reports.encode(value) for kind, value in self.get_dashboard(list(kinds)).items()}
+            st.rows = len(payloads)
+        if save:
+            with self.engine.begin() as conn:
+                reports.store(conn, self.user_id, payloads, computed_at)
+        return {kind: (payload, computed_at) for kind, payload in payloads.items()}
+
+    def fresh_reports(self, kinds):
+        """{kind: JSON text} of the stored reports that may be served instead of computing them (reports.fresh)"""
+        if not reports_enabled():
+            return {}
+        with self.engine.connect() as conn:
+            return reports.fresh(conn, self.user_id, kinds)
+
+    def serve_dashboard(self, sections=None):
+        """get_dashboard() for a request: report sections come from fresh stored reports when possible"""
+        sections, _ = self._dashboard_plan(sections)
+        stored = self.fresh_reports([name for name in sections if name in REPORT_KINDS])
+        live = [name for name in sections if name not in stored]
+        return merge_dashboard(sections, stored, self.get_dashboard(live) if live else {})
+
+    def get_report(self, kind):
+        """
+        One report as (JSON text, computed_at, refresh pending). With
+        REPORTS_ENABLED the scheduler's stored copy is served as-is;
+        otherwise, or before its first run, the report is computed now.
+        """
+        if kind not in REPORT_KINDS:
+            raise ValueError(f"Unknown report: {kind}")
+        if reports_enabled():
+            with self.engine.connect() as conn:
+                stored = reports.load(conn, self.user_id, kind)
+            if stored is not None:
+                return stored
+        payload, computed_at = self.refresh_reports((kind,), save=reports_enabled())[kind]
+        return payload, computed_at, False
+
+    def generate_purchase_order(self, df=None, forecasts=None):
         """Generate draft purchase order for items needing restocking"""
-        df = self.fetch_compressed_data()
-        order_items = []
-
-        for _, row in df.iterrows():
-            if row['current_stock'] <= row['safety_stock_level']:
-                reorder_qty = max(row['forecasted_demand'] - row['current_stock'],
-                                row['safety_stock_level'] - row['current_stock'] + 10)
-                eoq = self.calculate_eoq(row['annual_demand'], row['order_cost_fixed'], row['holding_cost_per_unit'])
-                order_items.append({
-                    'product_id': row['product_id'],
-                    'product_name': row['product_name'],
-                    'current_stock': row['current_stock'],
-                    'reorder_quantity': reorder_qty,
-                    'eoq': eoq,
-                    'priority': 'HIGH' if row['current_stock'] <= row['safety_stock_level'] * 0.5 else 'MEDIUM'
-                })
-            elif row['current_stock'] < row['forecasted_demand']:
-                reorder_qty = row['forecasted_demand'] - row['current_stock']
-                eoq = self.calculate_eoq(row['annual_demand'], row['order_cost_fixed'], row['holding_cost_per_unit'])
-                order_items.append({
-                    'product_id': row['product_id'],
-                    'product_name': row['product_name'],
-                    'current_stock': row['current_stock'],
-                    'reorder_quantity': reorder_qty,
-                    'eoq': eoq,
-                    'priority': 'LOW'
-                })
+        recs = needs_reorder(self.get_recommendations(df, forecasts))
+        order = recs[['product_id', 'product_name', 'current_stock', 'po_quantity', 'eoq', 'priority']]
+        order = order.rename(columns={'po_quantity': 'reorder_quantity'})
+        return order.to_dict('records')
 
-        return order_items
+    def _sales_history_query(self, product_id=None, txn_type=None, start_date=None,
+                             end_date=None, cursor=None, limit=None):
+        """Tenant-scoped, filtered sales history in newest-first keyset order"""
+        # Hot tier only (older months come from _iter_archived_history), deleted products hidden
+        conditions = ["s.user_id = :uid", "i.deleted_at IS NULL", archive.hot_condition()]
+        params = {"uid": self.user_id}
+        if product_id is not None:
+            conditions.append("s.product_id = :pid")
+            params["pid"] = product_id
+        if txn_type:
+            conditions.append("s.type = :type")
+            params["type"] = txn_type
+        if start_date is not None:
+            conditions.append("s.sale_date >= :start")
+            params["start"] = start_date
+        if end_date is not None:
+            conditions.append("s.sale_date <= :end")
+            params["end"] = end_date
+        if cursor is not None:
+            # Keyset pagination: strictly older than the last row already sent
+            conditions.append("(s.sale_date < :cdate OR (s.sale_date = :cdate AND s.id < :cid))")
+            params["cdate"], params["cid"] = cursor
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT :limit"
+            params["limit"] = limit
 
-    def record_sale(self, product_id, quantity_sold):
-        """Record a new sale - automatically calculates revenue and profit"""
-        df = self.fetch_compressed_data()
-        product = df[df['product_id'] == product_id]
-        if product.empty:
-            raise ValueError(f"Product {product_id} not found")
-        
-        mrp = product['mrp'].iloc[0]
-        cost_per_unit = product['order_cost_fixed'].iloc[0]
-        
-        revenue = quantity_sold * mrp
-        profit = quantity_sold * (mrp - cost_per_unit)
-        
-        with self.engine.begin() as conn:
+        query = text(f"""
+            SELECT s.id, s.product_id, i.product_name, s.sale_date, s.quantity_sold,
+                   s.revenue, s.profit, s.type
+            FROM sales_history s
+            LEFT JOIN inventory i ON i.product_id = s.product_id AND i.user_id = s.user_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY s.sale_date DESC, s.id DESC
+            {limit_sql}
+        """)
+        return query, params
+
+    @staticmethod
+    def _format_sales_history(df):
+        df['sale_date'] = pd.to_datetime(df['sale_date']).dt.strftime('%Y-%m-%d')
+        return df
+
+    def get_sales_history_page(self, limit=100, cursor=None, **filters):
+        """
+        One page of sales history, newest first.
+        `cursor` is the (sale_date, id) of the last row of the previous page;
+        the returned next_cursor is None on the last page.
+        """
+        df, next_cursor = self.get_sales_history_frame(limit=limit, cursor=cursor, **filters)
+        return self._format_sales_history(df).to_dict('records'), next_cursor
+
+    def get_sales_history_frame(self, limit=100, cursor=None, **filters):
+        """get_sales_history_page() as (DataFrame, next_cursor), sale_date left as a date column"""
+        query, params = self._sales_history_query(cursor=cursor, limit=limit + 1, **filters)
+        with stage('sales_history_page') as st:
+            with self.engine.connect() as conn:
+                df = pd.read_sql(query, conn, params=params)
+                df['sale_date'] = pd.to_datetime(df['sale_date'])
+                # A short page carries on into the archived months
+                if len(df) <= limit:
+                    frames, needed = [df] if not df.empty else [], limit + 1 - len(df)
+                    for older in self._iter_archived_history(conn, cursor=cursor, **filters):
+                        frames.append(older.head(needed))
+                        needed -= len(frames[-1])
+                        if needed <= 0:
+                            break
+                    if frames:
+                        df = pd.concat(frames, ignore_index=True)
+            st.rows = len(df)
+
+        next_cursor = None
+        if len(df) > limit:
+            df = df.iloc[:limit]
+            last = df.iloc[-1]
+            next_cursor = (pd.Timestamp(last['sale_date']).date(), int(last['id']))
+        return df, next_cursor
+
+    def iter_sales_history(self, chunk_size=5000, **filters):
+        """Streams the filtered history as DataFrame chunks from a server-side cursor, then the archive"""
+        query, params = self._sales_history_query(**filters)
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True)
+            for chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_size):
+                yield self._format_sales_history(chunk)
+            for frame in self._iter_archived_history(conn, **filters):
+                for start in range(0, len(frame), chunk_size):
+                    yield self._format_sales_history(frame.iloc[start:start + chunk_size].copy())
+
+    def _iter_archived_history(self, conn, cursor=None, product_id=None, txn_type=None,
+                               start_date=None, end_date=None):
+        """
+        Archived rows in the shape and order of _sales_history_query(), one
+        DataFrame per month, newest first. A month's segments are only read
+        when the caller asks for it.
+        """
+        if cursor is not None:
+            end_date = cursor[0] if end_date is None else min(end_date, cursor[0])
+        segments = archive.tenant_segments(conn, self.user_id, start_date, end_date)
+        if not segments:
+            return
+        deleted = self._deleted_product_ids(conn)
+        for group in archive.by_month(segments):
+            frame = pd.concat(archive.read_segments(group, self.user_id, product_id=product_id, txn_type=txn_type,
+                                                    start_date=start_date, end_date=end_date,
+                                                    exclude_products=deleted), ignore_index=True)
+            if cursor is not None:
+                cursor_date = pd.Timestamp(cursor[0])
+                frame = frame[(frame['sale_date'] < cursor_date)
+                              | ((frame['sale_date'] == cursor_date) & (frame['id'] < cursor[1]))]
+            if frame.empty:
+                continue
+            frame = frame.sort_values(['sale_date', 'id'], ascending=False, ignore_index=True)
+            frame['product_name'] = frame['product_id'].map(self._product_names(conn, frame['product_id']))
+            yield frame[list(bulk.SALES_HISTORY_COLUMNS)]
+
+    def _product_names(self, conn, product_ids):
+        """{product_id: product_name} for the given ids"""
+        product_ids = sorted({int(product_id) for product_id in product_ids.dropna()})
+        if not product_ids:
+            return {}
+        rows = conn.execute(text("""
+            SELECT product_id, product_name FROM inventory WHERE user_id = :uid AND product_id IN :pids
+        """).bindparams(bindparam("pids", expanding=True)), {"uid": self.user_id, "pids": product_ids})
+        return dict(rows.fetchall())
+
+    def _lookup_products(self, conn, product_ids, cached=True):
+        """
+        {product_id: order_cost_fixed} for this user's products: the price
+        cache first, then one keyed lookup for the rest of the batch.
+        """
+        if not product_ids:
+            return {}
+        costs = self.prices.get_many(self.user_id, product_ids) if cached else {}
+        missing = sorted(product_id for product_id in product_ids if product_id not in costs)
+        if missing:
             sql = text("""
-                INSERT INTO sales_history 
-                (product_id, sale_date, quantity_sold, revenue, profit, type, user_id) 
-                VALUES (:pid, :sdate, :qs, :rev, :prof, :type, :uid)
-            """)
-            conn.execute(sql, {
-                "pid": product_id,
-                "sdate": datetime.now().date(),
-                "qs": quantity_sold,
-                "rev": revenue,
-                "prof": profit,
-                "type": 'sale',
-                "uid": self.user_id
-            })
+                SELECT product_id, order_cost_fixed FROM inventory
+                WHERE user_id = :uid AND product_id IN :pids AND deleted_at IS NULL
+            """).bindparams(bindparam("pids", expanding=True))
+            rows = conn.execute(sql, {"uid": self.user_id, "pids": missing})
+            loaded = {row[0]: float(row[1] or 0) for row in rows}
+            self.prices.set_many(self.user_id, loaded)
+            costs.update(loaded)
+        return costs
 
-            update_sql = text("UPDATE inventory SET current_stock = current_stock - :qs WHERE product_id = :pid and user_id = :uid")
-            conn.execute(update_sql, {
-                "qs": quantity_sold,
-                "pid": product_id,
-                "uid": self.user_id
-            })
+    def _apply_stock_deltas(self, conn, deltas):
+        """Set-based UPDATE: {product_id: change} applied in chunked CASE statements"""
+        items = list(deltas.items())
+        for start in range(0, len(items), BULK_UPDATE_CHUNK):
+            chunk = items[start:start + BULK_UPDATE_CHUNK]
+            params = {"uid": self.user_id}
+            cases = []
+            for n, (product_id, change) in enumerate(chunk):
+                params[f"p{n}"] = product_id
+                params[f"q{n}"] = change
+                cases.append(f"WHEN :p{n} THEN :q{n}")
+            sql = text(f"""
+                UPDATE inventory
+                SET current_stock = current_stock + CASE product_id {' '.join(cases)} ELSE 0 END
+                WHERE user_id = :uid AND product_id IN :pids AND deleted_at IS NULL
+            """).bindparams(bindparam("pids", expanding=True))
+            params["pids"] = [product_id for product_id, _ in chunk]
+            conn.execute(sql, params)
+
+    @staticmethod
+    def _validate_lines(items, quantity_key, allow_negative=False):
+        """Splits batch lines into (valid, results); invalid lines get an error result"""
+        if not isinstance(items, list) or not items:
+            raise ValueError("items must be a non-empty list")
+        if len(items) > MAX_BULK_ITEMS:
+            raise ValueError(f"At most {MAX_BULK_ITEMS} items per request")
+
+        valid, results = [], [None] * len(items)
+        for index, item in enumerate(items):
+            try:
+                product_id = int(item['product_id'])
+                quantity = int(item[quantity_key])
+            except (KeyError, TypeError, ValueError):
+                results[index] = {"index": index, "status": "error",
+                                  "error": f"product_id and {quantity_key} must be integers"}
+                continue
+            if quantity == 0 or (quantity < 0 and not allow_negative):
+                results[index] = {"index": index, "product_id": product_id, "status": "error",
+                                  "error": f"{quantity_key} must be {'non-zero' if allow_negative else 'positive'}"}
+                continue
+            valid.append((index, product_id, quantity, item))
+        return valid, results
+
+    def record_sales(self, items):
+        """
+        Records a batch of sales [{product_id, quantity}, ...] in one transaction:
+        cached prices, one conditional stock decrement per line (a line that
+        would oversell fails on its own) and one multi-row history INSERT.
+        Returns one result per line, in input order.
+        """
+        valid, results = self._validate_lines(items, 'quantity')
+        sale_date = datetime.now().date()
+        history, txns, stock_deltas, units = [], [], {}, {}
 
-        print(f"--- Sale Recorded: Product {product_id}, Quantity: {quantity_sold}, Revenue: Rs.{revenue:.2f}, Profit: Rs.{profit:.2f} ---")
+        with self.engine.begin() as conn:
+            costs = self._lookup_products(conn, {product_id for _, product_id, _, _ in valid})
+            # Product order, so concurrent batches lock shared rows in the same order
+            for index, product_id, quantity, _ in sorted(valid, key=lambda line: (line[1], line[0])):
+                if product_id in costs and not self._change_stock(conn, product_id, -quantity):
+                    available = self._stock_level(conn, product_id)
+                    if available is not None:
+                        results[index] = {"index": index, "product_id": product_id, "status": "error",
+                                          "error": f"Insufficient stock: {available} available",
+                                          "available": available}
+                        continue
+                    costs.pop(product_id)
+                if product_id not in costs:
+                    results[index] = {"index": index, "product_id": product_id, "status": "error",
+                                      "error": f"Product {product_id} not found"}
+                    continue
+
+                cost_per_unit = costs[product_id]
+                mrp = cost_per_unit * 1.5
+                revenue = quantity * mrp
+                profit = quantity * (mrp - cost_per_unit)
+
+                history.append({"pid": product_id, "sdate": sale_date, "qs": quantity,
+                                "rev": revenue, "prof": profit, "type": 'sale', "uid": self.user_id})
+                txns.append(('sale', revenue, profit))
+                stock_deltas[product_id] = stock_deltas.get(product_id, 0) - quantity
+                units[product_id] = units.get(product_id, 0) + quantity
+                results[index] = {"index": index, "product_id": product_id, "status": "ok",
+                                  "revenue": round(revenue, 2), "profit": round(profit, 2)}
+
+            if history:
+                conn.execute(text("""
+                    INSERT INTO sales_history
+                    (product_id, sale_date, quantity_sold, revenue, profit, type, user_id)
+                    VALUES (:pid, :sdate, :qs, :rev, :prof, :type, :uid)
+                """), history)
+                rollups.record_transactions(conn, self.user_id, sale_date, txns)
+                forecasting.record_sales(conn, self.user_id, sale_date, units)
+
+        if history:
+            self.cache.invalidate(self.user_id, (INVENTORY, SALES))
+            self._after_write(stock_deltas)
+        logger.info("bulk sales recorded", extra={'user_id': self.user_id, 'lines': len(items),
+                                                  'recorded': len(history)})
+        return results
+
+    def update_stock_bulk(self, items):
+        """
+        Applies a batch of stock movements [{product_id, quantity_change, total_cost?}, ...]
+        in one transaction. Positive changes are recorded as purchases. A
+        product's increases are applied before its decreases, and a decrease
+        that would take the stock below zero fails on its own, as in
+        record_sales(). Returns one result per line, in input order.
+        """
+        valid, results = self._validate_lines(items, 'quantity_change', allow_negative=True)
+        sale_date = datetime.now().date()
+        history, txns, stock_deltas = [], [], {}
+
+        with self.engine.begin() as conn:
+            # Read from the table: the set-based UPDATE below cannot report missing rows
+            costs = self._lookup_products(conn, {product_id for _, product_id, _, _ in valid}, cached=False)
+            lines = {}
+            for index, product_id, quantity_change, item in valid:
+                if product_id in costs:
+                    lines.setdefault(product_id, []).append((index, quantity_change, item))
+
+            # Increase-only products share one set-based UPDATE.  A product with
+            # decreases gets its increases first, then one conditional UPDATE per
+            # decrease, in product order so concurrent batches lock rows alike
+            increases, gone = {}, set()
+            for product_id in sorted(lines):
+                added = sum(change for _, change, _ in lines[product_id] if change > 0)
+                decreases = [(index, change) for index, change, _ in lines[product_id] if change < 0]
+                if not decreases:
+                    increases[product_id] = added
+                    continue
+                if added and not self._change_stock(conn, product_id, added):
+                    gone.add(product_id)
+                    continue
+                applied, touched = added, added > 0
+                for index, change in decreases:
+                    if self._change_stock(conn, product_id, change):
+                        applied, touched = applied + change, True
+                        continue
+                    available = self._stock_level(conn, product_id)
+                    if available is None:
+                        gone.add(product_id)
+                        break
+                    results[index] = {"index": index, "product_id": product_id, "status": "error",
+                                      "error": f"Insufficient stock: {available} available",
+                                      "available": available}
+                if touched and product_id not in gone:
+                    stock_deltas[product_id] = applied
+            if increases:
+                self._apply_stock_deltas(conn, increases)
+                stock_deltas.update(increases)
+
+            for index, product_id, quantity_change, item in valid:
+                if results[index] is not None:
+                    continue
+                if product_id not in costs or product_id in gone:
+                    results[index] = {"index": index, "product_id": product_id, "status": "error",
+                                      "error": f"Product {product_id} not found"}
+                    continue
+                results[index] = {"index": index, "product_id": product_id, "status": "ok"}
+                if quantity_change > 0:
+                    total_cost = float(item.get('total_cost') or 0)
+                    revenue = -total_cost if total_cost > 0 else -(quantity_change * costs[product_id])
+                    history.append({"pid": product_id, "sdate": sale_date, "qs": quantity_change,
+                                    "rev": revenue, "prof": 0, "type": 'purchase', "uid": self.user_id})
+                    txns.append(('purchase', revenue, 0))
+
+            if history:
+                conn.execute(text("""
+                    INSERT INTO sales_history
+                    (product_id, sale_date, quantity_sold, revenue, profit, type, user_id)
+                    VALUES (:pid, :sdate, :qs, :rev, :prof, :type, :uid)
+                """), history)
+                rollups.record_transactions(conn, self.user_id, sale_date, txns)
+
+        if stock_deltas:
+            self.cache.invalidate(self.user_id, (INVENTORY, SALES) if history else (INVENTORY,))
+            self._after_write(stock_deltas)
+        logger.info("bulk stock updated", extra={'user_id': self.user_id, 'lines': len(items),
+                                                 'products': len(stock_deltas)})
+        return results
+
+    def record_sale(self, product_id, quantity_sold):
+        """Record a new sale - automatically calculates revenue and profit"""
+        result = self.record_sales([{"product_id": product_id, "quantity": quantity_sold}])[0]
+        if result['status'] != 'ok':
+            raise (InsufficientStockError if 'available' in result else ValueError)(result['error'])
+
+        logger.info("sale recorded", extra={'user_id': self.user_id, 'product_id': product_id,
+                                            'quantity': quantity_sold, 'revenue': result['revenue'],
+                                            'profit': result['profit']})
+        return {"revenue": result['revenue'], "profit": result['profit']}
 
     def add_product(self, product_name, current_stock, safety_stock_level,
                     forecasted_demand, lead_time_days, annual_demand,
@@ -312,34 +998,113 @@ class InventoryAgent:
                 VALUES (:pn, :cs, :ssl, :fd, :ltd, :ad, :ocf, :hcpu, :ed, :uid)
             """)
 
-            conn.execute(sql, {
+            result = conn.execute(sql, {
                 "pn": product_name, "cs": current_stock, "ssl": safety_stock_level,
                 "fd": forecasted_demand, "ltd": lead_time_days, "ad": annual_demand,
                 "ocf": order_cost_fixed, "hcpu": holding_cost_per_unit, "ed": expiry_date,
                 "uid": self.user_id
             })
 
-        print(f"--- Product Added: {product_name} ---")
+        self.cache.invalidate(self.user_id, (INVENTORY,))
+        self._after_write([result.lastrowid])
+        logger.info("product added", extra={'user_id': self.user_id, 'product_name': product_name})
+
+    def import_products(self, stream, fmt='csv', chunksize=bulk.DEFAULT_CHUNKSIZE):
+        """
+        Bulk-imports products from a CSV or Parquet upload (see scripts/bulk.py).
+        Returns the import summary with per-row errors.
+        """
+        summary = bulk.new_summary()
+        try:
+            bulk.import_products(self.engine, self.user_id, stream, fmt, chunksize, summary)
+        finally:
+            # Chunks commit one by one: a failing chunk leaves the earlier ones in the table
+            if summary['imported']:
+                self.cache.invalidate(self.user_id, (INVENTORY,))
+                self._after_import()
+        logger.info("products imported", extra={'user_id': self.user_id, 'rows': summary['rows'],
+                                                'imported': summary['imported'], 'failed': summary['failed']})
+        return summary
+
+    def _after_import(self):
+        """Too many products to patch one by one: indexes are dropped and live dashboards reload"""
+        try:
+            if self.expiry_index is not None:
+                self.expiry_index.discard(self.user_id)
+            self.products.discard(self.user_id)
+            self.changes.publish(self.user_id, {'changed': [], 'deleted': [], 'reload': True})
+            if reports_enabled():
+                with self.engine.begin() as conn:
+                    reports.request_refresh(conn, self.user_id)
+        except Exception as e:
+            logger.warning("post-import update failed", extra={'user_id': self.user_id, 'error': str(e)})
+
+    def iter_inventory(self, chunk_size=bulk.DEFAULT_CHUNKSIZE):
+        """Streams the tenant's products as export-ready DataFrame chunks"""
+        return bulk.iter_inventory(self.engine, self.user_id, chunk_size)
 
     def delete_product(self, product_id):
-        """Delete a product from inventory"""
+        """
+        Delete a product from inventory. The row is only marked deleted (and
+        hidden everywhere); its sales history, however long, is purged in
+        chunks by the archiver (scripts/archive.py), which then drops the row.
+        """
+        # Archived totals are read first, outside the transaction that locks the row
+        with self.engine.connect() as conn:
+            archived = archive.archived_daily_totals(conn, self.user_id, product_id)
         with self.engine.begin() as conn:
-            # Check if product exists
-            check_sql = text("SELECT COUNT(*) FROM inventory WHERE product_id = :pid and user_id = :uid")
-            count = conn.execute(check_sql, {"pid": product_id, "uid": self.user_id}).scalar()
-            
-            if count == 0:
+            if not archive.mark_deleted(conn, self.user_id, product_id, archived):
                 raise ValueError("Product not found")
+            forecasting.remove_product(conn, self.user_id, product_id)
 
-            # Delete related sales history first
-            del_history_sql = text("DELETE FROM sales_history WHERE product_id = :pid and user_id = :uid")
-            conn.execute(del_history_sql, {"pid": product_id, "uid": self.user_id})
+        self.cache.invalidate(self.user_id, (INVENTORY, SALES))
+        self.prices.evict(self.user_id, [product_id])
+        self._after_write(deleted=[product_id])
+        logger.info("product deleted", extra={'user_id': self.user_id, 'product_id': product_id})
 
-            # Then delete from inventory
-            del_inv_sql = text("DELETE FROM inventory WHERE product_id = :pid and user_id = :uid")
-            conn.execute(del_inv_sql, {"pid": product_id, "uid": self.user_id})
+    def _after_write(self, product_ids=(), deleted=()):
+        """Brings the expiry index, live dashboards and stored reports up to date with a committed write"""
+        try:
+            changed = None
+            if product_ids:
+                changed = self._load_inventory(self._inventory_columns(None), product_ids=list(product_ids))
+            if self.expiry_index is not None:
+                # The write has just bumped the inventory version by one
+                version = self.cache.versions.get_version(self.user_id, INVENTORY)
+                self.expiry_index.apply(self.user_id, version - 1, version, changed, deleted)
+            self._publish_changes(changed, deleted)
+            if changed is not None or deleted:
+                records = [] if changed is None else [lookup_record(*row) for row in
+                                                      changed[list(LOOKUP_COLUMNS)].itertuples(index=False)]
+                self.products.apply(self.user_id, records, deleted)
+            if reports_enabled():
+                with self.engine.begin() as conn:
+                    reports.request_refresh(conn, self.user_id)
+        except Exception as e:
+            # The write already committed; the index rebuilds and live clients resync on reload
+            if self.expiry_index is not None:
+                self.expiry_index.discard(self.user_id)
+            self.products.discard(self.user_id)
+            logger.warning("post-write update failed", extra={'user_id': self.user_id, 'error': str(e)})
 
-        print(f"--- Product Deleted: {product_id} ---")
+    def _publish_changes(self, changed, deleted=()):
+        """
+        Pushes the touched products to live dashboards: each one's inventory
+        row, status, reorder advice and expiry alert (null when it has none).
+        """
+        events = []
+        if changed is not None and not changed.empty:
+            forecasts = self.fetch_forecasts(changed['product_id'])
+            statuses = self.get_recommendations(changed, forecasts)['status']
+            advice = {entry['product_id']: entry for entry in self.get_advice(changed, forecasts)}
+            alerts = {entry['product_id']: entry for entry in self.get_expiry_alerts(df=changed)}
+            # NaN is not valid JSON for EventSource clients
+            rows = inventory_records(changed.astype(object).where(changed.notna(), None))
+            for row, status in zip(rows, statuses):
+                product_id = row['product_id']
+                events.append({'product_id': product_id, 'product': row, 'status': status,
+                               'advice': advice.get(product_id), 'expiry_alert': alerts.get(product_id)})
+        self.changes.publish(self.user_id, {'changed': events, 'deleted': list(deleted)})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Columns a product lookup loads; MRP is derived from the cost
+LOOKUP_COLUMNS = ('product_id', 'product_name', 'order_cost_fixed')
+
+# Markup applied to the unit cost everywhere a sale is priced
+MRP_MARKUP = 1.5
+
+
+def lookup_record(product_id, product_name, order_cost_fixed):
+    """The fields a form needs for one product"""
+    cost = float(order_cost_fixed) if order_cost_fixed is not None else 0.0
+    if cost != cost:
+        cost = 0.0
+    return {'product_id': int(product_id), 'product_name': product_name,
+            'order_cost_fixed': cost, 'mrp': cost * MRP_MARKUP}
+
+
+def _name_key(name):
+    return name.casefold() if isinstance(name, str) else ''
+
+
+class ProductIndex:
+    """
+    Per-tenant in-memory index of product names and prices for the sale and
+    stock forms: by id, and by case-insensitive name prefix for autocomplete.
+    Names and costs never change once a product exists, so only adds and
+    deletes matter: this process's writes patch the index, an id it does
+    not know falls through to a keyed query, and the whole tenant is
+    reloaded after `ttl` seconds to pick up other workers' adds and deletes.
+    """
+
+    def __init__(self, ttl=60, max_tenants=1024):
+        self.ttl = ttl
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, product_id, loader, fetch_one):
+        """Record of one product or None; fetch_one(product_id) looks up an id the index lacks"""
+        entry = self._entry(user_id, loader)
+        record = entry['by_id'].get(product_id)
+        if record is None:
+            record = fetch_one(product_id)
+            if record is not None:
+                self.apply(user_id, [record])
+        return record
+
+    def search(self, user_id, prefix, limit, loader):
+        """Up to `limit` records whose name starts with `prefix`, in name order"""
+        entry = self._entry(user_id, loader)
+        key = _name_key(prefix)
+        with self._lock:
+            names = entry['names']
+            start = bisect_left(names, (key,))
+            matches = []
+            for name, product_id in names[start:start + limit]:
+                if not name.startswith(key):
+                    break
+                matches.append(entry['by_id'][product_id])
+        return matches
+
+    def apply(self, user_id, records, deleted=()):
+        """Patches a tenant after a write: `records` added or rewritten, `deleted` removed"""
+        with self._lock:
+            entry = self._tenants.get(user_id)
+            if entry is None:
+                return
+            # Sales and stock moves rewrite products whose record is unchanged
+            records = [record for record in records if entry['by_id'].get(record['product_id']) != record]
+            for product_id in list(deleted) + [record['product_id'] for record in records]:
+                old = entry['by_id'].pop(product_id, None)
+                if old is not None:
+                    names = entry['names']
+                    del names[bisect_left(names, (_name_key(old['product_name']), product_id))]
+            for record in records:
+                entry['by_id'][record['product_id']] = record
+                insort(entry['names'], (_name_key(record['product_name']), record['product_id']))
+
+    def discard(self, user_id):
+        with self._lock:
+            self._tenants.pop(user_id, None)
+
+    def _entry(self, user_id, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tenants.get(user_id)
+            if entry is not None and entry['expires_at'] > now:
+                self._tenants.move_to_end(user_id)
+                return entry
+        records = loader()
+        entry = {
+            'by_id': {record['product_id']: record for record in records},
+            'names': sorted((_name_key(record['product_name']), record['product_id']) for record in records),
+            'expires_at': now + self.ttl,
+        }
+        if self.ttl > 0:
+            with self._lock:
+                self._tenants[user_id] = entry
+                self._tenants.move_to_end(user_id)
+                while len(self._tenants) > self.max_tenants:
+                    self._tenants.popitem(last=False)
+        return entry
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_product_index():
+    """Process-wide ProductIndex (LOOKUP_INDEX_TTL_SECONDS, 0 loads the tenant on every lookup)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ProductIndex(ttl=float(os.getenv('LOOKUP_INDEX_TTL_SECONDS', 60)),
+                                      max_tenants=int(os.getenv('LOOKUP_INDEX_MAX_TENANTS', 1024)))
+    return _index
+
+
+def _reset_after_fork():
+    # Locks may have been held by another thread at fork time
+    global _index, _index_lock
+    _index_lock = threading.Lock()
+    _index = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
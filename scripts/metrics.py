@@ -0,0 +1,180 @@
+import bisect
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Minimal Prometheus-style metrics for one worker process: counters and
+# histograms with labels, rendered in the text exposition format by
+# /metrics.  Each gunicorn worker keeps its own registry, so scrape every
+# worker (or run a single worker behind the scraper) when sizing.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(names, values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(names, values + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, values)} {series['sum']}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, values)} {series['count']}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Latency of HTTP requests by route", ('method', 'route', 'status'))
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', "Latency of SQL statements by operation and table", ('operation', 'table'))
+DB_QUERY_ERRORS = Counter(
+    'db_query_errors_total', "SQL statements that raised", ('operation', 'table'))
+STAGE_LATENCY = Histogram(
+    'agent_stage_duration_seconds', "Time spent in InventoryAgent pandas/DB stages", ('stage',))
+STAGE_ROWS = Histogram(
+    'agent_stage_rows', "DataFrame rows handled per InventoryAgent stage", ('stage',), buckets=ROW_BUCKETS)
+SLOW_REQUESTS = Counter(
+    'http_slow_requests_total', "Requests slower than SLOW_REQUEST_MS", ('route',))
+
+REGISTRY = [REQUEST_LATENCY, DB_QUERY_LATENCY, DB_QUERY_ERRORS, STAGE_LATENCY, STAGE_ROWS, SLOW_REQUESTS]
+
+
+def register(metric):
+    """Adds a metric defined elsewhere to the /metrics output"""
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --------------------------
+# SQL timing via SQLAlchemy events
+# --------------------------
+
+_STATEMENT_RE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|CREATE|ALTER|DROP|EXPLAIN|WITH)\b', re.I)
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)`?', re.I)
+
+
+def classify_statement(statement):
+    """(operation, table) labels for a SQL string, kept low-cardinality"""
+    operation = _STATEMENT_RE.match(statement)
+    table = _TABLE_RE.search(statement)
+    return (operation.group(1).upper() if operation else 'OTHER',
+            table.group(1).lower() if table else 'none')
+
+
+def instrument_engine(engine):
+    """Times every statement the engine executes"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, *classify_statement(statement))
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(context):
+        stack = context.connection.info.get('query_started') if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.inc(*classify_statement(context.statement or ''))
+
+    return engine
+
+
+# --------------------------
+# Agent stage timing
+# --------------------------
+
+class _Stage:
+    __slots__ = ('name', 'rows')
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block of agent work; set `.rows` on the yielded object to
+    record how many DataFrame rows the stage handled.
+    """
+    current = _Stage(name)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.observe(elapsed, name)
+        if current.rows is not None:
+            STAGE_ROWS.observe(current.rows, name)
+        logger.debug("stage finished", extra={'stage': name, 'rows': current.rows,
+                                              'duration_ms': round(elapsed * 1000, 3)})
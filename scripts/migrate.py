@@ -0,0 +1,138 @@
+import argparse
+import importlib.util
+import os
+import re
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+# Versioned schema migrations.  Each file in migrations/ is named
+# NNNN_description.py and defines upgrade(conn); applied versions are recorded
+# in schema_migrations so every environment converges on the same schema.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] sorted by version"""
+    found = []
+    for filename in os.listdir(directory):
+        match = FILENAME_RE.match(filename)
+        if match:
+            found.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return sorted(found)
+
+
+def _load(version, name, path):
+    spec = importlib.util.spec_from_file_location(f"migration_{version}_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _ensure_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(16) NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine, target=None, directory=MIGRATIONS_DIR):
+    """Applies pending migrations in order (up to and including `target`)"""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, path in discover(directory):
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+
+        module = _load(version, name, path)
+        # MySQL commits DDL implicitly, so every migration must be safe to
+        # re-run; the helpers below make each step idempotent.
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(text("""
+                INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :at)
+            """), {"v": version, "n": name, "at": datetime.now()})
+        applied.append((version, name))
+        print(f"--- Migration applied: {version} {name} ---")
+    return applied
+
+
+def status(engine, directory=MIGRATIONS_DIR):
+    done = applied_versions(engine)
+    return [(version, name, version in done) for version, name, _ in discover(directory)]
+
+
+# --------------------------
+# Helpers for migration files
+# --------------------------
+
+def has_table(conn, table):
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table, column):
+    return any(col['name'] == column for col in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table, columns, unique=False):
+    """True if an index (or unique constraint/PK) already leads with exactly these columns"""
+    columns = list(columns)
+    inspector = inspect(conn)
+    candidates = [(idx['column_names'], idx.get('unique', False)) for idx in inspector.get_indexes(table)]
+    candidates += [(uc['column_names'], True) for uc in inspector.get_unique_constraints(table)]
+    pk = inspector.get_pk_constraint(table).get('constrained_columns') or []
+    if pk:
+        candidates.append((pk, True))
+    return any(cols == columns and (is_unique or not unique) for cols, is_unique in candidates)
+
+
+def create_index(conn, name, table, columns, unique=False):
+    """CREATE [UNIQUE] INDEX unless an equivalent index already exists"""
+    if has_index(conn, table, columns, unique=unique):
+        return False
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+    return True
+
+
+def auto_increment_pk(conn, column):
+    """Dialect-specific auto-increment primary key column definition"""
+    if conn.dialect.name == 'sqlite':
+        return f"{column} INTEGER PRIMARY KEY AUTOINCREMENT"
+    return f"{column} INT NOT NULL AUTO_INCREMENT PRIMARY KEY"
+
+
+def main():
+    from scripts.db_connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    sub = parser.add_subparsers(dest='command', required=True)
+    up = sub.add_parser('upgrade', help="Apply pending migrations")
+    up.add_argument('--to', dest='target', default=None, help="Stop after this version, e.g. 0003")
+    sub.add_parser('status', help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == 'upgrade':
+        applied = upgrade(engine, target=args.target)
+        if not applied:
+            print("--- Schema is up to date ---")
+    else:
+        for version, name, is_applied in status(engine):
+            print(f"{version}  {'applied' if is_applied else 'pending':8}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Salted PBKDF2-SHA256 password hashes, stored as
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# Hashing is deliberately slow, so it runs on a small bounded thread pool
+# (PASSWORD_HASH_WORKERS): hashlib releases the GIL while it works, and a
+# burst of logins queues for the pool instead of taking every core from the
+# other routes.  Passwords stored before hashing was introduced are plain
+# text; they still verify and are rehashed on the next successful login.
+
+ALGORITHM = 'pbkdf2_sha256'
+DEFAULT_ITERATIONS = 600000
+SALT_BYTES = 16
+
+
+def hash_iterations():
+    return int(os.getenv('PASSWORD_HASH_ITERATIONS', DEFAULT_ITERATIONS))
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(value):
+    return base64.b64decode(value + '=' * (-len(value) % 4))
+
+
+def hash_password(password, iterations=None):
+    iterations = iterations or hash_iterations()
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return stored.startswith(ALGORITHM + '$')
+
+
+def verify_password(password, stored):
+    """True if `password` matches the stored hash (or legacy plain-text password)"""
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, iterations, salt, digest = stored.split('$')
+        expected = _unb64(digest)
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored):
+    """Plain text, or hashed with fewer iterations than currently configured"""
+    if not is_hashed(stored):
+        return True
+    try:
+        return int(stored.split('$')[1]) < hash_iterations()
+    except (IndexError, ValueError):
+        return True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Bounded pool for password hashing (PASSWORD_HASH_WORKERS threads)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', 4)),
+                                               thread_name_prefix='passwords')
+    return _executor
+
+
+def hash_password_pooled(password):
+    return get_executor().submit(hash_password, password).result()
+
+
+def verify_password_pooled(password, stored):
+    return get_executor().submit(verify_password, password, stored).result()
+
+
+def _reset_after_fork():
+    # The parent's pool threads do not exist in the child
+    global _executor, _executor_lock
+    _executor_lock = threading.Lock()
+    _executor = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# Status labels shared by the dashboard, the purchase order and the CLI report
+CRITICAL = 'CRITICAL'
+WARNING = 'WARNING'
+OPTIMAL = 'OPTIMAL'
+
+STATUS_LABELS = {
+    CRITICAL: "❌ CRITICAL LOW",
+    WARNING: "🟡 WARNING",
+    OPTIMAL: "✅ OPTIMAL",
+}
+
+# Critical items also get this buffer on top of the safety-stock shortfall
+PURCHASE_ORDER_BUFFER = 10
+
+
+def _column(df, name):
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype='float64')
+
+
+def compute_eoq(annual_demand, order_cost, holding_cost):
+    """Vectorized EOQ = sqrt(2DS/H); 0 where the holding cost is 0 or unknown"""
+    annual_demand = np.nan_to_num(np.asarray(annual_demand, dtype='float64'))
+    order_cost = np.nan_to_num(np.asarray(order_cost, dtype='float64'))
+    holding_cost = np.nan_to_num(np.asarray(holding_cost, dtype='float64'))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.sqrt(np.clip(2 * annual_demand * order_cost, 0, None) / holding_cost)
+    eoq = np.where(holding_cost == 0, 0, eoq)
+    # np.rint rounds half to even, exactly like the built-in round()
+    return np.rint(np.nan_to_num(eoq)).astype('int64')
+
+
+def _as_int(values):
+    # Keep integer output (e.g. "ORDER 55 units") unless the data has gaps
+    if np.isnan(values).any():
+        return values
+    return values.astype('int64')
+
+
+def build_recommendations(df):
+    """
+    Classifies the whole catalog in one pass.
+    Returns one row per product with status, reorder_qty, min_req,
+    po_quantity, eoq and priority.
+    """
+    current = _column(df, 'current_stock')
+    safety = _column(df, 'safety_stock_level')
+    forecast = _column(df, 'forecasted_demand')
+
+    critical = current <= safety
+    warning = ~critical & (current < forecast)
+
+    reorder_qty = forecast - current
+    min_req = safety - current
+    po_quantity = np.where(critical,
+                           np.maximum(reorder_qty, min_req + PURCHASE_ORDER_BUFFER),
+                           reorder_qty)
+
+    result = pd.DataFrame({
+        'product_id': df['product_id'].to_numpy(),
+        'product_name': df['product_name'].to_numpy(),
+        'current_stock': df['current_stock'].to_numpy(),
+        'status': np.select([critical, warning], [CRITICAL, WARNING], OPTIMAL),
+        'reorder_qty': _as_int(reorder_qty),
+        'min_req': _as_int(min_req),
+        'po_quantity': _as_int(po_quantity),
+        'eoq': compute_eoq(_column(df, 'annual_demand'),
+                           _column(df, 'order_cost_fixed'),
+                           _column(df, 'holding_cost_per_unit')),
+        'priority': np.select([critical & (current <= safety * 0.5), critical, warning],
+                              ['HIGH', 'MEDIUM', 'LOW'], ''),
+    }, index=df.index)
+    return result
+
+
+def needs_reorder(recs):
+    """Rows that are CRITICAL or WARNING, in catalog order"""
+    return recs[recs['status'] != OPTIMAL]
@@ -0,0 +1,131 @@
+import decimal
+import json
+import os
+from datetime import date, datetime
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from werkzeug.http import http_date
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Precomputed agent reports.  The scheduler (scripts/scheduler.py) stores
+# each tenant's advice, purchase-order draft and expiry alerts as ready-made
+# JSON in agent_reports; /api/reports/<kind> hands that text out as-is, and
+# /api/advise, /api/purchase-order, /api/expiry-alerts and /api/dashboard
+# serve it while it is fresh (see fresh()).  Writes queue the tenant in
+# report_requests so it is recomputed within a poll interval instead of
+# waiting for the next sweep; a request stays queued (claimed) until the
+# recomputed reports are stored.
+
+# Report kinds, named after the dashboard sections that produce them
+REPORT_KINDS = ('advice', 'purchase_order', 'expiry_alerts')
+
+
+def reports_enabled():
+    """REPORTS_ENABLED: a scheduler is running, so writes queue refreshes and reads serve stored reports"""
+    return os.getenv('REPORTS_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _json_default(value):
+    # Same encoding as Flask's jsonify, so a stored report reads exactly like the live endpoint
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(payload):
+    return json.dumps(payload, default=_json_default)
+
+
+def _as_datetime(value):
+    # SQLite hands DATETIME back as text
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _upsert_sql(dialect_name):
+    insert = """
+        INSERT INTO agent_reports (user_id, kind, payload, computed_at)
+        VALUES (:uid, :kind, :payload, :at)
+    """
+    if dialect_name == 'mysql':
+        return text(insert + " ON DUPLICATE KEY UPDATE payload = VALUES(payload), computed_at = VALUES(computed_at)")
+    return text(insert + """
+        ON CONFLICT (user_id, kind) DO UPDATE SET payload = excluded.payload, computed_at = excluded.computed_at
+    """)
+
+
+def store(conn, user_id, payloads, computed_at):
+    """Saves {kind: JSON text} for one tenant and settles its claimed refresh request"""
+    conn.execute(_upsert_sql(conn.dialect.name), [
+        {"uid": user_id, "kind": kind, "payload": payload, "at": computed_at}
+        for kind, payload in payloads.items()
+    ])
+    # A request queued again since the claim has claimed_at reset and stays
+    conn.execute(text("DELETE FROM report_requests WHERE user_id = :uid AND claimed_at IS NOT NULL"),
+                 {"uid": user_id})
+
+
+def load(conn, user_id, kind):
+    """(JSON text, computed_at, refresh pending) of a stored report, or None"""
+    row = conn.execute(text("""
+        SELECT r.payload, r.computed_at, q.requested_at
+        FROM agent_reports r
+        LEFT JOIN report_requests q ON q.user_id = r.user_id
+        WHERE r.user_id = :uid AND r.kind = :kind
+    """), {"uid": user_id, "kind": kind}).fetchone()
+    if row is None:
+        return None
+    return row[0], _as_datetime(row[1]), row[2] is not None
+
+
+def fresh(conn, user_id, kinds, today=None):
+    """
+    {kind: JSON text} of the stored reports that can stand in for a live
+    computation: no refresh queued or running, and computed today (advice
+    and expiry alerts depend on the date). Missing kinds are computed live.
+    """
+    today = today or date.today()
+    rows = conn.execute(text("""
+        SELECT r.kind, r.payload, r.computed_at
+        FROM agent_reports r
+        WHERE r.user_id = :uid AND r.kind IN :kinds
+          AND NOT EXISTS (SELECT 1 FROM report_requests q WHERE q.user_id = r.user_id)
+    """).bindparams(bindparam('kinds', expanding=True)), {"uid": user_id, "kinds": list(kinds)}).fetchall()
+    return {kind: payload for kind, payload, computed_at in rows if _as_datetime(computed_at).date() == today}
+
+
+def request_refresh(conn, user_id):
+    """Queues a tenant for recomputation (call after its write has committed)"""
+    params = {"uid": user_id, "at": datetime.now()}
+    # Re-queues a claimed tenant too: the running job may have read older data
+    if conn.dialect.name == 'mysql':
+        conn.execute(text("""
+            INSERT INTO report_requests (user_id, requested_at) VALUES (:uid, :at)
+            ON DUPLICATE KEY UPDATE requested_at = VALUES(requested_at), claimed_at = NULL
+        """), params)
+    else:
+        conn.execute(text("""
+            INSERT INTO report_requests (user_id, requested_at) VALUES (:uid, :at)
+            ON CONFLICT (user_id) DO UPDATE SET requested_at = excluded.requested_at, claimed_at = NULL
+        """), params)
+
+
+def claim_requests(conn, limit=1000):
+    """
+    Claims up to `limit` queued tenants. Every request was queued after its
+    write committed, so a job started after the claim sees that write. The
+    request stays (claimed) until store() saves the result, so the stored
+    reports do not look fresh while they are being recomputed.
+    """
+    user_ids = [row[0] for row in conn.execute(text("""
+        SELECT user_id FROM report_requests WHERE claimed_at IS NULL ORDER BY requested_at LIMIT :limit
+    """), {"limit": limit})]
+    if user_ids:
+        conn.execute(text("UPDATE report_requests SET claimed_at = :at WHERE user_id = :uid"),
+                     [{"uid": user_id, "at": datetime.now()} for user_id in user_ids])
+    return user_ids
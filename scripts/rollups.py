@@ -0,0 +1,240 @@
+import argparse
+import pandas as pd
+from sqlalchemy import text
+
+# Materialized per-tenant sales rollups.  record_sale / update_stock add their
+# amounts to the matching daily, weekly and monthly rows inside their own
+# transaction, so the sales summary reads a few rows instead of the history.
+
+PERIOD_FORMATS = {
+    'daily': '%Y-%m-%d',
+    'weekly': '%Y-%U',
+    'monthly': '%Y-%m',
+}
+
+# row_count tracks how many sales_history rows feed each period, so a period
+# disappears from the summary once all of its rows are deleted
+METRICS = ('gross_revenue', 'order_cost', 'total_profit', 'row_count')
+
+
+def normalize_period(period):
+    """Anything other than daily/weekly falls back to monthly, as before"""
+    return period if period in PERIOD_FORMATS else 'monthly'
+
+
+def period_keys(sale_date):
+    """The (period_type, period_key) rows a single sale date contributes to"""
+    return [(period_type, sale_date.strftime(fmt)) for period_type, fmt in PERIOD_FORMATS.items()]
+
+
+def _upsert_sql(dialect_name):
+    insert = """
+        INSERT INTO sales_rollups
+        (user_id, period_type, period_key, gross_revenue, order_cost, total_profit, row_count)
+        VALUES (:uid, :ptype, :pkey, :gross, :cost, :profit, :rows)
+    """
+    if dialect_name == 'mysql':
+        return text(insert + """
+            ON DUPLICATE KEY UPDATE
+                gross_revenue = gross_revenue + VALUES(gross_revenue),
+                order_cost = order_cost + VALUES(order_cost),
+                total_profit = total_profit + VALUES(total_profit),
+                row_count = row_count + VALUES(row_count)
+        """)
+    return text(insert + """
+        ON CONFLICT (user_id, period_type, period_key) DO UPDATE SET
+            gross_revenue = sales_rollups.gross_revenue + excluded.gross_revenue,
+            order_cost = sales_rollups.order_cost + excluded.order_cost,
+            total_profit = sales_rollups.total_profit + excluded.total_profit,
+            row_count = sales_rollups.row_count + excluded.row_count
+    """)
+
+
+def apply_deltas(conn, deltas):
+    """Adds rows of {uid, ptype, pkey, gross, cost, profit, rows} to the rollups"""
+    if deltas:
+        conn.execute(_upsert_sql(conn.dialect.name), deltas)
+
+
+def transaction_deltas(user_id, sale_date, txn_type, revenue, profit=0):
+    """Rollup increments for one sales_history row"""
+    gross = cost = total_profit = 0.0
+    if txn_type == 'sale':
+        gross = float(revenue)
+        total_profit = float(profit)
+    elif txn_type == 'purchase':
+        # Purchases are stored with negative revenue
+        cost = -float(revenue)
+
+    return [
+        {"uid": user_id, "ptype": ptype, "pkey": pkey,
+         "gross": gross, "cost": cost, "profit": total_profit, "rows": 1}
+        for ptype, pkey in period_keys(sale_date)
+    ]
+
+
+def record_transaction(conn, user_id, sale_date, txn_type, revenue, profit=0):
+    """Call inside the transaction that inserts the sales_history row"""
+    apply_deltas(conn, transaction_deltas(user_id, sale_date, txn_type, revenue, profit))
+
+
+def record_transactions(conn, user_id, sale_date, txns):
+    """
+    Batch form of record_transaction for rows sharing one sale_date:
+    txns is a list of (type, revenue, profit); issues one upsert per period.
+    """
+    totals = {}
+    for txn_type, revenue, profit in txns:
+        for delta in transaction_deltas(user_id, sale_date, txn_type, revenue, profit):
+            key = (delta["ptype"], delta["pkey"])
+            if key not in totals:
+                totals[key] = delta
+            else:
+                for field in ("gross", "cost", "profit", "rows"):
+                    totals[key][field] += delta[field]
+    apply_deltas(conn, list(totals.values()))
+
+
+def aggregate_frame(sales_df):
+    """
+    Vectorized rollup of sales_history rows (needs user_id, sale_date, type,
+    revenue, profit). Rows that are already totals carry their row_count.
+    Returns one row per (user_id, period_type, period_key).
+    """
+    columns = ['user_id', 'period_type', 'period_key', *METRICS]
+    if sales_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    dates = pd.to_datetime(sales_df['sale_date'])
+    is_sale = (sales_df['type'] == 'sale').to_numpy()
+    is_purchase = (sales_df['type'] == 'purchase').to_numpy()
+    revenue = pd.to_numeric(sales_df['revenue'], errors='coerce').fillna(0).to_numpy()
+    profit = pd.to_numeric(sales_df['profit'], errors='coerce').fillna(0).to_numpy()
+
+    base = pd.DataFrame({
+        'user_id': sales_df['user_id'].to_numpy(),
+        'gross_revenue': revenue * is_sale,
+        'order_cost': -revenue * is_purchase,
+        'total_profit': profit * is_sale,
+        'row_count': sales_df['row_count'].to_numpy() if 'row_count' in sales_df else 1,
+    })
+
+    frames = []
+    for period_type, fmt in PERIOD_FORMATS.items():
+        keyed = base.assign(period_type=period_type, period_key=dates.dt.strftime(fmt).to_numpy())
+        frames.append(keyed.groupby(['user_id', 'period_type', 'period_key'], as_index=False)[list(METRICS)].sum())
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def frame_to_deltas(rollup_df, sign=1):
+    return [
+        {"uid": int(row.user_id), "ptype": row.period_type, "pkey": row.period_key,
+         "gross": sign * float(row.gross_revenue), "cost": sign * float(row.order_cost),
+         "profit": sign * float(row.total_profit), "rows": sign * int(row.row_count)}
+        for row in rollup_df.itertuples(index=False)
+    ]
+
+
+def remove_rows(conn, sales_df):
+    """Subtracts sales_history rows that are about to be deleted"""
+    deltas = frame_to_deltas(aggregate_frame(sales_df), sign=-1)
+    apply_deltas(conn, deltas)
+    if deltas:
+        conn.execute(text("DELETE FROM sales_rollups WHERE user_id = :uid AND row_count <= 0"),
+                     {"uid": deltas[0]["uid"]})
+
+
+def read_summary(conn, user_id, period):
+    """Summary dict in the /api/sales-summary shape, read from the rollups"""
+    rows = conn.execute(text("""
+        SELECT period_key, gross_revenue, order_cost, total_profit
+        FROM sales_rollups
+        WHERE user_id = :uid AND period_type = :ptype
+        ORDER BY period_key
+    """), {"uid": user_id, "ptype": normalize_period(period)}).fetchall()
+
+    final = {
+        'gross_revenue': {}, 'order_cost': {}, 'total_profit': {},
+        'margin_of_revenue': {}, 'net_profit': {}
+    }
+    for period_key, gross_revenue, order_cost, total_profit in rows:
+        gross_revenue = float(gross_revenue or 0)
+        order_cost = float(order_cost or 0)
+        total_profit = float(total_profit or 0)
+        final['gross_revenue'][period_key] = gross_revenue
+        final['order_cost'][period_key] = order_cost
+        final['total_profit'][period_key] = total_profit
+        final['margin_of_revenue'][period_key] = gross_revenue - order_cost
+        final['net_profit'][period_key] = gross_revenue - order_cost + total_profit
+    return final
+
+
+def rebuild(engine, user_id=None, chunksize=100000):
+    """
+    Recomputes rollups from sales_history and its archived months, for one
+    tenant or for everyone. History is streamed in chunks so memory stays
+    bounded by the number of periods, not the number of sales rows.
+    """
+    with engine.begin() as conn:
+        return rebuild_in(conn, user_id=user_id, chunksize=chunksize)
+
+
+def rebuild_in(conn, user_id=None, chunksize=100000):
+    """rebuild() inside an existing transaction (used by the migrations)"""
+    # archive imports this module
+    from scripts import archive
+
+    where = "WHERE user_id = :uid" if user_id is not None else ""
+    params = {"uid": user_id} if user_id is not None else {}
+    archived = archive.catalog_exists(conn)
+    hot = ""
+    deleted = []
+    if archived:
+        # Deleted products left the rollups when they were deleted, before their history is purged
+        hot = f"""{'AND' if where else 'WHERE'} {archive.hot_condition()} AND NOT EXISTS (
+            SELECT 1 FROM inventory i
+            WHERE i.user_id = s.user_id AND i.product_id = s.product_id AND i.deleted_at IS NOT NULL)"""
+        deleted = archive.deleted_pairs(conn, user_id)
+    query = text(f"SELECT user_id, sale_date, type, revenue, profit FROM sales_history s {where} {hot}")
+
+    partials = [aggregate_frame(chunk) for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize)]
+    if archived:
+        for frame in archive.iter_archived(conn, user_id, ('user_id', 'product_id', 'sale_date', 'type',
+                                                           'revenue', 'profit')):
+            if deleted:
+                frame = frame[~pd.MultiIndex.from_frame(frame[['user_id', 'product_id']]).isin(deleted)]
+            partials.append(aggregate_frame(frame))
+    if partials:
+        totals = pd.concat(partials, ignore_index=True)
+        totals = totals.groupby(['user_id', 'period_type', 'period_key'], as_index=False)[list(METRICS)].sum()
+    else:
+        totals = aggregate_frame(pd.DataFrame())
+
+    conn.execute(text(f"DELETE FROM sales_rollups {where}"), params)
+    rows = frame_to_deltas(totals)
+    if rows:
+        conn.execute(text("""
+            INSERT INTO sales_rollups
+            (user_id, period_type, period_key, gross_revenue, order_cost, total_profit, row_count)
+            VALUES (:uid, :ptype, :pkey, :gross, :cost, :profit, :rows)
+        """), rows)
+    return len(totals)
+
+
+def main():
+    from scripts.db_connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the sales_rollups table")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_cmd = sub.add_parser('rebuild', help="Backfill rollups from sales_history")
+    rebuild_cmd.add_argument('--user-id', type=int, default=None, help="Only rebuild this tenant")
+    rebuild_cmd.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        count = rebuild(get_engine(), user_id=args.user_id, chunksize=args.chunksize)
+        print(f"--- Rollups rebuilt: {count} period rows ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from dotenv import load_dotenv
+from sqlalchemy import text
+from scripts import reports
+from scripts.cache import TenantCache
+from scripts.db_connection import get_engine
+from scripts.inventory_agent import InventoryAgent
+from scripts.log_config import configure_logging
+
+# Load the variables from the .env file
+load_dotenv()
+
+# Background report scheduler, run next to the web workers:
+#
+#   REPORTS_ENABLED=true python -m scripts.scheduler run
+#
+# Every REPORT_INTERVAL_SECONDS it recomputes every tenant's reports; in
+# between it polls report_requests every REPORT_POLL_SECONDS for tenants
+# whose data changed.  Tenants are independent, so each one is a job on a
+# process pool (REPORT_WORKERS, default one per core) and the pandas work of
+# many tenants runs in parallel instead of serialising on one GIL.
+
+logger = logging.getLogger(__name__)
+
+
+def compute_tenant(user_id):
+    """Pool job: recomputes and stores one tenant's reports; returns the seconds taken"""
+    started = time.perf_counter()
+    # The scheduler sees none of the web workers' writes, so never serve it
+    # anything cached: a zero-TTL cache and no expiry index
+    agent = InventoryAgent(user_id, cache=TenantCache(ttl=0))
+    agent.expiry_index = None
+    agent.refresh_reports()
+    return time.perf_counter() - started
+
+
+class ReportScheduler:
+    def __init__(self, engine=None, workers=None, interval=None, poll=None):
+        self.engine = engine if engine is not None else get_engine()
+        self.workers = workers or int(os.getenv('REPORT_WORKERS', 0)) or os.cpu_count()
+        self.interval = interval or float(os.getenv('REPORT_INTERVAL_SECONDS', 300))
+        self.poll = poll or float(os.getenv('REPORT_POLL_SECONDS', 2))
+        self._running = {}
+        self._rerun = set()
+
+    def tenants(self):
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(text("SELECT user_id FROM users ORDER BY user_id"))]
+
+    def claim(self):
+        with self.engine.begin() as conn:
+            return reports.claim_requests(conn)
+
+    def _submit(self, pool, user_id):
+        if user_id in self._running:
+            # Already computing, possibly from data older than this request
+            self._rerun.add(user_id)
+            return
+        self._running[user_id] = pool.submit(compute_tenant, user_id)
+
+    def _reap(self, pool):
+        for user_id, future in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[user_id]
+            error = future.exception()
+            if error is not None:
+                logger.error("report job failed", extra={'user_id': user_id, 'error': str(error)})
+            else:
+                logger.debug("reports computed", extra={'user_id': user_id, 'seconds': round(future.result(), 3)})
+            if user_id in self._rerun:
+                self._rerun.discard(user_id)
+                self._submit(pool, user_id)
+
+    def run_once(self, user_ids=None):
+        """Computes the given tenants (default: all) in parallel and waits for them"""
+        user_ids = self.tenants() if user_ids is None else user_ids
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for user_id in user_ids:
+                self._submit(pool, user_id)
+            wait(list(self._running.values()))
+            self._reap(pool)
+        return len(user_ids)
+
+    def run(self, stop=None):
+        """Sweeps and serves refresh requests until `stop` is set"""
+        stop = stop or threading.Event()
+        next_sweep = 0.0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while not stop.is_set():
+                self._reap(pool)
+                try:
+                    # A sweep covers whatever was queued before it
+                    claimed = self.claim()
+                    if time.monotonic() >= next_sweep:
+                        due = self.tenants()
+                        next_sweep = time.monotonic() + self.interval
+                        logger.info("report sweep", extra={'tenants': len(due), 'workers': self.workers})
+                    else:
+                        due = claimed
+                except Exception as e:
+                    logger.warning("report scheduling failed", extra={'error': str(e)})
+                    due = []
+                for user_id in due:
+                    self._submit(pool, user_id)
+                stop.wait(self.poll)
+            wait(list(self._running.values()))
+
+
+def main():
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Precompute agent reports in the background")
+    parser.add_argument('--workers', type=int, default=None, help="Pool processes (default REPORT_WORKERS or one per core)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help="Sweep every REPORT_INTERVAL_SECONDS and serve refresh requests")
+    once = sub.add_parser('once', help="Compute reports now and exit")
+    once.add_argument('--user-id', type=int, action='append', help="Only this tenant (repeatable)")
+    args = parser.parse_args()
+
+    scheduler = ReportScheduler(workers=args.workers)
+    if args.command == 'once':
+        started = time.perf_counter()
+        count = scheduler.run_once(args.user_id)
+        print(f"--- Reports computed for {count} tenants in {time.perf_counter() - started:.1f}s ---")
+        return
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    scheduler.run(stop)
+
+
+if __name__ == "__main__":
+    main()
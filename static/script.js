@@ -4,6 +4,8 @@ class InventoryDashboard {
         this.currentTab = 'overview';
         this.currentView = 'overview';
         this.charts = {};
+        // Latest known rows per product, patched by pushed change events
+        this.live = { inventory: new Map(), advice: new Map(), expiry: new Map() };
         this.init();
     }
 
@@ -11,13 +13,15 @@ class InventoryDashboard {
         this.loadSavedTheme();
         this.bindEvents();
         this.checkServerConnection();
+        // Subscribe before the first load so no change can slip in between
+        this.startRealTimeUpdates();
         this.loadTab('overview');
-        // this.startRealTimeUpdates(); // Disabled to prevent interference with manual logic
     }
 
     async checkServerConnection() {
         try {
-            await this.fetchData('/api/inventory');
+            // Cheapest authenticated call that still reaches the database
+            await this.fetchData('/api/products/lookup?id=0');
             console.log('✅ Server connection successful');
         } catch (error) {
             console.error('❌ Server connection failed:', error);
@@ -221,14 +225,14 @@ class InventoryDashboard {
     async loadOverview() {
         const content = document.getElementById('tab-content');
 
-        // Get all data
-        const [inventory, advice, fastMoving, expiryAlerts, slowMoving] = await Promise.all([
-            this.fetchData('/api/inventory'),
-            this.fetchData('/api/advise'),
-            this.fetchData('/api/fast-moving'),
-            this.fetchData('/api/expiry-alerts'),
-            this.fetchData('/api/slow-moving').catch(() => [])
-        ]);
+        // Get all data in one round trip (each table is read once on the server)
+        const dashboard = await this.fetchData('/api/dashboard?sections=inventory,advice,fast_moving,expiry_alerts,slow_moving');
+        const inventory = dashboard.inventory;
+        const advice = dashboard.advice;
+        const fastMoving = dashboard.fast_moving;
+        const expiryAlerts = dashboard.expiry_alerts;
+        const slowMoving = dashboard.slow_moving || [];
+        this.setLiveState(inventory, advice, expiryAlerts);
 
         content.innerHTML = `
             <div class="row">
@@ -301,14 +305,14 @@ class InventoryDashboard {
                         <div class="card-body">
                             <div class="d-flex justify-content-between align-items-center mb-2">
                                 <span>Total Expiring Products:</span>
-                                <span class="badge badge-danger">
+                                <span class="badge badge-danger" id="expiry-total">
                                     ${expiryAlerts.length}
                                 </span>
                             </div>
 
                             <div class="d-flex justify-content-between align-items-center">
                                 <span>Within 30 Days:</span>
-                                <span class="badge badge-warning">
+                                <span class="badge badge-warning" id="expiry-30-days">
                                     ${expiryAlerts.filter(p => p.days_to_expiry <= 30).length}
                                 </span>
                             </div>
@@ -346,8 +350,9 @@ class InventoryDashboard {
     }
 
     async loadInventory() {
-        const inventory = await this.fetchData('/api/inventory');
+        const { rows: inventory } = await this.fetchRows('/api/inventory?format=columnar');
         const content = document.getElementById('tab-content');
+        this.live.inventory = new Map(inventory.map(item => [item.product_id, item]));
 
         content.innerHTML = `
             <div class="card">
@@ -374,29 +379,8 @@ class InventoryDashboard {
                                 </tr>
                             </thead>
                             <tbody>
-                                ${inventory.map(item => `
-                                    <tr>
-                                        <td>${item.product_id}</td>
-                                        <td>${item.product_name}</td>
-                                        <td>${item.current_stock}</td>
-                                        <td>${item.safety_stock_level}</td>
-                                        <td>${item.forecasted_demand}</td>
-                                        <td>${item.lead_time_days} days</td>
-                                        <td>${item.annual_demand}</td>
-                                        <td>Rs.${item.order_cost_fixed}</td>
-                                        <td>Rs.${item.holding_cost_per_unit}</td>
-                                        <td>Rs.${item.mrp}</td>
-                                        <td>${new Date(item.expiry_date).toLocaleDateString()}</td>
-                                        <td class="${this.getStatusClass(item)}">${this.getStatusText(item)}</td>
-                                        <td>
-                                            <button class="btn btn-danger"
-                                                onclick="dashboard.deleteProduct(${item.product_id})">
-                                                Delete
-                                            </button>
-                                        </td>
-                                    </tr>
-                                `).join('')}
-                                <tr>
+                                ${inventory.map(item => this.renderInventoryRow(item)).join('')}
+                                <tr id="inventory-add-row">
                                     <td colspan="12" style="text-align: center; padding: 20px;">
                                         <button class="btn btn-success" onclick="dashboard.showAddProductModal()" style="font-size: 18px; padding: 10px 20px;">
                                             <span style="color: white; font-weight: bold; margin-right: 5px;">+</span> Add New Product
@@ -456,9 +440,10 @@ class InventoryDashboard {
     }
 
     async loadAlerts() {
-        const [advice, expiryAlerts] = await Promise.all([
+        const [advice, expiryAlerts, expiryTiers] = await Promise.all([
             this.fetchData('/api/advise'),
-            this.fetchData('/api/expiry-alerts')
+            this.fetchData('/api/expiry-alerts'),
+            this.fetchData('/api/expiry-alerts/tiers')
         ]);
 
         const content = document.getElementById('tab-content');
@@ -518,6 +503,7 @@ class InventoryDashboard {
             <div class="card">
                 <div class="card-header">Expiry Alerts</div>
                 <div class="card-body">
+                    ${this.renderExpiryTiers(expiryTiers.tiers)}
                     <div style="overflow-x: auto;">
                         <table class="table">
                             <thead>
@@ -569,6 +555,21 @@ class InventoryDashboard {
         `;
     }
 
+    renderExpiryTiers(tiers) {
+        const labels = { expired: 'Expired' };
+        return `
+            <div class="d-flex justify-content-between align-items-center mb-2">
+                ${tiers.map(tier => `
+                    <span>
+                        ${labels[tier.tier] || `Within ${tier.max_days} days`}:
+                        <span class="badge badge-${tier.tier === 'expired' ? 'danger' : 'warning'}">${tier.products} items</span>
+                        <small>Rs.${tier.stock_at_risk.toFixed(2)} at risk</small>
+                    </span>
+                `).join('')}
+            </div>
+        `;
+    }
+
     async loadPurchaseOrders() {
         const orders = await this.fetchData('/api/purchase-order');
         const content = document.getElementById('tab-content');
@@ -675,12 +676,14 @@ class InventoryDashboard {
         let currentMrp = 0;
         let currentCost = 0;
 
+        this.attachProductSearch('saleProductId');
+        this.attachProductSearch('stockProductId');
+
         document.getElementById('saleProductId').addEventListener('change', async (e) => {
             const productId = parseInt(e.target.value);
             if (productId) {
                 try {
-                    const inventory = await this.fetchData('/api/inventory');
-                    const product = inventory.find(p => p.product_id === productId);
+                    const product = await this.lookupProduct(productId);
                     if (product) {
                         currentMrp = product.mrp;
                         currentCost = product.order_cost_fixed;
@@ -716,8 +719,7 @@ class InventoryDashboard {
             const productId = parseInt(e.target.value);
             if (productId) {
                 try {
-                    const inventory = await this.fetchData('/api/inventory');
-                    const product = inventory.find(p => p.product_id === productId);
+                    const product = await this.lookupProduct(productId);
                     if (product) {
                         document.getElementById('stockCost').value = product.order_cost_fixed;
                         // Calculate total cost if quantity is entered
@@ -815,6 +817,21 @@ class InventoryDashboard {
         }
     }
 
+    async fetchRows(url) {
+        // ?format=columnar bodies carry one array per column instead of
+        // repeating every key on every row; rebuild the row objects here
+        const payload = await this.fetchData(url);
+        const rows = new Array(payload.rows);
+        for (let i = 0; i < payload.rows; i++) {
+            const row = {};
+            for (const name of payload.columns) {
+                row[name] = payload.data[name][i];
+            }
+            rows[i] = row;
+        }
+        return { rows, next_cursor: payload.next_cursor };
+    }
+
     async postData(url, data) {
         try {
             const response = await fetch(url, {
@@ -840,6 +857,31 @@ class InventoryDashboard {
         document.getElementById('saleProfit').value = profit.toFixed(2);
     }
 
+    renderInventoryRow(item) {
+        return `
+            <tr data-product-id="${item.product_id}">
+                <td>${item.product_id}</td>
+                <td>${item.product_name}</td>
+                <td>${item.current_stock}</td>
+                <td>${item.safety_stock_level}</td>
+                <td>${item.forecasted_demand}</td>
+                <td>${item.lead_time_days} days</td>
+                <td>${item.annual_demand}</td>
+                <td>Rs.${item.order_cost_fixed}</td>
+                <td>Rs.${item.holding_cost_per_unit}</td>
+                <td>Rs.${item.mrp}</td>
+                <td>${new Date(item.expiry_date).toLocaleDateString()}</td>
+                <td class="${this.getStatusClass(item)}">${this.getStatusText(item)}</td>
+                <td>
+                    <button class="btn btn-danger"
+                        onclick="dashboard.deleteProduct(${item.product_id})">
+                        Delete
+                    </button>
+                </td>
+            </tr>
+        `;
+    }
+
     getStatusClass(item) {
         if (item.current_stock <= item.safety_stock_level) return 'status-critical';
         if (item.current_stock <= item.forecasted_demand) return 'status-warning';
@@ -1055,6 +1097,59 @@ this.charts.sales = new Chart(ctx, {
 
     // bindActionForms is implemented earlier (dynamic calculation version)
 
+    async lookupProduct(productId) {
+        // Name and prices of one product, without downloading the whole inventory
+        if (!productId) return null;
+        const result = await this.fetchData(`/api/products/lookup?id=${productId}`);
+        return result.items[0] || null;
+    }
+
+    attachProductSearch(idInputId) {
+        // Name autocomplete above a product ID field; picking a name fills in the ID
+        const idInput = document.getElementById(idInputId);
+        if (!idInput || document.getElementById(`${idInputId}Search`)) return;
+
+        const search = document.createElement('input');
+        search.type = 'text';
+        search.id = `${idInputId}Search`;
+        search.placeholder = 'Search by name...';
+        search.autocomplete = 'off';
+        search.style.marginBottom = '6px';
+        const options = document.createElement('datalist');
+        options.id = `${idInputId}Options`;
+        search.setAttribute('list', options.id);
+        idInput.parentNode.insertBefore(search, idInput);
+        idInput.parentNode.insertBefore(options, idInput);
+
+        let matches = [];
+        let timer = null;
+        search.addEventListener('input', () => {
+            const picked = matches.find(item => item.product_name === search.value);
+            if (picked) {
+                idInput.value = picked.product_id;
+                idInput.dispatchEvent(new Event('change'));
+                return;
+            }
+            clearTimeout(timer);
+            const query = search.value.trim();
+            if (query.length < 2) return;
+            timer = setTimeout(async () => {
+                try {
+                    const result = await this.fetchData(`/api/products/lookup?q=${encodeURIComponent(query)}&limit=10`);
+                    matches = result.items;
+                    options.replaceChildren(...matches.map(item => {
+                        const option = document.createElement('option');
+                        option.value = item.product_name;
+                        option.label = `#${item.product_id}`;
+                        return option;
+                    }));
+                } catch (error) {
+                    console.error('Product search failed:', error);
+                }
+            }, 150);
+        });
+    }
+
     async showProductName(inputId, displayId) {
         const productId = document.getElementById(inputId).value;
         const displayElement = document.getElementById(displayId);
@@ -1065,8 +1160,7 @@ this.charts.sales = new Chart(ctx, {
         }
 
         try {
-            const inventory = await this.fetchData('/api/inventory');
-            const product = inventory.find(item => item.product_id == productId);
+            const product = await this.lookupProduct(parseInt(productId));
 
             if (product) {
                 displayElement.textContent = `📦 ${product.product_name}`;
@@ -1162,23 +1256,17 @@ this.charts.sales = new Chart(ctx, {
 
     async showSalesHistory() {
         this.currentView = 'history';
-        const salesHistory = await this.fetchData('/api/sales-history');
-        // alert("hfhfh")
+        // First page of the history plus all-time totals from the monthly rollups
+        const [page, summary] = await Promise.all([
+            this.fetchRows('/api/sales-history?limit=100&format=columnar'),
+            this.fetchData('/api/sales-summary/monthly')
+        ]);
         const content = document.getElementById('tab-content');
 
-        // Calculate summaries
-        let grossRevenue = 0;
-        let totalProfit = 0;
-        let orderCost = 0;
-
-        salesHistory.forEach(item => {
-            if (item.type === 'sale') {
-                grossRevenue += item.revenue;
-                totalProfit += item.profit;
-            } else if (item.type === 'purchase') {
-                orderCost += Math.abs(item.revenue);
-            }
-        });
+        const total = values => Object.values(values || {}).reduce((a, b) => a + b, 0);
+        const grossRevenue = total(summary.gross_revenue);
+        const totalProfit = total(summary.total_profit);
+        const orderCost = total(summary.order_cost);
 
         const marginOfRevenue = grossRevenue - orderCost;
         const netProfit = grossRevenue - orderCost + totalProfit;
@@ -1186,6 +1274,7 @@ this.charts.sales = new Chart(ctx, {
         content.innerHTML = `
             <div style="margin-bottom: 20px;">
                 <button class="btn btn-success" onclick="dashboard.loadSalesAnalysis()">Back to Sales Analysis</button>
+                <a class="btn btn-primary" href="/api/sales-history?format=csv">Export CSV</a>
             </div>
             <div class="row">
 
@@ -1271,32 +1360,137 @@ this.charts.sales = new Chart(ctx, {
                                     <th>Profit (Rs.)</th>
                                 </tr>
                             </thead>
-                            <tbody>
-                                ${salesHistory.map(sale => `
-                                    <tr>
-                                        <td>${sale.product_name}</td>
-                                        <td><span class="badge badge-${sale.type === 'sale' ? 'success' : 'info'}">${sale.type}</span></td>
-                                        <td>${sale.sale_date}</td>
-                                        <td>${sale.quantity_sold}</td>
-                                        <td>Rs.${sale.revenue}</td>
-                                        <td>Rs.${sale.profit}</td>
-                                    </tr>
-                                `).join('')}
+                            <tbody id="salesHistoryBody">
+                                ${this.renderSalesHistoryRows(page.rows)}
                             </tbody>
                         </table>
                     </div>
+                    <div style="text-align: center; margin-top: 15px;">
+                        <button id="salesHistoryMore" class="btn btn-primary" onclick="dashboard.loadMoreSalesHistory()"
+                            style="${page.next_cursor ? '' : 'display: none;'}">Load More</button>
+                    </div>
                 </div>
             </div>
         `;
+        this.salesHistoryCursor = page.next_cursor;
+    }
+
+    renderSalesHistoryRows(items) {
+        return items.map(sale => `
+            <tr>
+                <td>${sale.product_name}</td>
+                <td><span class="badge badge-${sale.type === 'sale' ? 'success' : 'info'}">${sale.type}</span></td>
+                <td>${sale.sale_date}</td>
+                <td>${sale.quantity_sold}</td>
+                <td>Rs.${sale.revenue}</td>
+                <td>Rs.${sale.profit}</td>
+            </tr>
+        `).join('');
+    }
+
+    async loadMoreSalesHistory() {
+        if (!this.salesHistoryCursor) return;
+        const page = await this.fetchRows(`/api/sales-history?limit=100&format=columnar&cursor=${encodeURIComponent(this.salesHistoryCursor)}`);
+        document.getElementById('salesHistoryBody').insertAdjacentHTML('beforeend', this.renderSalesHistoryRows(page.rows));
+        this.salesHistoryCursor = page.next_cursor;
+        if (!page.next_cursor) {
+            document.getElementById('salesHistoryMore').style.display = 'none';
+        }
     }
 
     startRealTimeUpdates() {
-        // Update every 30 seconds, but skip overview to prevent disruption
-        setInterval(() => {
-            if (this.currentTab !== 'overview') {
-                this.loadTab(this.currentTab);
+        // The server pushes only the products that changed (Server-Sent Events);
+        // browsers without EventSource fall back to long-polling /api/changes.
+        if (!window.EventSource) {
+            this.pollChanges(null);
+            return;
+        }
+        const source = new EventSource('/api/stream');
+        source.addEventListener('inventory', event => this.applyChanges(JSON.parse(event.data)));
+        source.addEventListener('resync', () => this.reloadLiveView());
+    }
+
+    async pollChanges(since) {
+        try {
+            const url = since === null ? '/api/changes' : `/api/changes?since=${since}&timeout=25`;
+            const result = await this.fetchData(url);
+            if (result.resync) {
+                this.reloadLiveView();
             }
-        }, 30000);
+            result.events.forEach(event => this.applyChanges(event));
+            setTimeout(() => this.pollChanges(result.last_seq), 0);
+        } catch (error) {
+            setTimeout(() => this.pollChanges(since), 5000);
+        }
+    }
+
+    setLiveState(inventory, advice, expiryAlerts) {
+        this.live.inventory = new Map(inventory.map(item => [item.product_id, item]));
+        this.live.advice = new Map(advice.map(item => [item.product_id, item]));
+        this.live.expiry = new Map(expiryAlerts.map(item => [item.product_id, item]));
+    }
+
+    applyChanges(event) {
+        if (event.reload) {
+            // Bulk import: too many products to patch, reload what is on screen
+            this.reloadLiveView();
+            return;
+        }
+        event.changed.forEach(change => {
+            const id = change.product_id;
+            this.live.inventory.set(id, change.product);
+            change.advice ? this.live.advice.set(id, change.advice) : this.live.advice.delete(id);
+            change.expiry_alert ? this.live.expiry.set(id, change.expiry_alert) : this.live.expiry.delete(id);
+        });
+        event.deleted.forEach(id => {
+            this.live.inventory.delete(id);
+            this.live.advice.delete(id);
+            this.live.expiry.delete(id);
+        });
+
+        if (this.currentView === 'overview') {
+            this.refreshOverview();
+        } else if (this.currentView === 'inventory') {
+            this.patchInventoryRows(event);
+        } else if (['sales', 'alerts', 'orders'].includes(this.currentView)) {
+            // Views built from whole-catalog reports are refetched, but only when something changed
+            this.loadTab(this.currentView);
+        }
+    }
+
+    refreshOverview() {
+        const summary = document.getElementById('alerts-summary');
+        if (!summary) return;
+        const expiryAlerts = [...this.live.expiry.values()];
+        summary.innerHTML = this.renderAlertsSummary([...this.live.advice.values()], expiryAlerts);
+        document.getElementById('expiry-total').textContent = expiryAlerts.length;
+        document.getElementById('expiry-30-days').textContent =
+            expiryAlerts.filter(p => p.days_to_expiry <= 30).length;
+        this.createStockChart([...this.live.inventory.values()]);
+    }
+
+    patchInventoryRows(event) {
+        const addRow = document.getElementById('inventory-add-row');
+        if (!addRow) return;
+        event.changed.forEach(change => {
+            const row = document.querySelector(`tr[data-product-id="${change.product_id}"]`);
+            if (row) {
+                row.outerHTML = this.renderInventoryRow(change.product);
+            } else {
+                addRow.insertAdjacentHTML('beforebegin', this.renderInventoryRow(change.product));
+            }
+        });
+        event.deleted.forEach(id => {
+            const row = document.querySelector(`tr[data-product-id="${id}"]`);
+            if (row) row.remove();
+        });
+    }
+
+    reloadLiveView() {
+        // Too far behind to patch (or the server restarted): load the view afresh
+        if (this.currentView !== 'history' && this.currentView !== 'actions') {
+            this.loadTab(this.currentView);
+        }
     }
 
     showModal(modalType) {